@@ -0,0 +1,248 @@
+# scripts/benchmark.py
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from rich.console import Console
+from rich.table import Table
+
+from scripts.evaluate import CACHE_PATH, DATA_PATH, STUDY_MATRIX, StudyScheduler
+from src.agent.client import AsyncReasoningClient, ReasoningClient
+from src.agent.context_builder import ContextStore
+from src.agent.orchestrator import ConvFinQAManager, PayloadLayout, ReflectionMode
+from src.utils.dataset import DatasetStore
+from src.utils.mock_server import LatencyModel, MockServerProcess
+from src.utils.tracing import TraceAggregator
+
+# --- Constants ---
+CONSOLE = Console()
+RANDOM_SEED = 42
+NUM_RECORDS = 20
+DEFAULT_LATENCY = "lognormal:400,0.5"   # Roughly a fast structured-output call
+MAX_CONCURRENCY = 16
+MAX_ACTIVE_RECORDS = 32
+
+
+def synthetic_records(count: int, turns: int = 4) -> List[Dict]:
+    """Dataset-shaped records for machines without the ConvFinQA file."""
+    return [
+        {
+            "id": f"Synthetic/{i}",
+            "doc": {
+                "pre_text": "Revenue grew on higher volumes. " * 20,
+                "post_text": "Amounts are in millions. " * 10,
+                "table": {str(2010 + y): {"revenue": 100.0 + i + y, "cost": 60.0 + y, "margin": 40.0 + i}
+                          for y in range(4)},
+            },
+            "dialogue": {
+                "conv_questions": [f"what was the change in revenue in step {t}?" for t in range(turns)],
+                "executed_answers": [0.2] * turns,
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def load_records(args: argparse.Namespace) -> tuple[List[Dict], ContextStore | None]:
+    """The records to benchmark and, for dataset records, their precomputed contexts."""
+    if args.synthetic or not DATA_PATH.exists():
+        CONSOLE.print("[yellow]Using synthetic records[/yellow]")
+        return synthetic_records(args.records), None
+    store = DatasetStore(DATA_PATH)
+    try:
+        return store.sample(args.records, split=args.split, seed=RANDOM_SEED), ContextStore(store)
+    finally:
+        store.close()
+
+
+def _result(mode: str, config: Dict, records: int, failed: int, elapsed: float,
+            tracing: TraceAggregator, peak_bytes: int) -> Dict[str, Any]:
+    latency = tracing.summary()["turn_latency_ms"]
+    return {
+        "mode": mode,
+        "condition": int(config["id"]),
+        "name": config["name"],
+        "records": records,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "records_per_sec": round((records - failed) / elapsed, 3) if elapsed else 0.0,
+        "turn_p50_ms": latency["p50"],
+        "turn_p95_ms": latency["p95"],
+        "peak_mb": round(peak_bytes / 1024 / 1024, 2),
+    }
+
+
+def bench_manager(config: Dict, records: List[Dict], base_url: str, layout: PayloadLayout,
+                  reflection: ReflectionMode, contexts: ContextStore | None = None) -> Dict[str, Any]:
+    """Sequential ConvFinQAManager.process_record over a blocking client."""
+    manager = ConvFinQAManager(condition=config["id"], client=ReasoningClient(base_url=base_url), layout=layout,
+                               reflection=reflection, contexts=contexts)
+    tracing = TraceAggregator()
+    failed = 0
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for record in records:
+        try:
+            state = manager.process_record(record)
+        except Exception as e:
+            CONSOLE.print(f"[red]Record {record['id']} failed: {e}[/red]")
+            failed += 1
+            continue
+        for turn in state.history:
+            tracing.add(turn.trace)
+    elapsed = time.perf_counter() - start
+
+    return _result("manager", config, len(records), failed, elapsed, tracing, tracemalloc.get_traced_memory()[1])
+
+
+async def bench_study(config: Dict, records: List[Dict], base_url: str, layout: PayloadLayout,
+                      reflection: ReflectionMode, max_concurrency: int, max_active_records: int,
+                      contexts: ContextStore | None = None) -> Dict[str, Any]:
+    """The evaluate.py scheduler for one condition, concurrent over an async client, without journals."""
+    async with AsyncReasoningClient(max_concurrency=max_concurrency, base_url=base_url) as client:
+        scheduler = StudyScheduler([config], client, max_active_records, layout=layout, journal_dir=None,
+                                   reflection=reflection, contexts=contexts)
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        runner, = await scheduler.run(iter(records), len(records))
+        elapsed = time.perf_counter() - start
+
+    failed = len(records) - len(runner.done)
+    return _result("study", config, len(records), failed, elapsed, runner.tracing, tracemalloc.get_traced_memory()[1])
+
+
+def print_results(results: List[Dict], baseline: Dict[tuple, Dict] | None = None):
+    table = Table(title="Offline Benchmark", header_style="bold magenta")
+    table.add_column("Mode", style="cyan")
+    table.add_column("Condition", style="cyan", no_wrap=True)
+    table.add_column("Rec/s", justify="right", style="green")
+    table.add_column("Turn p50 (ms)", justify="right")
+    table.add_column("Turn p95 (ms)", justify="right")
+    table.add_column("Peak MB", justify="right")
+    table.add_column("Failed", justify="right", style="red")
+    if baseline:
+        table.add_column("Δ Rec/s", justify="right", style="yellow")
+
+    for res in results:
+        row = [res["mode"], res["name"], f"{res['records_per_sec']:.2f}", f"{res['turn_p50_ms']:,.0f}",
+               f"{res['turn_p95_ms']:,.0f}", f"{res['peak_mb']:.1f}", str(res["failed"])]
+        if baseline:
+            before = baseline.get((res["mode"], res["condition"]))
+            row.append(f"{_change(before, res):+.1%}" if before else "-")
+        table.add_row(*row)
+    CONSOLE.print(table)
+
+
+def _change(before: Dict, after: Dict) -> float:
+    return (after["records_per_sec"] - before["records_per_sec"]) / before["records_per_sec"] \
+        if before["records_per_sec"] else 0.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline against a local mock Responses API (no network, no credits)."
+    )
+    parser.add_argument("--mode", choices=["manager", "study", "both"], default="both",
+                        help="'manager': sequential process_record; 'study': the concurrent evaluate.py scheduler")
+    parser.add_argument("--conditions", type=int, nargs="*",
+                        help="StudyCondition ids to benchmark (default: the whole study matrix)")
+    parser.add_argument("--records", type=int, default=NUM_RECORDS)
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--synthetic", action="store_true", help="Use generated records instead of the dataset")
+    parser.add_argument("--latency", type=LatencyModel.parse, default=LatencyModel.parse(DEFAULT_LATENCY),
+                        help="Server latency: fixed:MS, uniform:LO,HI or lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failed by the server")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--invalid-review-rate", type=float, default=0.2,
+                        help="Fraction of canned reviews that trigger self-correction")
+    parser.add_argument("--replay", type=Path, nargs="?", const=CACHE_PATH,
+                        help="Replay outputs recorded in a response cache (default: the evaluate.py cache)")
+    parser.add_argument("--payload-layout", choices=[layout.value for layout in PayloadLayout],
+                        default=PayloadLayout.INTERLEAVED.value)
+    parser.add_argument("--reflection", choices=[mode.value for mode in ReflectionMode],
+                        default=ReflectionMode.SEQUENTIAL.value)
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--max-active-records", type=int, default=MAX_ACTIVE_RECORDS)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc (it slows allocation-heavy code) and report no peak memory")
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Earlier --output file to compare throughput against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="With --compare, exit non-zero if records/sec drops by more than this fraction")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Requests only reach the local server; the SDK still insists on a key
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    records, contexts = load_records(args)
+    configs = [c for c in STUDY_MATRIX if not args.conditions or int(c["id"]) in args.conditions]
+    modes = ["manager", "study"] if args.mode == "both" else [args.mode]
+    layout = PayloadLayout(args.payload_layout)
+    reflection = ReflectionMode(args.reflection)
+    results = []
+
+    server = MockServerProcess(
+        replay_path=args.replay, latency=args.latency, error_rate=args.error_rate,
+        error_status=args.error_status, invalid_review_rate=args.invalid_review_rate, seed=RANDOM_SEED,
+        retry_after=args.retry_after
+    )
+    if not args.no_memory:
+        tracemalloc.start()
+    with server:
+        for config in configs:
+            for mode in modes:
+                CONSOLE.print(f"[bold cyan]⏱  {mode}: {config['name']}[/bold cyan]")
+                if mode == "manager":
+                    results.append(bench_manager(config, records, server.base_url, layout, reflection, contexts))
+                else:
+                    results.append(asyncio.run(bench_study(
+                        config, records, server.base_url, layout, reflection,
+                        args.max_concurrency, args.max_active_records, contexts
+                    )))
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    if contexts:
+        contexts.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {(r["mode"], r["condition"]): r for r in json.load(f)["results"]}
+    print_results(results, baseline)
+
+    stats = server.stats
+    CONSOLE.print(
+        f"Mock server: {stats.requests} requests, {stats.errors} injected errors, "
+        f"{stats.replayed} replayed / {stats.canned} canned"
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": {"records": len(records), "latency": args.latency.__dict__,
+                                    "error_rate": args.error_rate, "replay": str(args.replay or "")},
+                       "results": results}, f, indent=4)
+        CONSOLE.print(f"[bold green]Saved benchmark results to {args.output}[/bold green]")
+
+    if baseline:
+        regressions = [r for r in results if (r["mode"], r["condition"]) in baseline
+                       and _change(baseline[(r["mode"], r["condition"])], r) < -args.max_regression]
+        if regressions:
+            CONSOLE.print(f"[bold red]{len(regressions)} throughput regression(s) beyond "
+                          f"{args.max_regression:.0%}[/bold red]")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,62 @@
 # scripts/evaluate.py
 
 import json
-import random
+import asyncio
 import logging
+import argparse
 from pathlib import Path
-from typing import List, Dict, Any
-from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Dict, Any
 
 from rich.console import Console
 from rich.table import Table
-from rich.progress import track
+from openai import OpenAI
+from rich.progress import Progress, track
 
-from src.agent.orchestrator import ConvFinQAManager
-from src.models.schemas import StudyCondition, TurnResult
-from src.utils.eval_utils import is_nearly_equal, detect_symbolic_hallucination, calculate_scale_error
+from src.agent.batch import POLL_SECONDS, BatchExecutor, LocalBatchBackend, OpenAIBatchBackend
+from src.agent.cache import CacheMode, ResponseCache, StageMemo
+from src.agent.client import AsyncReasoningClient
+from src.agent.context_builder import ContextStore
+from src.agent.orchestrator import (
+    BASELINE_CONDITIONS, DEFAULT_TABLE_FORMATS, ConvFinQAManager, PayloadLayout, ReflectionMode
+)
+from src.agent.rate_limit import RateLimiter
+from src.agent.resilience import RetryPolicy
+from src.models.schemas import ConversationState, StudyCondition, TurnResult
+from src.utils.dataset import DatasetStore, reservoir_sample, shard_records
+from src.utils.eval_utils import (
+    ConditionMetrics, is_nearly_equal, detect_symbolic_hallucination, calculate_scale_error
+)
+from src.utils.journal import JournalEntry, ResultJournal
+from src.utils.parser import TableFormat
+from src.utils.columnar import columnar_path, write_columnar
+from src.utils.results import ResultStore
+from src.utils.tracing import SpanExporter, TraceAggregator
 
 # --- Constants ---
 CONSOLE = Console()
 ROOT_DIR = Path(__file__).parent.parent
 DATA_DIR = ROOT_DIR / "data"
 DATA_PATH = DATA_DIR / "convfinqa_dataset.json"
+CACHE_PATH = DATA_DIR / "cache" / "responses.sqlite"
+JOURNAL_DIR = DATA_DIR / "journals"
+TRACE_DIR = DATA_DIR / "traces"
+BATCH_DIR = DATA_DIR / "batches"
 RANDOM_SEED = 42
 SAMPLE_SIZE = 15
+MAX_CONCURRENCY = 16        # In-flight API requests across the whole study
+MAX_ACTIVE_RECORDS = 32     # Conversations in progress across all conditions
+
+# Requests per minute per model family (prefix-matched against model ids)
+MODEL_RATE_LIMITS = {
+    "gpt-5-mini": 500,
+    "gpt-5.2": 500,
+}
+
+# Tokens per minute per model family; match these to the account's usage tier
+MODEL_TOKEN_LIMITS = {
+    "gpt-5-mini": 2_000_000,
+    "gpt-5.2": 500_000,
+}
 
 STUDY_MATRIX = [
     {"id": StudyCondition.JSON_BASELINE_MINI, "name": "1. JSON Baseline (Mini)"},
@@ -43,59 +78,8 @@ STUDY_MATRIX = [
 #     {"id": StudyCondition.REFLECT_HIGH, "name": "10. Reflect (High)"},
 # ]
 
-logging.basicConfig(
-    level=logging.INFO, 
-    filename=DATA_DIR / "evaluation.log",
-    filemode='w'
-)
-
 logger = logging.getLogger(__name__)
 
-@dataclass
-class TurnStats:
-    correct: int = 0
-    total: int = 0
-
-    @property
-    def accuracy(self) -> float:
-        return (self.correct / self.total * 100) if self.total > 0 else 0
-
-@dataclass
-class ConditionMetrics:
-    total_turns: int = 0
-    correct: int = 0
-    hallucinations: int = 0
-    scale_errors: int = 0
-    recovery_attempts: int = 0
-    successful_recoveries: int = 0
-    per_turn_breakdown: Dict[int, TurnStats] = field(default_factory=dict)
-
-    def update(self, turn_idx: int, is_correct: bool, is_hallucinated: bool, 
-               is_scale: bool, internal_review_failed: bool):
-        self.total_turns += 1
-        if is_correct: self.correct += 1
-        if is_hallucinated: self.hallucinations += 1
-        if is_scale: self.scale_errors += 1
-        
-        # FIXED LOGIC: Attempt is counted if the agent flagged itself.
-        if internal_review_failed:
-            self.recovery_attempts += 1
-            if is_correct:
-                self.successful_recoveries += 1
-        
-        if turn_idx not in self.per_turn_breakdown:
-            self.per_turn_breakdown[turn_idx] = TurnStats()
-        self.per_turn_breakdown[turn_idx].total += 1
-        if is_correct: self.per_turn_breakdown[turn_idx].correct += 1
-
-    @property
-    def final_accuracy(self) -> float:
-        return (self.correct / self.total_turns * 100) if self.total_turns > 0 else 0
-    
-    @property
-    def recovery_rate(self) -> float:
-        return (self.successful_recoveries / self.recovery_attempts * 100) if self.recovery_attempts > 0 else 0
-
 class EvaluationReporter:
     @staticmethod
     def print_comparative_table(all_results: List[Dict]):
@@ -120,7 +104,80 @@ class EvaluationReporter:
         CONSOLE.print(table)
 
     @staticmethod
-    def save_results(path: Path, metadata: Dict, metrics: ConditionMetrics, results: List[Dict]):
+    def print_token_usage(client: AsyncReasoningClient | BatchExecutor, title: str = "Token Usage"):
+        """Summarizes provider token usage, including prompt-cache hits."""
+        table = Table(title=title, header_style="bold magenta")
+        table.add_column("Model", style="cyan", no_wrap=True)
+        table.add_column("Calls", justify="right")
+        table.add_column("Input", justify="right")
+        table.add_column("Cached Input", justify="right", style="green")
+        table.add_column("Output", justify="right")
+        table.add_column("Reasoning", justify="right")
+
+        for model, usage in sorted(client.usage.items()):
+            table.add_row(
+                model, str(usage.calls), f"{usage.input_tokens:,}",
+                f"{usage.cached_tokens:,} ({usage.cached_ratio:.1f}%)",
+                f"{usage.output_tokens:,}", f"{usage.reasoning_tokens:,}"
+            )
+        CONSOLE.print(table)
+
+    @staticmethod
+    def print_latency_table(all_results: List[Dict]):
+        """Per-condition turn latency and token cost from the stage traces."""
+        table = Table(title="Latency & Cost per Turn", header_style="bold magenta")
+        table.add_column("Condition", style="cyan", no_wrap=True)
+        table.add_column("p50 (ms)", justify="right")
+        table.add_column("p95 (ms)", justify="right")
+        table.add_column("Slowest Stage", justify="right", style="yellow")
+        table.add_column("Input Tok/Turn", justify="right")
+        table.add_column("Output Tok/Turn", justify="right")
+        table.add_column("Self-Corrections", justify="right", style="blue")
+        table.add_column("Pruned Tok/Turn", justify="right", style="green")
+
+        for res in all_results:
+            tracing = res["tracing"]
+            turns = tracing["traced_turns"]
+            if not turns:
+                continue
+            # Stage with the largest share of total wall time
+            stages = tracing["stages"]
+            slowest = max(stages, key=lambda s: stages[s]["latency_ms"]["mean"] * stages[s]["calls"], default="-")
+            table.add_row(
+                res["metadata"]["name"],
+                f"{tracing['turn_latency_ms']['p50']:,.0f}",
+                f"{tracing['turn_latency_ms']['p95']:,.0f}",
+                slowest,
+                f"{tracing['tokens']['input_tokens'] / turns:,.0f}",
+                f"{tracing['tokens']['output_tokens'] / turns:,.0f}",
+                str(tracing["self_corrections"]),
+                f"{tracing['pruned_tokens'] / turns:,.0f}"
+            )
+        CONSOLE.print(table)
+
+    @staticmethod
+    def print_call_metrics(client: AsyncReasoningClient):
+        """Retries, throttling and failures per model, from the client's resilience layer."""
+        table = Table(title="API Reliability", header_style="bold magenta")
+        table.add_column("Model", style="cyan", no_wrap=True)
+        table.add_column("Calls", justify="right")
+        table.add_column("Attempts", justify="right")
+        table.add_column("429s", justify="right", style="yellow")
+        table.add_column("Timeouts", justify="right", style="yellow")
+        table.add_column("Backoff (s)", justify="right")
+        table.add_column("Circuit Rejections", justify="right", style="red")
+        table.add_column("Failed", justify="right", style="red")
+
+        for model, m in sorted(client.metrics.items()):
+            table.add_row(
+                model, str(m.calls), str(m.attempts), str(m.rate_limited), str(m.timeouts),
+                f"{m.backoff_seconds:.1f}", str(m.circuit_rejections), str(m.failures)
+            )
+        CONSOLE.print(table)
+
+    @staticmethod
+    def save_results(path: Path, metadata: Dict, metrics: ConditionMetrics, results: ResultStore,
+                     tracing: Dict | None = None):
         output = {
             "metadata": metadata,
             "accuracy": round(metrics.final_accuracy, 2),
@@ -132,19 +189,66 @@ class EvaluationReporter:
                 "recovery_attempts": metrics.recovery_attempts,
                 "successful_recoveries": metrics.successful_recoveries
             },
-            "detailed_results": results
+            "tracing": tracing,
+            "detailed_results": list(results.rows())
         }
         with open(path, "w") as f:
             json.dump(output, f, indent=4)
 
+    @staticmethod
+    def save_columnar(base: Path, runners: List["EvaluationRunner"]) -> Path:
+        """All conditions' scored turns in one columnar file, for the analysis notebook."""
+        path = write_columnar(columnar_path(base),
+                              [(int(r.meta["id"]), r.meta["name"], r.results) for r in runners])
+        CONSOLE.print(f"Columnar results: {path}")
+        return path
+
 class EvaluationRunner:
-    def __init__(self, condition_meta: Dict):
+    """
+    Scores one condition as records finish, so memory stays flat on long streams.
+    Scored turns go to a columnar ResultStore, which the metrics are computed from
+    and which emits detailed_results in stream order regardless of completion order.
+    """
+
+    def __init__(self, condition_meta: Dict, client: AsyncReasoningClient | None = None,
+                 journal: ResultJournal | None = None, resume: bool = False,
+                 layout: PayloadLayout = PayloadLayout.INTERLEAVED,
+                 spans: SpanExporter | None = None,
+                 reflection: ReflectionMode = ReflectionMode.SEQUENTIAL,
+                 contexts: ContextStore | None = None,
+                 table_format: TableFormat | None = None,
+                 context_budget: int | None = None,
+                 stages: StageMemo | None = None):
         self.meta = condition_meta
-        self.manager = ConvFinQAManager(condition=condition_meta["id"])
-        self.metrics = ConditionMetrics()
-        self.detailed_results = []
+        self.manager = ConvFinQAManager(condition=condition_meta["id"], client=client, layout=layout,
+                                        reflection=reflection, contexts=contexts, table_format=table_format,
+                                        context_budget=context_budget, stages=stages)
+        self.results = ResultStore()
+        self.tracing = TraceAggregator()
+        self.journal = journal
+        self.spans = spans
+        self.done: set[str] = set()
+        self.failed: set[str] = set()   # Raised this run; retried by --resume
+
+        if spans and not resume:
+            spans.reset()
+
+        if journal and resume:
+            # A record journaled twice is scored from its latest entry, as in ResultJournal.load
+            for entry in journal.load().values():
+                self._score_entry(entry)
+        elif journal:
+            journal.reset()
+
+    @property
+    def metrics(self) -> ConditionMetrics:
+        return self.results.metrics()
+
+    @property
+    def detailed_results(self) -> List[Dict]:
+        return list(self.results.rows())
 
-    def _process_turn(self, record_id: str, turn_idx: int, turn: TurnResult, expected: float):
+    def _process_turn(self, turn_idx: int, turn: TurnResult, expected: float) -> Dict:
         actual = turn.raw_math_output
         is_correct = is_nearly_equal(actual, expected)
         is_hallucinated = detect_symbolic_hallucination(turn.final_expression)
@@ -153,63 +257,435 @@ class EvaluationRunner:
         # Recovery happened if review flagged it as invalid
         review_flagged_error = True if (turn.review and not turn.review.is_valid) else False
 
-        self.metrics.update(turn_idx, is_correct, is_hallucinated, is_scale, review_flagged_error)
-        
-        self.detailed_results.append({
-            "record_id": record_id,
+        return {
             "turn_index": turn_idx,
-            "is_correct": is_correct,
             "ground_truth": expected,
             "agent_output": actual,
-            "metrics": {"was_recovered": (review_flagged_error and is_correct)}
-        })
+            "expression": turn.final_expression,
+            "correct": is_correct,
+            "hallucinated": is_hallucinated,
+            "scale_error": is_scale,
+            "review_flagged": review_flagged_error
+        }
 
-    def run(self, data: List[Dict]) -> ConditionMetrics:
-        random.seed(RANDOM_SEED)
-        samples = random.sample(data, min(SAMPLE_SIZE, len(data)))
-        
+    def _score_entry(self, entry: JournalEntry) -> List[Dict]:
+        """Scores a record's turns into the result store; returns the scored turns."""
+        if entry.record_id in self.done:
+            return []
+        self.done.add(entry.record_id)
+        try:
+            scored = [
+                self._process_turn(i, turn, entry.ground_truth[i])
+                for i, turn in enumerate(entry.turns) if i < len(entry.ground_truth)
+            ]
+        except Exception as e:
+            logger.error(f"Error scoring record {entry.record_id}: {e}")
+            return []
+        # Stored only once every turn scored, so a failing record leaves no partial rows
+        for turn, row in zip(entry.turns, scored):
+            self.results.append(entry.position, entry.record_id, **row, trace=turn.trace)
+            self.tracing.add(turn.trace)
+        return scored
+
+    def record_finished(self, position: int, record: Dict, state: ConversationState):
+        """Journals a finished conversation, then scores it."""
+        entry = JournalEntry(record["id"], position, record["dialogue"]["executed_answers"], state.history)
+        if self.journal:
+            self.journal.append(entry)
+        self.failed.discard(entry.record_id)
+        scored = self._score_entry(entry)
+        if self.spans:
+            correct = [row["correct"] for row in scored]
+            self.spans.export(int(self.meta["id"]), entry.record_id, entry.turns, correct)
+
+    def record_failed(self, record: Dict, error: Exception):
+        logger.error(f"Error in record {record.get('id')}: {error}")
+        self.failed.add(record.get("id"))
+
+    def run(self, records: Iterable[Dict]) -> ConditionMetrics:
         CONSOLE.print(f"\n[bold cyan]🧪 Executing: {self.meta['name']}[/bold cyan]")
         
-        for record in track(samples, description=f"Condition {int(self.meta['id'])}"):
+        for position, record in enumerate(track(records, description=f"Condition {int(self.meta['id'])}")):
+            if record["id"] in self.done:
+                continue
             try:
                 state = self.manager.process_record(record)
-                ground_truth = record["dialogue"]["executed_answers"]
-                for i, turn in enumerate(state.history):
-                    if i < len(ground_truth):
-                        self._process_turn(record["id"], i, turn, ground_truth[i])
             except Exception as e:
-                logger.error(f"Error in record {record.get('id')}: {e}")
+                self.record_failed(record, e)
+            else:
+                self.record_finished(position, record, state)
         return self.metrics
 
+class StudyScheduler:
+    """
+    Streams records through every condition of the study concurrently.
+    A producer walks the record stream once and feeds (condition, record) jobs to
+    a fixed pool of workers, taking a slot per job that is freed when the job ends,
+    so at most `max_active_records` conversations are buffered or in progress at a time.
+    A failed conversation is reported to its runner; a failed journal or result
+    write stops the run.
+    Turns inside a record remain sequential in the orchestrator. With a StageMemo,
+    the conditions of a record, which run side by side, share identical stage calls
+    (e.g. the planner and analyst of MODULAR_x and REFLECT_x).
+    """
+
+    def __init__(self, configs: List[Dict], client: AsyncReasoningClient,
+                 max_active_records: int = MAX_ACTIVE_RECORDS, resume: bool = False,
+                 journal_suffix: str = "", layout: PayloadLayout = PayloadLayout.INTERLEAVED,
+                 export_spans: bool = False, journal_dir: Path | None = JOURNAL_DIR,
+                 reflection: ReflectionMode = ReflectionMode.SEQUENTIAL,
+                 contexts: ContextStore | None = None,
+                 table_formats: Dict[int, TableFormat] | None = None,
+                 context_budget: int | None = None,
+                 stages: StageMemo | None = None):
+        self.runners = [
+            EvaluationRunner(config, client=client,
+                             journal=journal_for(config, condition_suffix(config, journal_suffix, table_formats),
+                                                 journal_dir) if journal_dir else None,
+                             resume=resume, layout=layout,
+                             spans=spans_for(config, condition_suffix(config, journal_suffix, table_formats))
+                             if export_spans else None,
+                             reflection=reflection, contexts=contexts,
+                             table_format=(table_formats or {}).get(int(config["id"])),
+                             context_budget=context_budget, stages=stages)
+            for config in configs
+        ]
+        self.max_active_records = max_active_records
+
+    async def run(self, records: Iterable[Dict], total: int | None = None) -> List[EvaluationRunner]:
+        queue: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(self.max_active_records)
+
+        with Progress(console=CONSOLE) as progress:
+            bars = {
+                id(r): progress.add_task(r.meta["name"], total=total, completed=len(r.done))
+                for r in self.runners
+            }
+
+            async def produce():
+                # Record-major submission spreads load across models and conditions
+                for position, record in enumerate(records):
+                    for runner in self.runners:
+                        if record["id"] not in runner.done:
+                            await slots.acquire()
+                            queue.put_nowait((runner, position, record))
+                for _ in range(self.max_active_records):
+                    queue.put_nowait(None)
+
+            async def work():
+                while (job := await queue.get()) is not None:
+                    runner, position, record = job
+                    try:
+                        state = await runner.manager.aprocess_record(record)
+                    except Exception as e:
+                        runner.record_failed(record, e)
+                    else:
+                        runner.record_finished(position, record, state)
+                    finally:
+                        slots.release()
+                        progress.advance(bars[id(runner)])
+
+            await asyncio.gather(produce(), *(work() for _ in range(self.max_active_records)))
+
+        return self.runners
+
+class BatchScheduler:
+    """
+    Runs single-call conditions through an offline batch job instead of live requests.
+    All turns k of the study form one wave, so the records are held in memory;
+    conversations are journaled and scored as they finish, like in StudyScheduler.
+    """
+
+    def __init__(self, configs: List[Dict], client: AsyncReasoningClient, executor: BatchExecutor,
+                 resume: bool = False, journal_suffix: str = "",
+                 layout: PayloadLayout = PayloadLayout.INTERLEAVED, export_spans: bool = False,
+                 journal_dir: Path | None = JOURNAL_DIR, contexts: ContextStore | None = None,
+                 table_formats: Dict[int, TableFormat] | None = None, context_budget: int | None = None):
+        # The client is never called; managers only build the batch payloads
+        self.runners = [
+            EvaluationRunner(config, client=client,
+                             journal=journal_for(config, condition_suffix(config, journal_suffix, table_formats),
+                                                 journal_dir) if journal_dir else None,
+                             resume=resume, layout=layout,
+                             spans=spans_for(config, condition_suffix(config, journal_suffix, table_formats))
+                             if export_spans else None,
+                             contexts=contexts, table_format=(table_formats or {}).get(int(config["id"])),
+                             context_budget=context_budget)
+            for config in configs
+        ]
+        self.executor = executor
+
+    async def run(self, records: List[Dict]) -> List[EvaluationRunner]:
+        by_manager = {id(runner.manager): runner for runner in self.runners}
+        jobs = [
+            (runner.manager, position, record)
+            for position, record in enumerate(records)
+            for runner in self.runners if record["id"] not in runner.done
+        ]
+        CONSOLE.print(f"[bold cyan]📦 Batching {len(jobs)} conversations across "
+                      f"{len(self.runners)} conditions[/bold cyan]")
+        await self.executor.run(
+            jobs,
+            on_finished=lambda manager, position, record, state:
+                by_manager[id(manager)].record_finished(position, record, state),
+            on_failed=lambda manager, record, error: by_manager[id(manager)].record_failed(record, error),
+        )
+        return self.runners
+
+def table_format_suffix(cond_id: int, table_formats: Dict[int, TableFormat] | None) -> str:
+    """'.table-FMT' when a condition's table format is overridden away from its default, else ''."""
+    fmt = (table_formats or {}).get(cond_id)
+    if fmt is None or fmt == DEFAULT_TABLE_FORMATS.get(StudyCondition(cond_id), TableFormat.MARKDOWN):
+        return ""
+    return f".table-{fmt.value}"
+
+def condition_suffix(config: Dict, suffix: str, table_formats: Dict[int, TableFormat] | None) -> str:
+    # Override runs get their own journals and results, to compare against the default format
+    return suffix + table_format_suffix(int(config["id"]), table_formats)
+
+def journal_for(config: Dict, suffix: str = "", journal_dir: Path = JOURNAL_DIR) -> ResultJournal:
+    return ResultJournal(journal_dir / f"eval_journal_cond_{int(config['id'])}{suffix}.jsonl")
+
+def spans_for(config: Dict, suffix: str = "") -> SpanExporter:
+    return SpanExporter(TRACE_DIR / f"spans_cond_{int(config['id'])}{suffix}.jsonl")
+
+async def run_study(records: Iterable[Dict], cache: ResponseCache | None = None,
+                    max_concurrency: int = MAX_CONCURRENCY,
+                    max_active_records: int = MAX_ACTIVE_RECORDS,
+                    rate_limits: Dict[str, float] | None = None,
+                    resume: bool = False,
+                    total: int | None = None,
+                    output_suffix: str = "",
+                    layout: PayloadLayout = PayloadLayout.INTERLEAVED,
+                    export_spans: bool = False,
+                    base_url: str | None = None,
+                    token_limits: Dict[str, float] | None = None,
+                    retry: RetryPolicy | None = None,
+                    reflection: ReflectionMode = ReflectionMode.SEQUENTIAL,
+                    batch: BatchExecutor | None = None,
+                    contexts: ContextStore | None = None,
+                    table_formats: Dict[int, TableFormat] | None = None,
+                    context_budget: int | None = None,
+                    stages: StageMemo | None = None) -> List[Dict]:
+    token_limits = MODEL_TOKEN_LIMITS if token_limits is None else token_limits
+    limiters = {
+        model: RateLimiter(rpm, tokens_per_minute=token_limits.get(model))
+        for model, rpm in (rate_limits or MODEL_RATE_LIMITS).items()
+    }
+    final_comparison_data = []
+
+    async with AsyncReasoningClient(max_concurrency=max_concurrency, cache=cache,
+                                    rate_limits=limiters, base_url=base_url, retry=retry) as client:
+        # Baseline conditions go to the batch job when one is configured, the rest run live
+        batch_configs = [c for c in STUDY_MATRIX if batch and c["id"] in BASELINE_CONDITIONS]
+        live_configs = [c for c in STUDY_MATRIX if c not in batch_configs]
+        scheduler = StudyScheduler(live_configs, client, max_active_records, resume, output_suffix,
+                                   layout, export_spans, reflection=reflection, contexts=contexts,
+                                   table_formats=table_formats, context_budget=context_budget, stages=stages)
+        runs = []
+        if batch_configs:
+            records = list(records)
+            batch_scheduler = BatchScheduler(batch_configs, client, batch, resume, output_suffix,
+                                             layout, export_spans, contexts=contexts,
+                                             table_formats=table_formats, context_budget=context_budget)
+            runs.append(batch_scheduler.run(records))
+        if live_configs:
+            runs.append(scheduler.run(records, total))
+        runners = [runner for group in await asyncio.gather(*runs) for runner in group]
+
+        runners.sort(key=lambda r: int(r.meta["id"]))
+        for runner in runners:
+            config, metrics = runner.meta, runner.metrics
+            tracing = runner.tracing.summary()
+
+            # Save results to list for the final table
+            final_comparison_data.append({
+                "metadata": config,
+                "accuracy": round(metrics.final_accuracy, 2),
+                "metrics": metrics,
+                "tracing": tracing,
+                "failed_records": len(runner.failed)
+            })
+            
+            # Save individual JSON file
+            EvaluationReporter.save_results(
+                DATA_DIR / f"eval_results_cond_{int(config['id'])}"
+                           f"{condition_suffix(config, output_suffix, table_formats)}.json",
+                config, metrics, runner.results, tracing
+            )
+        # The combined file names every overridden condition, e.g. eval_results.table7-csv
+        format_suffix = "".join(
+            f".table{cond_id}-{fmt.value}" for cond_id, fmt in sorted((table_formats or {}).items())
+            if table_format_suffix(cond_id, table_formats)
+        )
+        EvaluationReporter.save_columnar(DATA_DIR / f"eval_results{output_suffix}{format_suffix}", runners)
+        EvaluationReporter.print_token_usage(client)
+        if batch:
+            EvaluationReporter.print_token_usage(batch, title=f"Token Usage (Batch, {batch.batches_submitted} jobs)")
+        EvaluationReporter.print_call_metrics(client)
+    return final_comparison_data
+
+def _parse_model_limit(value: str) -> tuple[str, float]:
+    model, _, limit = value.partition("=")
+    if not model or not limit:
+        raise argparse.ArgumentTypeError(f"Expected MODEL=LIMIT, got '{value}'")
+    return model, float(limit)
+
+def _parse_table_format(value: str) -> tuple[int, TableFormat]:
+    condition, _, fmt = value.partition("=")
+    try:
+        return int(StudyCondition(int(condition))), TableFormat(fmt)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Expected CONDITION=FORMAT with FORMAT in {[f.value for f in TableFormat]}, got '{value}'"
+        )
+
+def _parse_shard(value: str) -> tuple[int, int]:
+    index, _, count = value.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected i/N, got '{value}'")
+    if not 0 <= shard[0] < shard[1]:
+        raise argparse.ArgumentTypeError(f"Shard index must be in 0..N-1, got '{value}'")
+    return shard
+
+def select_records(store: DatasetStore, args: argparse.Namespace) -> tuple[Iterator[Dict], int | None]:
+    """
+    Builds the record stream for a run: a seeded sample (default), a reservoir
+    sample drawn in one pass, or the full split; optionally restricted to a shard.
+    Returns the stream and its length when it is known up front.
+    """
+    if args.full:
+        records: Iterable[Dict] = store.iter_records(args.split)
+        total = store.splits().get(args.split, 0)
+    elif args.reservoir:
+        records = reservoir_sample(store.iter_records(args.split), args.sample_size, seed=RANDOM_SEED)
+        total = len(records)
+    else:
+        records = store.sample(args.sample_size, split=args.split, seed=RANDOM_SEED)
+        total = len(records)
+
+    if args.shard:
+        return shard_records(records, *args.shard), None
+    return iter(records), total
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the ConvFinQA ablation study.")
+    parser.add_argument("--cache", choices=["off"] + [m.value for m in CacheMode],
+                        default=CacheMode.READ_WRITE.value,
+                        help="Response cache mode ('replay' never calls the API)")
+    parser.add_argument("--cache-max-mb", type=int, default=512,
+                        help="Size bound of the response cache before LRU eviction")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY,
+                        help="Maximum in-flight API requests across all conditions")
+    parser.add_argument("--max-active-records", type=int, default=MAX_ACTIVE_RECORDS,
+                        help="Maximum conversations in progress across all conditions")
+    parser.add_argument("--rate-limit", type=_parse_model_limit, action="append", default=[],
+                        metavar="MODEL=RPM", help="Override a per-model requests/minute budget")
+    parser.add_argument("--token-limit", type=_parse_model_limit, action="append", default=[],
+                        metavar="MODEL=TPM", help="Override a per-model tokens/minute budget")
+    parser.add_argument("--max-attempts", type=int, default=RetryPolicy.max_attempts,
+                        help="Attempts per API call before the record fails (transient errors only)")
+    parser.add_argument("--call-deadline", type=float, default=RetryPolicy.deadline,
+                        help="Seconds a single API call may take across all retries")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip records already journaled by an interrupted run")
+    parser.add_argument("--payload-layout", choices=[layout.value for layout in PayloadLayout],
+                        default=PayloadLayout.INTERLEAVED.value,
+                        help="'prefix' keeps the document as a byte-identical prompt-cache prefix")
+    parser.add_argument("--reflection", choices=[mode.value for mode in ReflectionMode],
+                        default=ReflectionMode.SEQUENTIAL.value,
+                        help="'speculative' only calls the reviewer when local checks of the expression fail")
+    parser.add_argument("--table-format", type=_parse_table_format, action="append", default=[],
+                        metavar="CONDITION=FORMAT",
+                        help="Render a condition's table as markdown, csv, tsv, json or repr (repeatable); "
+                             "overridden conditions are saved with a .table-FMT suffix")
+    parser.add_argument("--context-budget", type=int,
+                        help="Token budget for table plus pre/post text; prunes text to the sentences most "
+                             "relevant to each turn (results are saved with a .budgetN suffix)")
+    parser.add_argument("--no-stage-sharing", action="store_true",
+                        help="Give every condition its own calls instead of sharing byte-identical stage "
+                             "calls across conditions (independent samples per condition)")
+    parser.add_argument("--split", default="train", help="Dataset split to evaluate")
+    parser.add_argument("--sample-size", type=int, default=SAMPLE_SIZE,
+                        help="Number of records to sample from the split")
+    parser.add_argument("--reservoir", action="store_true",
+                        help="Draw the sample in one streaming pass instead of via the index")
+    parser.add_argument("--full", action="store_true",
+                        help="Evaluate every record of the split instead of a sample")
+    parser.add_argument("--shard", type=_parse_shard, metavar="i/N",
+                        help="Only evaluate records owned by shard i of N")
+    parser.add_argument("--export-spans", action="store_true",
+                        help=f"Write per-call latency/token spans as JSONL under data/{TRACE_DIR.name}/")
+    parser.add_argument("--base-url", help="Send requests to a compatible endpoint, e.g. the benchmark mock server")
+    parser.add_argument("--batch", choices=["off", "openai", "local"], default="off",
+                        help="Run the single-call baseline conditions as offline batch jobs "
+                             f"('local' executes them from files under data/{BATCH_DIR.name}/)")
+    parser.add_argument("--batch-poll", type=float, default=POLL_SECONDS,
+                        help="Seconds between batch status checks")
+    return parser.parse_args()
+
 def main():
+    logging.basicConfig(
+        level=logging.INFO, 
+        filename=DATA_DIR / "evaluation.log",
+        filemode='w'
+    )
+    args = parse_args()
     if not DATA_PATH.exists():
         CONSOLE.print(f"[bold red]Error: Dataset not found at {DATA_PATH}[/bold red]")
         return
 
-    with open(DATA_PATH, "r") as f:
-        all_data = json.load(f).get("train", [])
+    store = DatasetStore(DATA_PATH)
+    contexts = ContextStore(store)
+    records, total = select_records(store, args)
+    output_suffix = f".shard{args.shard[0]}of{args.shard[1]}" if args.shard else ""
+    # Pruned runs get their own journals and results, to compare against the full-context run
+    if args.context_budget is not None:
+        output_suffix += f".budget{args.context_budget}"
 
-    final_comparison_data = []
+    cache = None
+    if args.cache != "off":
+        cache = ResponseCache(CACHE_PATH, CacheMode(args.cache), args.cache_max_mb * 1024 * 1024)
 
-    for config in STUDY_MATRIX:
-        runner = EvaluationRunner(config)
-        metrics = runner.run(all_data)
-        
-        # Save results to list for the final table
-        final_comparison_data.append({
-            "metadata": config,
-            "accuracy": round(metrics.final_accuracy, 2),
-            "metrics": metrics
-        })
-        
-        # Save individual JSON file
-        EvaluationReporter.save_results(
-            DATA_DIR / f"eval_results_cond_{int(config['id'])}.json",
-            config, metrics, runner.detailed_results
-        )
+    rate_limits = {**MODEL_RATE_LIMITS, **dict(args.rate_limit)}
+    token_limits = {**MODEL_TOKEN_LIMITS, **dict(args.token_limit)}
+    retry = RetryPolicy(max_attempts=args.max_attempts, deadline=args.call_deadline)
+    batch = None
+    if args.batch != "off":
+        batch_client = OpenAI(base_url=args.base_url)
+        backend = (OpenAIBatchBackend(batch_client) if args.batch == "openai"
+                   else LocalBatchBackend(BATCH_DIR, batch_client))
+        batch = BatchExecutor(backend, cache, poll_interval=args.batch_poll)
+    stages = None if args.no_stage_sharing else StageMemo()
+    final_comparison_data = asyncio.run(run_study(
+        records, cache, args.max_concurrency, args.max_active_records, rate_limits,
+        args.resume, total, output_suffix, PayloadLayout(args.payload_layout), args.export_spans,
+        args.base_url, token_limits, retry, ReflectionMode(args.reflection), batch, contexts,
+        dict(args.table_format), args.context_budget, stages
+    ))
+    contexts.close()
+    store.close()
 
     # Final report
     EvaluationReporter.print_comparative_table(final_comparison_data)
+    EvaluationReporter.print_latency_table(final_comparison_data)
+    failed = sum(res["failed_records"] for res in final_comparison_data)
+    if failed:
+        CONSOLE.print(f"[bold yellow]{failed} record run(s) failed after retries and were not scored; "
+                      f"rerun with --resume to retry them.[/bold yellow]")
+    if stages:
+        CONSOLE.print(
+            f"Stage sharing: {stages.stats.computed} calls made, {stages.stats.saved} identical calls "
+            f"reused across conditions ({stages.stats.joined} in flight, {stages.stats.reused} finished)"
+        )
+    if cache:
+        CONSOLE.print(
+            f"Response cache: {cache.stats.hits} hits / {cache.stats.misses} misses "
+            f"({cache.stats.hit_rate:.1f}% hit rate, {cache.stats.evictions} evicted)"
+        )
+        cache.close()
     CONSOLE.print("\n[bold green]✅ Study Complete. Data analysis files generated in /data.[/bold green]")
 
 if __name__ == "__main__":
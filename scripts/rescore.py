@@ -0,0 +1,94 @@
+# scripts/rescore.py
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from src.utils.rescoring import DEFAULT_TOLERANCE, load_results, rescore, tolerance_sweep
+
+# --- Constants ---
+CONSOLE = Console()
+ROOT_DIR = Path(__file__).parent.parent
+DATA_DIR = ROOT_DIR / "data"
+DEFAULT_SWEEP = [0.001, 0.005, 0.01, 0.02, 0.05, 0.1]
+
+
+def _condition_files(data_dir: Path) -> list[Path]:
+    paths = data_dir.glob("eval_results_cond_*.json")
+    return sorted(paths, key=lambda p: int(p.stem.rsplit("_", 1)[-1].split(".")[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored evaluation results without model calls.")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative tolerance used for the metrics table")
+    parser.add_argument("--sweep", type=float, nargs="*", default=DEFAULT_SWEEP,
+                        help="Tolerances for the accuracy-vs-tolerance curves")
+    parser.add_argument("--output", type=Path, help="Write metrics and curves to this JSON file")
+    args = parser.parse_args()
+
+    paths = _condition_files(args.data_dir)
+    if not paths:
+        CONSOLE.print(f"[bold red]No eval_results_cond_*.json files in {args.data_dir}[/bold red]")
+        return
+
+    start = time.perf_counter()
+    results = load_results(paths)
+    loaded = time.perf_counter()
+    metrics = rescore(results, args.tolerance)
+    curves = tolerance_sweep(results, args.sweep)
+    scored = time.perf_counter()
+
+    table = Table(title=f"Re-scored at tolerance {args.tolerance}", header_style="bold magenta")
+    table.add_column("Condition", style="cyan", no_wrap=True)
+    table.add_column("Accuracy", justify="right", style="green")
+    table.add_column("Hallucinations", justify="right", style="red")
+    table.add_column("Scale Errors", justify="right", style="yellow")
+    table.add_column("Recovery Rate", justify="right", style="blue")
+    for cond_id, m in metrics.items():
+        table.add_row(results.names[cond_id], f"{m.final_accuracy:.2f}%", str(m.hallucinations),
+                      str(m.scale_errors), f"{m.recovery_rate:.1f}%")
+    CONSOLE.print(table)
+
+    sweep = Table(title="Accuracy vs. tolerance", header_style="bold magenta")
+    sweep.add_column("Condition", style="cyan", no_wrap=True)
+    for tol in args.sweep:
+        sweep.add_column(f"{tol:g}", justify="right")
+    for cond_id, curve in curves.items():
+        sweep.add_row(results.names[cond_id], *(f"{acc:.1f}%" for acc in curve))
+    CONSOLE.print(sweep)
+
+    CONSOLE.print(
+        f"{len(results)} turns: loaded in {loaded - start:.3f}s, "
+        f"scored {len(args.sweep) + 1} tolerances in {scored - loaded:.4f}s"
+    )
+
+    if args.output:
+        output = {
+            str(cond_id): {
+                "name": results.names[cond_id],
+                "accuracy": round(m.final_accuracy, 2),
+                "metrics": {
+                    "total_turns": m.total_turns,
+                    "correct": m.correct,
+                    "hallucinations": m.hallucinations,
+                    "scale_errors": m.scale_errors,
+                    "recovery_attempts": m.recovery_attempts,
+                    "successful_recoveries": m.successful_recoveries
+                },
+                "tolerance_curve": dict(zip(map(str, args.sweep), curves[cond_id].round(2).tolist()))
+            }
+            for cond_id, m in metrics.items()
+        }
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=4)
+        CONSOLE.print(f"[bold green]Saved re-scored metrics to {args.output}[/bold green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# scripts/table_formats.py
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from rich.console import Console
+from rich.table import Table
+
+from scripts.evaluate import DATA_PATH, RANDOM_SEED
+from scripts.benchmark import synthetic_records
+from src.agent.context_builder import ContextBuilder
+from src.utils.dataset import DatasetStore
+from src.utils.parser import TableFormat, normalize_table, render_table
+
+try:
+    import tiktoken
+except ImportError:     # Optional; falls back to the ~4 characters per token estimate
+    tiktoken = None
+
+# --- Constants ---
+CONSOLE = Console()
+SAMPLE_SIZE = 500
+ENCODING = "o200k_base"     # Tokenizer of the GPT-5 family
+
+
+def token_counter() -> tuple[Callable[[str], int], bool]:
+    """Returns a token counting function and whether it is exact."""
+    if tiktoken is None:
+        return lambda text: len(text) // 4, False
+    encoding = tiktoken.get_encoding(ENCODING)
+    return lambda text: len(encoding.encode(text)), True
+
+
+def measure(records: List[Dict], count_tokens: Callable[[str], int]) -> List[Dict]:
+    """Tokens, characters and render time of every table format over the records."""
+    contexts = [ContextBuilder.build(record) for record in records]
+    results = []
+    for fmt in TableFormat:
+        if fmt == TableFormat.REPR:
+            render = lambda context: context.json_table
+        else:
+            render = lambda context, fmt=fmt: render_table(context.table, fmt)
+
+        start = time.perf_counter()
+        texts = [render(context) for context in contexts]
+        elapsed = time.perf_counter() - start
+
+        tokens = [count_tokens(text) for text in texts]
+        results.append({
+            "format": fmt.value,
+            "tokens_mean": statistics.fmean(tokens),
+            "tokens_total": sum(tokens),
+            "chars_mean": statistics.fmean(len(text) for text in texts),
+            "render_us": elapsed / len(contexts) * 1e6,
+        })
+
+    start = time.perf_counter()
+    for record in records:
+        normalize_table(record.get("doc", {}).get("table", {}))
+    normalize_us = (time.perf_counter() - start) / len(records) * 1e6
+    CONSOLE.print(f"Layout normalization: {normalize_us:.1f} µs per table (once per record)")
+    return results
+
+
+def print_results(results: List[Dict], exact: bool):
+    baseline = next(r for r in results if r["format"] == TableFormat.MARKDOWN.value)
+    table = Table(title=f"Table Formats ({'exact' if exact else '≈ estimated'} tokens)", header_style="bold magenta")
+    table.add_column("Format", style="cyan")
+    table.add_column("Tokens/Table", justify="right", style="green")
+    table.add_column("vs Markdown", justify="right", style="yellow")
+    table.add_column("Chars/Table", justify="right")
+    table.add_column("Render (µs)", justify="right")
+
+    for res in sorted(results, key=lambda r: r["tokens_mean"]):
+        table.add_row(
+            res["format"], f"{res['tokens_mean']:,.1f}",
+            f"{res['tokens_total'] / baseline['tokens_total'] - 1:+.1%}" if baseline["tokens_total"] else "-",
+            f"{res['chars_mean']:,.0f}", f"{res['render_us']:.1f}"
+        )
+    CONSOLE.print(table)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare the token cost of the table render formats.")
+    parser.add_argument("--sample-size", type=int, default=SAMPLE_SIZE)
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--synthetic", action="store_true", help="Use generated records instead of the dataset")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.synthetic or not DATA_PATH.exists():
+        CONSOLE.print("[yellow]Using synthetic records[/yellow]")
+        records = synthetic_records(args.sample_size)
+    else:
+        store = DatasetStore(DATA_PATH)
+        records = store.sample(args.sample_size, split=args.split, seed=RANDOM_SEED)
+        store.close()
+
+    count_tokens, exact = token_counter()
+    if not exact:
+        CONSOLE.print("[yellow]tiktoken is not installed; token counts are estimated from length[/yellow]")
+    print_results(measure(records, count_tokens), exact)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,27 @@
+import os
+import re
+import sys
 import json
+import time
 import random
+import asyncio
 import logging
+import argparse
+from decimal import Decimal
+from itertools import repeat
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Optional
 
 from rich.console import Console
 from rich.progress import track
 
+from src.utils.dataset import DatasetStore, read_spans
 from src.utils.parser import table_to_markdown
 from src.models.schemas import TableEquivalence 
-from src.agent.client import ReasoningClient
+from src.agent.cache import CacheMode, ResponseCache
+from src.agent.client import AsyncReasoningClient
+from src.agent.context_builder import ContextBuilder, ContextStore
 
 # --- Configuration ---
 CONSOLE = Console()
@@ -20,31 +32,68 @@ PROMPT_DIR = ROOT_DIR / "src" / "agent" / "prompts"
 PATHS = {
     "data": DATA_DIR / "convfinqa_dataset.json",
     "log": DATA_DIR / "parser_failures.json",
-    "system_prompt": PROMPT_DIR / "validator_system_prompt.xml"
+    "screen_log": DATA_DIR / "parser_screen_failures.json",
+    "system_prompt": PROMPT_DIR / "validator_system_prompt.xml",
+    "cache": DATA_DIR / "cache" / "responses.sqlite"
 }
 
 RANDOM_SEED = 42
+MAX_CONCURRENCY = 16
+SCREEN_CHUNK = 256      # Records per worker task in full-dataset screening
+
+# Numbers as rendered in Markdown; a leading "-" only counts when not joining two numbers (2019-2020)
+_NUMBER = re.compile(r"(?<![\d,.])-?(?:\d[\d,]*(?:\.\d+)?|inf|nan)")
 
 class TableAuditor:
-    def __init__(self):
-        self.client = ReasoningClient()
+    def __init__(self, client: AsyncReasoningClient):
+        self.client = client
         if not PATHS["system_prompt"].exists():
             raise FileNotFoundError(f"Missing validator prompt: {PATHS['system_prompt']}")
         self.instructions = PATHS["system_prompt"].read_text(encoding="utf-8")
 
-    def audit(self, json_table: Dict, md_table: str) -> TableEquivalence:
+    async def audit(self, json_table: Dict, md_table: str) -> TableEquivalence:
         payload = (
             f"JSON SOURCE:\n{json.dumps(json_table, indent=2)}\n\n"
             f"MARKDOWN OUTPUT:\n{md_table}"
         )
-        return self.client.get_structured_response(
+        return await self.client.aget_structured_response(
             instructions=self.instructions,
             input_text=payload,
             response_model=TableEquivalence,
             effort="medium"
         )
 
+    async def audit_all(self, items: List[Dict]) -> List[TableEquivalence]:
+        """Audits screened items concurrently, preserving input order."""
+        return await asyncio.gather(
+            *(self.audit(item["record"]["doc"]["table"], item["md"]) for item in items)
+        )
+
 class HeuristicValidator:
+    @staticmethod
+    def normalize_number(text: str) -> str:
+        """
+        Canonical numeric token, following _format_financial_value: no thousands
+        separators, no trailing fractional zeros, and no negative zero.
+        """
+        text = text.replace(",", "")
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        return "0" if text == "-0" else text
+
+    @staticmethod
+    def value_token(val: Any) -> str:
+        text = repr(val) if isinstance(val, float) else str(val)
+        if "e" in text:
+            # Fixed-point, so 1e-05 compares like a rendered "0.00001"
+            text = format(Decimal(text), "f")
+        return HeuristicValidator.normalize_number(text)
+
+    @staticmethod
+    def numeric_tokens(md_table: str) -> set[str]:
+        """Every number in the rendered table, tokenized once per table."""
+        return {HeuristicValidator.normalize_number(n) for n in _NUMBER.findall(md_table)}
+
     @staticmethod
     def get_errors(json_table: Dict, md_table: str) -> List[str]:
         errors = []
@@ -59,28 +108,99 @@ class HeuristicValidator:
             errors.append("Structural mismatch: Inconsistent pipe counts across rows.")
 
         # Data Integrity: Check for numeric persistence
-        clean_md = md_table.replace(",", "")
+        tokens = HeuristicValidator.numeric_tokens(md_table)
         for col in json_table.values():
             for val in col.values():
                 if isinstance(val, (int, float)):
-                    # Check for string representation to avoid int/float truncation issues
-                    if str(val) not in clean_md:
+                    # Whole-token match, so 5 is not "found" inside 150 and 12.0 matches "12"
+                    if HeuristicValidator.value_token(val) not in tokens:
                         errors.append(f"Missing numeric value: {val}")
                         return errors # Exit early on first missing value to save time
         return errors
 
-def run_validation_suite(sample_size: int = 1000, success_audit_limit: int = 15):
-    random.seed(RANDOM_SEED)
-    
+def _screen_spans(data_path: Path, split: str, spans: List[tuple[int, int]]) -> List[Dict]:
+    """Worker task: screens a chunk of records read straight from the dataset file."""
+    failures = []
+    for record in read_spans(data_path, spans):
+        table = record.get("doc", {}).get("table", {})
+        errors = HeuristicValidator.get_errors(table, table_to_markdown(table))
+        if errors:
+            failures.append({"record_id": record.get("id", "unknown"), "split": split, "heuristic_errors": errors})
+    return failures
+
+def screen_dataset(data_path: Path, workers: int | None = None) -> tuple[int, List[Dict]]:
+    """
+    Heuristic screening of every record in every split, spread over a process pool.
+    Tables are rendered with the current parser rather than read from the ContextStore,
+    so the result reflects the code being changed. Returns (records screened, failures).
+    """
+    store = DatasetStore(data_path)
+    jobs = [
+        (split, spans[start:start + SCREEN_CHUNK])
+        for split in store.splits()
+        for spans in [store.spans(split)]
+        for start in range(0, len(spans), SCREEN_CHUNK)
+    ]
+    total = len(store)
+    store.close()
+
+    splits, chunks = [split for split, _ in jobs], [chunk for _, chunk in jobs]
+    if workers == 1:
+        results = map(_screen_spans, repeat(data_path), splits, chunks)
+        failures = [f for result in track(results, total=len(jobs), description="Screening") for f in result]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_screen_spans, repeat(data_path), splits, chunks)
+            failures = [f for result in track(results, total=len(jobs), description="Screening") for f in result]
+    return total, failures
+
+def run_full_screen(workers: int | None = None, max_failures: int | None = None) -> int:
+    """Screens the whole dataset; returns a non-zero exit code when failures exceed `max_failures`."""
+    if not PATHS["data"].exists():
+        CONSOLE.print(f"[bold red]Source data not found: {PATHS['data']}[/bold red]")
+        return 1
+
+    start = time.perf_counter()
+    total, failures = screen_dataset(PATHS["data"], workers)
+    elapsed = time.perf_counter() - start
+
+    with open(PATHS["screen_log"], "w") as f:
+        json.dump(failures, f, indent=4)
+    CONSOLE.print(f"\n[bold green]Full-Dataset Screening[/bold green] ({workers or os.cpu_count()} workers)")
+    CONSOLE.print(f"Total Screened:     {total} in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} records/s)")
+    CONSOLE.print(f"Heuristic Failures: {len(failures)} (logged to {PATHS['screen_log']})")
+
+    if max_failures is not None and len(failures) > max_failures:
+        CONSOLE.print(f"[bold red]{len(failures)} failures exceed the allowed {max_failures}[/bold red]")
+        return 1
+    return 0
+
+def run_validation_suite(sample_size: int = 1000, success_audit_limit: int = 15,
+                         cache: ResponseCache | None = None):
+    asyncio.run(_run_validation_suite(sample_size, success_audit_limit, cache))
+    if cache:
+        CONSOLE.print(
+            f"Response cache: {cache.stats.hits} hits / {cache.stats.misses} misses "
+            f"({cache.stats.hit_rate:.1f}% hit rate)"
+        )
+
+async def _run_validation_suite(sample_size: int, success_audit_limit: int,
+                                cache: ResponseCache | None):
+    async with AsyncReasoningClient(max_concurrency=MAX_CONCURRENCY, cache=cache) as client:
+        await _validate(client, sample_size, success_audit_limit)
+
+async def _validate(client: AsyncReasoningClient, sample_size: int, success_audit_limit: int):
     if not PATHS["data"].exists():
         CONSOLE.print(f"[bold red]Source data not found: {PATHS['data']}[/bold red]")
         return
 
-    with open(PATHS["data"], "r") as f:
-        all_data = json.load(f).get("train", [])
-        records = random.sample(all_data, min(sample_size, len(all_data)))
+    store = DatasetStore(PATHS["data"])
+    contexts = ContextStore(store)
+    records = store.sample(sample_size, split="train", seed=RANDOM_SEED)
+    store.close()
+    builder = ContextBuilder(contexts)
 
-    auditor = TableAuditor()
+    auditor = TableAuditor(client)
     validator = HeuristicValidator()
     
     heuristic_successes = []
@@ -92,7 +212,7 @@ def run_validation_suite(sample_size: int = 1000, success_audit_limit: int = 15)
 
     # Phase 1: Heuristic Screening
     for record in track(records, description="Heuristic Screening"):
-        md = table_to_markdown(record["doc"]["table"])
+        md = builder.load(record).markdown_table
         errors = validator.get_errors(record["doc"]["table"], md)
         
         item = {"record": record, "md": md, "errors": errors}
@@ -101,9 +221,12 @@ def run_validation_suite(sample_size: int = 1000, success_audit_limit: int = 15)
         else:
             heuristic_failures.append(item)
 
+    contexts.close()
+
     # Phase 2: LLM Audit of Failures
-    for item in track(heuristic_failures, description="Auditing Failures"):
-        result = auditor.audit(item["record"]["doc"]["table"], item["md"])
+    with CONSOLE.status(f"Auditing {len(heuristic_failures)} failures..."):
+        failure_audits = await auditor.audit_all(heuristic_failures)
+    for item, result in zip(heuristic_failures, failure_audits):
         if not result.is_equivalent:
             final_failures.append({
                 "record_id": item["record"]["id"],
@@ -118,8 +241,9 @@ def run_validation_suite(sample_size: int = 1000, success_audit_limit: int = 15)
     # Phase 3: Spot-check Successes (Silent Failure Detection)
     success_sample = random.sample(heuristic_successes, min(success_audit_limit, len(heuristic_successes)))
     silent_failures = 0
-    for item in track(success_sample, description="Spot-checking Successes"):
-        result = auditor.audit(item["record"]["doc"]["table"], item["md"])
+    with CONSOLE.status(f"Spot-checking {len(success_sample)} successes..."):
+        success_audits = await auditor.audit_all(success_sample)
+    for item, result in zip(success_sample, success_audits):
         if not result.is_equivalent:
             silent_failures += 1
             final_failures.append({
@@ -147,4 +271,21 @@ def run_validation_suite(sample_size: int = 1000, success_audit_limit: int = 15)
     CONSOLE.print("\n")
 
 if __name__ == "__main__":
-    run_validation_suite()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Validate the JSON -> Markdown table parser.")
+    parser.add_argument("--cache", choices=["off"] + [m.value for m in CacheMode],
+                        default=CacheMode.READ_WRITE.value,
+                        help="Response cache mode ('replay' never calls the API)")
+    parser.add_argument("--full", action="store_true",
+                        help="Heuristically screen every record of every split (no LLM audit)")
+    parser.add_argument("--workers", type=int, help="Processes for --full (default: all cores)")
+    parser.add_argument("--max-failures", type=int,
+                        help="With --full, exit with status 1 when more records than this fail screening")
+    args = parser.parse_args()
+
+    if args.full:
+        sys.exit(run_full_screen(args.workers, args.max_failures))
+
+    response_cache = None
+    if args.cache != "off":
+        response_cache = ResponseCache(PATHS["cache"], CacheMode(args.cache))
+    run_validation_suite(cache=response_cache)
\ No newline at end of file
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Type, TypeVar
+
+import httpx
+import openai
+from openai import OpenAI
+from openai.types.responses import Response
+from pydantic import BaseModel, ValidationError
+
+from src.agent.cache import ResponseCache
+from src.agent.client import TokenUsage, build_request_body
+from src.agent.orchestrator import ConvFinQAManager
+from src.agent.resilience import RETRYABLE_STATUS, ClientError
+from src.models.schemas import ConversationState
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+BATCH_ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+MAX_BATCH_REQUESTS = 50_000     # Provider limit per input file
+POLL_SECONDS = 30.0
+MAX_ROUNDS = 3                  # Submissions per wave for requests that failed transiently
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchError(ClientError):
+    """A batch request that failed or came back without a usable structured output."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _jsonl(lines: Iterable[dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+
+
+class BatchBackend(ABC):
+    """
+    Where batch input files go. `submit` takes the request lines of one model and
+    returns a batch id, `status` reports the provider status ("completed", "failed",
+    "expired" and "cancelled" are terminal) and `results` yields the output lines
+    of a finished batch, one per request that produced a response or an error.
+    """
+
+    @abstractmethod
+    def submit(self, lines: list[dict[str, Any]]) -> str:
+        ...
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        ...
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[dict[str, Any]]:
+        ...
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """The provider's Batch API: uploaded input file, 24h completion window, downloaded output."""
+
+    def __init__(self, client: OpenAI | None = None):
+        self.client = client or OpenAI()
+
+    def submit(self, lines: list[dict[str, Any]]) -> str:
+        upload = self.client.files.create(file=("batch_input.jsonl", _jsonl(lines)), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id, endpoint=BATCH_ENDPOINT, completion_window=COMPLETION_WINDOW
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[dict[str, Any]]:
+        batch = self.client.batches.retrieve(batch_id)
+        # Successful requests land in the output file, failed ones in the error file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for tests and offline runs. Input and output files are kept
+    under `directory` in the provider's JSONL formats, and a batch is executed line
+    by line against `client` (e.g. the benchmark mock server) when first polled.
+    """
+
+    def __init__(self, directory: Path, client: OpenAI):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.client = client
+
+    def _input(self, batch_id: str) -> Path:
+        return self.directory / f"{batch_id}.input.jsonl"
+
+    def _output(self, batch_id: str) -> Path:
+        return self.directory / f"{batch_id}.output.jsonl"
+
+    def submit(self, lines: list[dict[str, Any]]) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+        self._input(batch_id).write_bytes(_jsonl(lines))
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if not self._output(batch_id).exists():
+            self._execute(batch_id)
+        return "completed"
+
+    def results(self, batch_id: str) -> Iterator[dict[str, Any]]:
+        with open(self._output(batch_id), encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def _execute(self, batch_id: str) -> None:
+        with open(self._input(batch_id), encoding="utf-8") as f:
+            outputs = [self._call(f"{batch_id}_req_{n}", json.loads(line)) for n, line in enumerate(f)]
+        # Written atomically so a crash mid-batch re-runs it instead of reading half a file
+        partial = self._output(batch_id).with_suffix(".tmp")
+        partial.write_bytes(_jsonl(outputs))
+        partial.replace(self._output(batch_id))
+
+    def _call(self, request_id: str, line: dict[str, Any]) -> dict[str, Any]:
+        result = {"id": request_id, "custom_id": line["custom_id"], "response": None, "error": None}
+        try:
+            response = self.client.post(line["url"].removeprefix("/v1"), body=line["body"], cast_to=httpx.Response)
+            result["response"] = {"status_code": response.status_code, "body": response.json()}
+        except openai.APIStatusError as exc:
+            result["response"] = {"status_code": exc.status_code, "body": exc.body}
+        except openai.APIError as exc:
+            result["error"] = {"code": type(exc).__name__, "message": str(exc)}
+        return result
+
+
+def parse_output(line: dict[str, Any], response_model: Type[T]) -> tuple[T, TokenUsage]:
+    """Validates one batch output line into its structured output and token usage."""
+    custom_id, response = line.get("custom_id"), line.get("response") or {}
+    if line.get("error"):
+        raise BatchError(f"{custom_id}: {line['error']}", retryable=True)
+    status = response.get("status_code")
+    if status != 200:
+        raise BatchError(f"{custom_id}: HTTP {status}: {response.get('body')}",
+                         retryable=status in RETRYABLE_STATUS)
+
+    try:
+        body = Response.model_validate(response.get("body"))
+        parsed = response_model.model_validate_json(body.output_text)
+    except ValidationError as exc:
+        # Malformed bodies, refusals and truncated outputs, retried like EmptyResponseError in live calls
+        raise BatchError(f"{custom_id}: no structured output ({exc.error_count()} errors)", retryable=True)
+    return parsed, TokenUsage.from_response(body)
+
+
+@dataclass
+class _Conversation:
+    manager: ConvFinQAManager
+    position: int
+    record: dict[str, Any]
+    state: ConversationState
+    questions: list[str]
+    error: Exception | None = None
+
+    @property
+    def finished(self) -> bool:
+        return len(self.state.history) >= len(self.questions)
+
+
+class BatchExecutor:
+    """
+    Runs single-call (baseline) conditions through a BatchBackend in waves. Wave k
+    carries turn k of every unfinished conversation, because its payload embeds the
+    ans_N values of the earlier turns; a wave is split into one batch per model.
+    Responses are read from and written to the ResponseCache like live calls, and
+    transiently failed requests are resubmitted up to `max_rounds` times per wave
+    before their conversation fails.
+    """
+
+    def __init__(self, backend: BatchBackend, cache: ResponseCache | None = None,
+                 poll_interval: float = POLL_SECONDS, max_rounds: int = MAX_ROUNDS):
+        self.backend = backend
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.max_rounds = max_rounds
+        self.usage: dict[str, TokenUsage] = {}
+        self.batches_submitted = 0
+
+    async def run(self, jobs: Iterable[tuple[ConvFinQAManager, int, dict[str, Any]]],
+                  on_finished: Callable[[ConvFinQAManager, int, dict[str, Any], ConversationState], None],
+                  on_failed: Callable[[ConvFinQAManager, dict[str, Any], Exception], None]) -> None:
+        """Answers every (manager, position, record) job, reporting each conversation as it ends."""
+        active = []
+        for manager, position, record in jobs:
+            questions = record.get("dialogue", {}).get("conv_questions", [])
+            active.append(_Conversation(manager, position, record, manager.new_state(record), questions))
+
+        turn = 0
+        while active:
+            wave = [conv for conv in active if not conv.finished]
+            if wave:
+                logger.info(f"Batch wave {turn}: {len(wave)} conversations")
+                await self._run_wave(turn, wave)
+            for conv in active:
+                if conv.error is not None:
+                    on_failed(conv.manager, conv.record, conv.error)
+                elif conv.finished:
+                    on_finished(conv.manager, conv.position, conv.record, conv.state)
+            active = [conv for conv in active if conv.error is None and not conv.finished]
+            turn += 1
+
+    async def _run_wave(self, turn: int, wave: list[_Conversation]) -> None:
+        pending: dict[str, tuple[_Conversation, dict[str, Any], str | None]] = {}
+        for i, conv in enumerate(wave):
+            question = conv.questions[turn]
+            try:
+                request = conv.manager.baseline_request(conv.state, question)
+                cache_key, cached = self._cache_lookup(request)
+                if cached is not None:
+                    conv.manager.complete_baseline_turn(conv.state, question, cached, None, time.time(), 0.0)
+                else:
+                    pending[f"turn{turn}-{i}"] = (conv, request, cache_key)
+            except Exception as e:
+                conv.error = e
+
+        started_at, start = time.time(), time.perf_counter()
+        for attempt in range(self.max_rounds):
+            if not pending:
+                break
+            outputs = await self._execute({custom_id: request for custom_id, (_, request, _) in pending.items()})
+            retry = {}
+            for custom_id, (conv, request, cache_key) in pending.items():
+                try:
+                    line = outputs.get(custom_id)
+                    if line is None:
+                        raise BatchError(f"{custom_id}: missing from batch output", retryable=True)
+                    parsed, usage = parse_output(line, request["response_model"])
+                except BatchError as e:
+                    if e.retryable and attempt + 1 < self.max_rounds:
+                        retry[custom_id] = (conv, request, cache_key)
+                    else:
+                        conv.error = e
+                    continue
+
+                self.usage.setdefault(request["model"], TokenUsage()).add(usage)
+                if cache_key is not None:
+                    self.cache.put(cache_key, parsed)
+                conv.manager.complete_baseline_turn(
+                    conv.state, conv.questions[turn], parsed, usage, started_at,
+                    (time.perf_counter() - start) * 1000
+                )
+            if retry:
+                logger.warning(f"Batch wave {turn}: resubmitting {len(retry)} failed requests")
+            pending = retry
+
+    def _cache_lookup(self, request: dict[str, Any]) -> tuple[str | None, BaseModel | None]:
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(request["model"], request["effort"], request["instructions"],
+                                     request["input_text"], request["response_model"])
+        return key, self.cache.get(key, request["response_model"])
+
+    async def _execute(self, requests: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        """Submits the requests (one batch per model and size limit) and waits for every output line."""
+        by_model: dict[str, list[dict[str, Any]]] = {}
+        for custom_id, request in requests.items():
+            by_model.setdefault(request["model"], []).append({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": build_request_body(
+                    request["instructions"], request["input_text"], request["response_model"],
+                    request["model"], request["effort"], request["prompt_cache_key"]
+                ),
+            })
+
+        waiting = set()
+        for lines in by_model.values():
+            for offset in range(0, len(lines), MAX_BATCH_REQUESTS):
+                waiting.add(await asyncio.to_thread(self.backend.submit, lines[offset:offset + MAX_BATCH_REQUESTS]))
+                self.batches_submitted += 1
+
+        outputs = {}
+        while waiting:
+            for batch_id in list(waiting):
+                status = await asyncio.to_thread(self.backend.status, batch_id)
+                if status not in TERMINAL_STATUSES:
+                    continue
+                waiting.discard(batch_id)
+                if status != "completed":
+                    logger.warning(f"Batch {batch_id} ended as {status}")
+                for line in await asyncio.to_thread(list, self.backend.results(batch_id)):
+                    outputs[line["custom_id"]] = line
+            if waiting:
+                await asyncio.sleep(self.poll_interval)
+        return outputs
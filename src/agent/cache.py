@@ -0,0 +1,224 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Type, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+STAGE_MEMO_SIZE = 4096      # Finished stage calls kept for conditions that reach them later
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_fingerprint(response_model: Type[BaseModel]) -> str:
+    return json.dumps(response_model.model_json_schema(), sort_keys=True)
+
+
+class CacheMode(str, Enum):
+    """
+    READ_WRITE: serve hits, call the API on misses and store the result.
+    READ_ONLY:  serve hits, call the API on misses but never write.
+    REPLAY:     serve hits only; a miss raises CacheMissError instead of calling the API.
+    """
+    READ_WRITE = "readwrite"
+    READ_ONLY = "readonly"
+    REPLAY = "replay"
+
+
+class CacheMissError(LookupError):
+    """Raised in REPLAY mode when a request has no stored response."""
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return (self.hits / lookups * 100) if lookups > 0 else 0
+
+
+class ResponseCache:
+    """
+    Content-addressed, size-bounded store for validated structured outputs.
+    Entries are keyed by a hash of the full request (model, effort, instructions,
+    input and response schema) and evicted least-recently-used once the stored
+    payloads exceed `max_bytes`.
+    """
+
+    def __init__(self, path: Path, mode: CacheMode = CacheMode.READ_WRITE,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.mode = CacheMode(mode)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The sync orchestrator path calls the client from worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response_model TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, effort: str, instructions: str, input_text: str,
+                 response_model: Type[BaseModel]) -> str:
+        """Hashes every field that can change the structured output of a call."""
+        material = json.dumps({
+            "model": model,
+            "effort": effort,
+            "instructions": instructions,
+            "input": input_text,
+            "response_model": response_model.__name__,
+            "schema": _schema_fingerprint(response_model),
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, response_model: Type[T]) -> T | None:
+        """Returns the cached output, or None on a miss (raises in REPLAY mode)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.stats.misses += 1
+                if self.mode == CacheMode.REPLAY:
+                    raise CacheMissError(f"No cached {response_model.__name__} for key {key[:12]}")
+                return None
+
+            self.stats.hits += 1
+            if self.mode == CacheMode.READ_WRITE:
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+
+        try:
+            return response_model.model_validate_json(row[0])
+        except ValueError as e:
+            # Schema drifted without a key change (e.g. validators); treat as a miss
+            logger.warning(f"Discarding unreadable cache entry {key[:12]}: {e}")
+            return None
+
+    def put(self, key: str, value: BaseModel) -> None:
+        """Stores a validated output and evicts LRU entries beyond the size bound."""
+        if self.mode != CacheMode.READ_WRITE:
+            return
+
+        payload = value.model_dump_json()
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, type(value).__name__, payload, size, time.time())
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self.stats.writes += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._total_bytes = 0
+                return
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._total_bytes -= row[1]
+            self.stats.evictions += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class StageMemoStats:
+    computed: int = 0       # Calls actually sent to the client
+    joined: int = 0         # Identical calls that awaited one already in flight
+    reused: int = 0         # Identical calls served from a finished one
+
+    @property
+    def saved(self) -> int:
+        return self.joined + self.reused
+
+
+class StageMemo:
+    """
+    Single-flight memo of stage calls shared by the managers of a study. Conditions
+    whose stages issue a byte-identical call (the ResponseCache key: model, effort,
+    instructions, payload and schema) await one execution of it while it is in
+    flight, or reuse its result from a bounded LRU once it finished. Histories stay
+    per condition: they are part of the payload, so conversations that diverged
+    stop matching. Failed calls are not remembered. Use from a single event loop.
+    """
+
+    def __init__(self, max_entries: int = STAGE_MEMO_SIZE):
+        self.max_entries = max_entries
+        self.stats = StageMemoStats()
+        self._done: OrderedDict[str, Any] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Returns the result of `call` for `key` and whether this caller executed it."""
+        if key in self._done:
+            self._done.move_to_end(key)
+            self.stats.reused += 1
+            return self._done[key], False
+
+        future = self._pending.get(key)
+        owner = future is None
+        if owner:
+            future = self._pending[key] = asyncio.ensure_future(call())
+            future.add_done_callback(functools.partial(self._finished, key))
+            self.stats.computed += 1
+        else:
+            self.stats.joined += 1
+        # Shielded: a cancelled caller must not cancel the call for the conditions sharing it
+        return await asyncio.shield(future), owner
+
+    def _finished(self, key: str, future: asyncio.Future) -> None:
+        del self._pending[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._done[key] = future.result()
+        if len(self._done) > self.max_entries:
+            self._done.popitem(last=False)
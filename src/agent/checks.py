@@ -0,0 +1,60 @@
+import ast
+import math
+
+from src.agent.tools import MathTool, _SAFE_FUNCTIONS
+from src.models.schemas import AnalysisPlan
+from src.utils.eval_utils import detect_symbolic_hallucination
+
+# Literals a correct expression may use without a matching plan data point
+NEUTRAL_CONSTANTS = {0.0, 1.0, 2.0, 100.0}
+MAX_RATIO_FOR_PERCENT = 10.0    # A "percentage" beyond 1000% was almost surely multiplied by 100
+UNIT_SCALES = (1e3, 1e6, 1e9, 1e-3, 1e-6, 1e-9)
+
+
+def _matches(value: float, candidates: list[float]) -> bool:
+    return any(math.isclose(value, c, rel_tol=1e-9, abs_tol=1e-9) for c in candidates)
+
+
+def precheck_expression(expression: str, plan: AnalysisPlan | None, is_percentage: bool,
+                        ans_map: dict[str, float]) -> list[str]:
+    """
+    Deterministic audit of an analyst expression, using the reviewer's error taxonomy.
+    An empty list means the expression executes, uses only planned values (or
+    ans_N references) at their planned magnitude, and has a plausible scale.
+    """
+    issues = []
+    if detect_symbolic_hallucination(expression):
+        issues.append("SYMBOLIC_NAME")
+
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        return issues + ["SYNTAX_ERROR"]
+
+    names = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)} - set(_SAFE_FUNCTIONS)
+    if any(name not in ans_map for name in names):
+        return issues + ["REFERENCE_ERROR"]
+
+    try:
+        value = MathTool.calculate(expression, ans_map)
+    except ValueError:
+        return issues + ["SYNTAX_ERROR"]
+    if not math.isfinite(value):
+        issues.append("SYNTAX_ERROR")
+
+    planned = [abs(dp.value) for dp in plan.data_points] if plan else []
+    literals = [abs(float(n.value)) for n in ast.walk(tree)
+                if isinstance(n, ast.Constant) and isinstance(n.value, (int, float))]
+    for literal in literals:
+        if literal in NEUTRAL_CONSTANTS or _matches(literal, planned):
+            continue
+        if _matches(literal, [v * scale for v in planned for scale in UNIT_SCALES]):
+            issues.append("UNIT_DRIFT")
+        else:
+            # Not in the plan at all: the local check cannot vouch for it
+            issues.append("UNPLANNED_VALUE")
+
+    if is_percentage and abs(value) > MAX_RATIO_FOR_PERCENT:
+        issues.append("SCALE_ERROR")
+
+    return list(dict.fromkeys(issues))
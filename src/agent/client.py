@@ -1,23 +1,264 @@
+import asyncio
+import itertools
+import logging
 import os
-from typing import Type, TypeVar
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Type, TypeVar
+
 from pydantic import BaseModel
-from openai import OpenAI
+
+from src.agent.cache import ResponseCache
+from src.agent.rate_limit import RateLimiter, resolve_limiter
+from src.agent.resilience import (
+    CallMetrics, CircuitBreaker, CircuitOpenError, EmptyResponseError, RetryExhaustedError,
+    RetryPolicy, is_rate_limited, is_timeout, retry_after_seconds
+)
+
+logger = logging.getLogger(__name__)
 
 T = TypeVar("T", bound=BaseModel)
 
-class ReasoningClient:
+# Receives each chunk of output text while a streamed response arrives
+DeltaHandler = Callable[[str], None]
+OUTPUT_TEXT_DELTA = "response.output_text.delta"
+
+DEFAULT_MODEL = "gpt-5-mini-2025-08-07"
+BREAKER_THRESHOLD = 5           # Consecutive failed requests before a model's circuit opens
+BREAKER_RESET_SECONDS = 30.0
+
+
+def _get_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+    return api_key
+
+
+def _build_request(
+    instructions: str,
+    input_text: str,
+    response_model: Type[T],
+    target_model: str,
+    effort: str,
+    prompt_cache_key: str | None = None
+) -> dict[str, Any]:
+    """Assembles the Responses API kwargs shared by the sync and async clients."""
+    kwargs: dict[str, Any] = {
+        "model": target_model,
+        "instructions": instructions,
+        "input": input_text,
+        "text_format": response_model,
+    }
+
+    # gpt-5-mini doesn't support the reasoning effort parameter
+    if "mini" not in target_model.lower():
+        kwargs["reasoning"] = {"effort": effort}
+
+    # Routes calls sharing a prefix to the same provider cache
+    if prompt_cache_key:
+        kwargs["prompt_cache_key"] = prompt_cache_key
+
+    return kwargs
+
+
+def build_request_body(
+    instructions: str,
+    input_text: str,
+    response_model: Type[T],
+    target_model: str,
+    effort: str,
+    prompt_cache_key: str | None = None
+) -> dict[str, Any]:
+    """The raw /v1/responses body `responses.parse` would send, e.g. for batch input files."""
+    from openai.lib._parsing._responses import type_to_text_format_param
+
+    body = _build_request(instructions, input_text, response_model, target_model, effort, prompt_cache_key)
+    body["text"] = {"format": type_to_text_format_param(body.pop("text_format"))}
+    return body
+
+
+@dataclass
+class TokenUsage:
+    """Token accounting from the Responses API usage object."""
+    calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    reasoning_tokens: int = 0
+
+    @classmethod
+    def from_response(cls, response: Any) -> "TokenUsage":
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return cls(calls=1)
+        input_details = getattr(usage, "input_tokens_details", None)
+        output_details = getattr(usage, "output_tokens_details", None)
+        return cls(
+            calls=1,
+            input_tokens=usage.input_tokens or 0,
+            cached_tokens=getattr(input_details, "cached_tokens", 0) or 0,
+            output_tokens=usage.output_tokens or 0,
+            reasoning_tokens=getattr(output_details, "reasoning_tokens", 0) or 0,
+        )
+
+    def add(self, other: "TokenUsage") -> None:
+        self.calls += other.calls
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.reasoning_tokens += other.reasoning_tokens
+
+    @property
+    def cached_ratio(self) -> float:
+        return (self.cached_tokens / self.input_tokens * 100) if self.input_tokens > 0 else 0
+
+
+def _estimate_tokens(instructions: str, input_text: str) -> int:
+    # ~4 characters per token; only used to pre-charge the tokens-per-minute bucket
+    return (len(instructions) + len(input_text)) // 4
+
+
+class _ClientBase:
+    """
+    Cache lookup, usage bookkeeping and the retry/circuit-breaker policy shared by
+    the sync and async clients. Transient failures (429, 5xx, timeouts, connection
+    errors, empty parses) are retried with jittered backoff until the policy's
+    attempts or deadline run out, then raised as RetryExhaustedError; other API
+    errors are raised unchanged. Calls never return None.
+    """
+
+    def __init__(self, model: str, cache: ResponseCache | None, retry: RetryPolicy | None = None,
+                 streaming: bool = False):
+        self.model = model
+        self.streaming = streaming
+        self.cache = cache
+        self.retry = retry or RetryPolicy()
+        self.usage: dict[str, TokenUsage] = {}
+        self.metrics: dict[str, CallMetrics] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._usage_lock = threading.Lock()
+
+    def _cache_lookup(self, target_model: str, effort: str, instructions: str,
+                      input_text: str, response_model: Type[T]) -> tuple[str | None, T | None]:
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(target_model, effort, instructions, input_text, response_model)
+        return key, self.cache.get(key, response_model)
+
+    def _cache_store(self, key: str | None, parsed: BaseModel | None) -> None:
+        if key is not None and parsed is not None:
+            self.cache.put(key, parsed)
+
+    def _record_usage(self, target_model: str, response: Any) -> TokenUsage:
+        usage = TokenUsage.from_response(response)
+        with self._usage_lock:
+            self.usage.setdefault(target_model, TokenUsage()).add(usage)
+        return usage
+
+    def total_usage(self) -> TokenUsage:
+        total = TokenUsage()
+        with self._usage_lock:
+            for usage in self.usage.values():
+                total.add(usage)
+        return total
+
+    def _update_metrics(self, target_model: str, **increments: float) -> None:
+        with self._usage_lock:
+            metrics = self.metrics.setdefault(target_model, CallMetrics())
+            for name, value in increments.items():
+                setattr(metrics, name, getattr(metrics, name) + value)
+
+    def _breaker(self, target_model: str) -> CircuitBreaker:
+        with self._usage_lock:
+            if target_model not in self._breakers:
+                self._breakers[target_model] = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_SECONDS)
+            return self._breakers[target_model]
+
+    def _deadline(self) -> float | None:
+        return time.monotonic() + self.retry.deadline if self.retry.deadline else None
+
+    def _begin_attempt(self, target_model: str, attempt: int, deadline: float | None) -> dict[str, Any]:
+        """Checks the breaker and deadline; returns the per-attempt request options."""
+        try:
+            self._breaker(target_model).before_call(target_model)
+        except CircuitOpenError:
+            self._update_metrics(target_model, calls=int(attempt == 0), circuit_rejections=1, failures=1)
+            raise
+        self._update_metrics(target_model, calls=int(attempt == 0), attempts=1, retries=int(attempt > 0))
+
+        if deadline is None:
+            return {}
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._update_metrics(target_model, failures=1)
+            raise RetryExhaustedError(target_model, attempt, TimeoutError("call deadline exceeded"))
+        return {"timeout": remaining}
+
+    def _on_failure(self, target_model: str, exc: Exception, attempt: int, deadline: float | None) -> float:
+        """Classifies a failed attempt; returns the backoff before the next one or raises."""
+        rate_limited, timed_out = is_rate_limited(exc), is_timeout(exc)
+        retryable = self.retry.is_retryable(exc)
+        self._update_metrics(target_model, rate_limited=int(rate_limited), timeouts=int(timed_out))
+
+        # Only signs of an unhealthy service count towards opening the circuit
+        breaker = self._breaker(target_model)
+        if retryable and not rate_limited and not isinstance(exc, EmptyResponseError):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        delay = self.retry.delay(attempt, retry_after_seconds(exc))
+        out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+        if not retryable or attempt + 1 >= self.retry.max_attempts or out_of_time:
+            self._update_metrics(target_model, failures=1)
+            if not retryable:
+                raise exc
+            raise RetryExhaustedError(target_model, attempt + 1, exc) from exc
+
+        self._update_metrics(target_model, backoff_seconds=delay)
+        logger.warning(f"{target_model}: attempt {attempt + 1} failed ({exc}); retrying in {delay:.2f}s")
+        return delay
+
+    def _on_success(self, target_model: str) -> None:
+        self._breaker(target_model).record_success()
+
+    @staticmethod
+    def _parsed(response: Any, target_model: str) -> Any:
+        parsed = response.output_parsed
+        if parsed is None:
+            raise EmptyResponseError(f"{target_model} returned no structured output")
+        return parsed
+
+
+class ReasoningClient(_ClientBase):
     """
     Client for GPT-5.2 family models using the Responses API.
     Identifies and extracts structured outputs from the 'output_parsed' attribute.
+    With `streaming`, calls given an `on_delta` handler use the streaming mode and
+    forward the output text as it arrives (endpoints without SSE support, such as
+    the mock server, need it off). The OpenAI SDK is imported on the first call,
+    which keeps CLI start-up fast.
     """
     
-    def __init__(self, model: str = "gpt-5-mini-2025-08-07"):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
-            
-        self.client = OpenAI(api_key=api_key)
-        self.model = model
+    def __init__(self, model: str = DEFAULT_MODEL, cache: ResponseCache | None = None,
+                 base_url: str | None = None, retry: RetryPolicy | None = None,
+                 streaming: bool = False):
+        super().__init__(model, cache, retry, streaming)
+        self._api_key = _get_api_key()
+        self._base_url = base_url
+        self._client = None
+
+    @property
+    def client(self) -> Any:
+        """The OpenAI SDK client, created on first use."""
+        with self._usage_lock:
+            if self._client is None:
+                from openai import OpenAI
+                # Retries are handled by our policy, not the SDK's
+                self._client = OpenAI(api_key=self._api_key, base_url=self._base_url, max_retries=0)
+            return self._client
 
     def get_structured_response(
         self, 
@@ -25,27 +266,57 @@ class ReasoningClient:
         input_text: str, 
         response_model: Type[T],
         model: str | None = None,
-        effort: str = "medium"
+        effort: str = "medium",
+        prompt_cache_key: str | None = None
     ) -> T:
         """
         Executes a request and returns the validated Pydantic model.
         """
+        parsed, _ = self.get_structured_response_with_usage(
+            instructions, input_text, response_model, model, effort, prompt_cache_key
+        )
+        return parsed
+
+    def get_structured_response_with_usage(
+        self,
+        instructions: str,
+        input_text: str,
+        response_model: Type[T],
+        model: str | None = None,
+        effort: str = "medium",
+        prompt_cache_key: str | None = None,
+        on_delta: DeltaHandler | None = None
+    ) -> tuple[T, TokenUsage | None]:
+        """
+        Like get_structured_response, plus the call's token usage (None on a cache hit).
+        `on_delta` receives the output text as it streams in (cache hits stream nothing,
+        and a retried attempt streams again from the start).
+        """
         
         target_model = model or self.model
-        
-        kwargs = {
-            "model": target_model,
-            "instructions": instructions,
-            "input": input_text,
-            "text_format": response_model,
-        }
-
-        # gpt-5-mini doesn't support the reasoning effort parameter
-        if "mini" not in target_model.lower():
-            kwargs["reasoning"] = {"effort": effort}
-
-        response = self.client.responses.parse(**kwargs)
-        parsed = response.output_parsed
+        cache_key, cached = self._cache_lookup(target_model, effort, instructions, input_text, response_model)
+        if cached is not None:
+            return cached, None
+
+        kwargs = _build_request(instructions, input_text, response_model, target_model, effort, prompt_cache_key)
+
+        deadline = self._deadline()
+        for attempt in itertools.count():
+            options = self._begin_attempt(target_model, attempt, deadline)
+            try:
+                if on_delta is not None and self.streaming:
+                    response = self._stream(kwargs, options, on_delta)
+                else:
+                    response = self.client.responses.parse(**kwargs, **options)
+                usage = self._record_usage(target_model, response)
+                parsed = self._parsed(response, target_model)
+            except Exception as exc:
+                time.sleep(self._on_failure(target_model, exc, attempt, deadline))
+                continue
+            self._on_success(target_model)
+            break
+
+        self._cache_store(cache_key, parsed)
 
 
         # # --- Comment in for prompt engineering/debugging ---
@@ -62,4 +333,142 @@ class ReasoningClient:
         #         print(f"Steps: {parsed.execution_steps}")
         # # --------------------------------------
         
-        return parsed
\ No newline at end of file
+        return parsed, usage
+
+    def _stream(self, kwargs: dict[str, Any], options: dict[str, Any], on_delta: DeltaHandler) -> Any:
+        """Streams one response, forwarding its text deltas; returns the parsed final response."""
+        with self.client.responses.stream(**kwargs, **options) as stream:
+            for event in stream:
+                if event.type == OUTPUT_TEXT_DELTA:
+                    on_delta(event.delta)
+            return stream.get_final_response()
+
+
+class AsyncReasoningClient(_ClientBase):
+    """
+    Async counterpart of ReasoningClient for concurrent fan-out.
+    A single instance owns one pooled HTTP transport and should be shared by every
+    manager in the process; `max_concurrency` caps the number of in-flight requests
+    and `rate_limits` holds optional per-model request budgets. `base_url` points the
+    client at a compatible endpoint, e.g. the local mock server used for benchmarks.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        max_concurrency: int = 16,
+        max_connections: int | None = None,
+        cache: ResponseCache | None = None,
+        rate_limits: dict[str, RateLimiter] | None = None,
+        base_url: str | None = None,
+        retry: RetryPolicy | None = None,
+        streaming: bool = False
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        pool_size = max_connections or max_concurrency
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        super().__init__(model, cache, retry, streaming)
+        self.client = AsyncOpenAI(api_key=_get_api_key(), base_url=base_url, http_client=http_client,
+                                  max_retries=0)
+        self.rate_limits = rate_limits or {}
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def aget_structured_response(
+        self,
+        instructions: str,
+        input_text: str,
+        response_model: Type[T],
+        model: str | None = None,
+        effort: str = "medium",
+        prompt_cache_key: str | None = None
+    ) -> T:
+        """
+        Executes a request and returns the validated Pydantic model.
+        Waits for a free concurrency slot before the request is sent.
+        """
+        parsed, _ = await self.aget_structured_response_with_usage(
+            instructions, input_text, response_model, model, effort, prompt_cache_key
+        )
+        return parsed
+
+    async def aget_structured_response_with_usage(
+        self,
+        instructions: str,
+        input_text: str,
+        response_model: Type[T],
+        model: str | None = None,
+        effort: str = "medium",
+        prompt_cache_key: str | None = None,
+        on_delta: DeltaHandler | None = None
+    ) -> tuple[T, TokenUsage | None]:
+        """
+        Like aget_structured_response, plus the call's token usage (None on a cache hit).
+        `on_delta` receives the output text as it streams in, as in ReasoningClient.
+        """
+
+        target_model = model or self.model
+        cache_key, cached = self._cache_lookup(target_model, effort, instructions, input_text, response_model)
+        if cached is not None:
+            return cached, None
+
+        kwargs = _build_request(instructions, input_text, response_model, target_model, effort, prompt_cache_key)
+        limiter = resolve_limiter(self.rate_limits, target_model)
+        estimate = _estimate_tokens(instructions, input_text)
+
+        deadline = self._deadline()
+        for attempt in itertools.count():
+            # Rate-limit before taking a slot so a throttled model cannot starve the others
+            if limiter:
+                await limiter.acquire(estimate)
+            settled = False
+            options = self._begin_attempt(target_model, attempt, deadline)
+            try:
+                async with self._semaphore:
+                    if on_delta is not None and self.streaming:
+                        response = await self._stream(kwargs, options, on_delta)
+                    else:
+                        response = await self.client.responses.parse(**kwargs, **options)
+                usage = self._record_usage(target_model, response)
+                if limiter:
+                    limiter.settle(estimate, usage.input_tokens + usage.output_tokens)
+                    settled = True
+                parsed = self._parsed(response, target_model)
+            except Exception as exc:
+                # Hand back the estimate of an attempt that got no response, e.g. a 429,
+                # so failed retries do not drain the token budget of every caller
+                if limiter and not settled:
+                    limiter.settle(estimate, 0)
+                delay = self._on_failure(target_model, exc, attempt, deadline)
+                if limiter and is_rate_limited(exc):
+                    limiter.pause(delay)
+                await asyncio.sleep(delay)
+                continue
+            self._on_success(target_model)
+            break
+
+        self._cache_store(cache_key, parsed)
+        return parsed, usage
+
+    async def _stream(self, kwargs: dict[str, Any], options: dict[str, Any], on_delta: DeltaHandler) -> Any:
+        async with self.client.responses.stream(**kwargs, **options) as stream:
+            async for event in stream:
+                if event.type == OUTPUT_TEXT_DELTA:
+                    on_delta(event.delta)
+            return await stream.get_final_response()
+
+    async def aclose(self) -> None:
+        """Releases the pooled connections."""
+        await self.client.close()
+
+    async def __aenter__(self) -> "AsyncReasoningClient":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
@@ -1,15 +1,39 @@
+import json
+import logging
+import mmap
 import re
+import struct
+import zlib
+from collections import OrderedDict
+from pathlib import Path
 from typing import Any
-from src.utils.parser import table_to_markdown
+from src.agent.retrieval import SentenceIndex
+from src.utils.dataset import DatasetStore
+from src.utils.parser import PARSER_VERSION, normalize_table, render_markdown
 from src.models.schemas import FinancialContext
 
+logger = logging.getLogger(__name__)
+
+STORE_MAGIC = b"FCTX"
+STORE_VERSION = 1
+CONTEXT_CACHE_SIZE = 64         # Decoded contexts kept hot; conditions share a record's context
+
 class ContextBuilder:
-    """Transforms raw dataset records into grounded financial contexts."""
-    
+    """
+    Transforms raw dataset records into grounded financial contexts.
+    With a ContextStore, `load` serves precomputed contexts and only builds
+    the ones the store does not know (e.g. records from outside the dataset).
+    `prune` is the optional retrieval stage that fits the text to a token budget.
+    """
+
+    def __init__(self, store: "ContextStore | None" = None):
+        self.store = store
+        self._indexes: OrderedDict[str, SentenceIndex] = OrderedDict()
+
     @staticmethod
     def normalize_text(text: str | None) -> str:
         """
-        Collapses excessive whitespace while preserving the 
+        Collapses excessive whitespace while preserving the
         specific punctuation-spacing artifacts found in the dataset.
         """
         if not text:
@@ -21,11 +45,130 @@ class ContextBuilder:
         """Orchestrates the conversion of a raw record into a FinancialContext schema."""
         doc = record.get("doc", {})
         raw_table = doc.get("table", {})
-        
+        table = normalize_table(raw_table)
+
         return FinancialContext(
             record_id=record.get("id", "unknown"),
             pre_text=cls.normalize_text(doc.get("pre_text")),
             post_text=cls.normalize_text(doc.get("post_text")),
-            markdown_table=table_to_markdown(raw_table),
-            raw_table=raw_table
-        )
\ No newline at end of file
+            markdown_table=render_markdown(table),
+            raw_table=raw_table,
+            # The JSON conditions have always embedded the table's Python repr; kept byte-identical
+            json_table=str(raw_table),
+            table=table
+        )
+
+    def load(self, record: dict[str, Any]) -> FinancialContext:
+        """The record's context, from the store when it has one."""
+        if self.store is not None:
+            context = self.store.get(record.get("id", "unknown"))
+            if context is not None:
+                return context
+        return self.build(record)
+
+    def prune(self, context: FinancialContext, query: str, budget: int) -> tuple[str, str, int]:
+        """
+        Cuts pre_text and post_text down to the sentences that best match `query`
+        (BM25 over the record's sentences) so together they fit `budget` tokens.
+        Returns both texts and the estimated number of tokens removed.
+        """
+        index = self._indexes.get(context.record_id)
+        if index is None:
+            index = self._indexes[context.record_id] = SentenceIndex([context.pre_text, context.post_text])
+            if len(self._indexes) > CONTEXT_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(context.record_id)
+        (pre_text, post_text), removed = index.select(query, budget)
+        return pre_text, post_text, removed
+
+class ContextStore:
+    """
+    Precomputed FinancialContexts for a whole dataset in one memory-mapped file.
+    Layout: magic, version, header length, a JSON header (fingerprint and
+    record id -> (offset, length)), then one zlib-compressed context per record.
+    Contexts are decoded on lookup only; the file is rebuilt automatically when
+    the dataset file changes or PARSER_VERSION is bumped.
+    """
+
+    def __init__(self, dataset: DatasetStore, path: Path | None = None,
+                 cache_size: int = CONTEXT_CACHE_SIZE):
+        self.dataset = dataset
+        self.path = Path(path) if path else dataset.data_path.with_suffix(".contexts.bin")
+        self.cache_size = cache_size
+        self._decoded: OrderedDict[str, FinancialContext] = OrderedDict()
+
+        if self._read_header() is None:
+            self.build()
+        self._file = open(self.path, "rb")
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header, self._data_start = self._read_header()
+        self._offsets: dict[str, list[int]] = header["records"]
+
+    def _fingerprint(self) -> str:
+        stat = self.dataset.data_path.stat()
+        return f"{STORE_VERSION}:{PARSER_VERSION}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _read_header(self) -> tuple[dict[str, Any], int] | None:
+        """Returns the header and the offset of the first context, or None if missing or stale."""
+        try:
+            with open(self.path, "rb") as f:
+                magic, version, length = struct.unpack("<4sII", f.read(12))
+                header = json.loads(f.read(length))
+        except (OSError, struct.error, ValueError):
+            return None
+        if magic != STORE_MAGIC or version != STORE_VERSION or header.get("fingerprint") != self._fingerprint():
+            return None
+        return header, 12 + length
+
+    def build(self) -> None:
+        """Builds every record's context once and writes the store file."""
+        logger.info(f"Precomputing financial contexts for {self.dataset.data_path.name}")
+        offsets: dict[str, list[int]] = {}
+        partial = self.path.with_suffix(".tmp")
+        with open(partial.with_suffix(".data"), "w+b") as blobs:
+            for split in self.dataset.splits():
+                for record in self.dataset.iter_records(split):
+                    record_id = record.get("id", "unknown")
+                    # Ids are looked up like DatasetStore.get: the first occurrence wins
+                    if record_id in offsets:
+                        continue
+                    blob = zlib.compress(ContextBuilder.build(record).model_dump_json().encode("utf-8"))
+                    offsets[record_id] = [blobs.tell(), len(blob)]
+                    blobs.write(blob)
+
+            header = json.dumps({"fingerprint": self._fingerprint(), "records": offsets}).encode("utf-8")
+            blobs.seek(0)
+            with open(partial, "wb") as f:
+                f.write(struct.pack("<4sII", STORE_MAGIC, STORE_VERSION, len(header)))
+                f.write(header)
+                while chunk := blobs.read(1024 * 1024):
+                    f.write(chunk)
+        partial.with_suffix(".data").unlink()
+        partial.replace(self.path)
+
+    def get(self, record_id: str) -> FinancialContext | None:
+        """Decodes one record's context, or None if the dataset has no such record."""
+        if record_id in self._decoded:
+            self._decoded.move_to_end(record_id)
+            return self._decoded[record_id]
+        span = self._offsets.get(record_id)
+        if span is None:
+            return None
+
+        start = self._data_start + span[0]
+        context = FinancialContext.model_validate_json(zlib.decompress(self._buffer[start:start + span[1]]))
+        self._decoded[record_id] = context
+        if len(self._decoded) > self.cache_size:
+            self._decoded.popitem(last=False)
+        return context
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def close(self) -> None:
+        self._buffer.close()
+        self._file.close()
@@ -1,70 +1,311 @@
+import asyncio
 import logging
-from pathlib import Path
-from typing import Any
+import time
+from dataclasses import dataclass
+from enum import Enum
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Type, TypeVar
 
-from src.agent.client import ReasoningClient
-from src.agent.context_builder import ContextBuilder
+from pydantic import BaseModel
+
+from src.agent import registry
+from src.agent.cache import ResponseCache, StageMemo
+from src.agent.checks import precheck_expression
+from src.agent.client import AsyncReasoningClient, DeltaHandler, ReasoningClient, TokenUsage
+from src.agent.retrieval import estimate_tokens
+from src.agent.resilience import EmptyResponseError
+from src.agent.context_builder import ContextBuilder, ContextStore
 from src.agent.tools import MathTool
+from src.utils.parser import TableFormat, render_table
 from src.models.schemas import (
     ConversationState, TurnResult, AnalyticStep, 
-    AnalysisPlan, ReviewResult, StudyCondition
+    AnalysisPlan, ReviewResult, StudyCondition, StageSpan, TurnTrace
 )
 
 logger = logging.getLogger(__name__)
-PROMPT_DIR = Path(__file__).parent / "prompts"
+
+T = TypeVar("T", bound=BaseModel)
+
+# Conditions answered by a single analyst call per turn (eligible for batch mode)
+BASELINE_CONDITIONS = frozenset({
+    StudyCondition.JSON_BASELINE_MINI, StudyCondition.MD_BASELINE_MINI,
+    StudyCondition.JSON_BASELINE_MED, StudyCondition.MD_BASELINE_MED,
+    StudyCondition.MD_BASELINE_HIGH,
+})
+
+# Table format per condition unless overridden; the JSON conditions embed the dict repr they were run with
+DEFAULT_TABLE_FORMATS = {
+    StudyCondition.JSON_BASELINE_MINI: TableFormat.REPR,
+    StudyCondition.JSON_BASELINE_MED: TableFormat.REPR,
+}
+
+class PayloadLayout(str, Enum):
+    """
+    INTERLEAVED: original layout, history nested inside the <context> block.
+    PREFIX:      the invariant document (pre_text, table, post_text) leads every payload
+                 byte-for-byte, followed by history and question, so each stage's calls
+                 within a conversation share a cacheable prefix with the provider.
+    """
+    INTERLEAVED = "interleaved"
+    PREFIX = "prefix"
+
+class ReflectionMode(str, Enum):
+    """
+    SEQUENTIAL:  original loop, reviewer on every turn, analyst re-call on every flag.
+    SPECULATIVE: the reviewer only runs when deterministic local checks of the analyst
+                 expression fail, and a reviewer `fixed_expression` that passes those
+                 checks is used directly instead of re-calling the analyst.
+    """
+    SEQUENTIAL = "sequential"
+    SPECULATIVE = "speculative"
+
+class TurnEventKind(str, Enum):
+    """
+    STAGE:      a model call started (data: None)
+    DELTA:      output text of the running call as it streams in (data: str)
+    PLAN:       the planner's AnalysisPlan
+    EXPRESSION: the analyst's (or baseline's) AnalyticStep
+    REVIEW:     the reviewer's ReviewResult, or None when speculative reflection skipped it
+    CORRECTION: the corrected expression (str), from the reviewer's fix or an analyst re-call
+    RESULT:     the finished TurnResult, after it was appended to the conversation
+    """
+    STAGE = "stage"
+    DELTA = "delta"
+    PLAN = "plan"
+    EXPRESSION = "expression"
+    REVIEW = "review"
+    CORRECTION = "correction"
+    RESULT = "result"
+
+@dataclass
+class TurnEvent:
+    kind: TurnEventKind
+    stage: str | None = None
+    data: Any = None
+
+EventHandler = Callable[[TurnEvent], None]
+
+def _notify(emit: EventHandler | None, kind: TurnEventKind, stage: str | None, data: Any = None) -> None:
+    if emit is None:
+        return
+    try:
+        emit(TurnEvent(kind, stage, data))
+    except Exception:
+        # Observers only display progress; a failing handler must not abort the turn
+        logger.exception(f"Turn event handler failed on {kind.value}")
 
 class ConvFinQAManager:
-    def __init__(self, condition: StudyCondition):
+    """
+    Runs the study pipeline for one StudyCondition.
+    Pass a shared AsyncReasoningClient and use the `a*` methods to run many records
+    concurrently; the sync methods drive the same pipeline with a blocking client.
+    A shared ContextStore serves precomputed record contexts to every manager, and
+    `context_budget` (tokens) prunes pre/post text to the sentences relevant to each turn.
+    Pass `on_event` to the turn methods, or iterate `astream_turn`, to observe each
+    stage's output as soon as it is ready instead of waiting for the whole turn.
+    Prompts, the condition -> model table and the default blocking client come from
+    the process-wide registry, so managers are cheap to build for every condition.
+    Managers given the same StageMemo run each call that several conditions issue
+    identically only once.
+    """
+
+    def __init__(self, condition: StudyCondition,
+                 client: ReasoningClient | AsyncReasoningClient | None = None,
+                 layout: PayloadLayout = PayloadLayout.INTERLEAVED,
+                 history_window: int | None = None,
+                 reflection: ReflectionMode = ReflectionMode.SEQUENTIAL,
+                 contexts: ContextStore | None = None,
+                 table_format: TableFormat | None = None,
+                 context_budget: int | None = None,
+                 stages: StageMemo | None = None):
         self.condition = condition
-        self.client = ReasoningClient()
-        self.builder = ContextBuilder()
+        self.stages = stages
+        self.context_budget = context_budget
+        self.table_format = table_format or DEFAULT_TABLE_FORMATS.get(condition, TableFormat.MARKDOWN)
+        self._client = client
+        self.layout = layout
+        self.reflection = reflection
+        self.history_window = history_window
+        self.builder = ContextBuilder(contexts)
         self.math_tool = MathTool()
-        self.prompts = self._load_all_prompts()
-        
-        self._config_matrix = {
-            StudyCondition.JSON_BASELINE_MINI: ("gpt-5-mini", "none"),
-            StudyCondition.MD_BASELINE_MINI:   ("gpt-5-mini", "none"),
-            StudyCondition.JSON_BASELINE_MED:  ("gpt-5.2", "medium"),
-            StudyCondition.MD_BASELINE_MED:    ("gpt-5.2", "medium"),
-            StudyCondition.MD_BASELINE_HIGH:   ("gpt-5.2", "high"),
-            StudyCondition.MODULAR_MINI:       ("gpt-5-mini", "none"),
-            StudyCondition.MODULAR_MED:        ("gpt-5.2", "medium"),
-            StudyCondition.MODULAR_HIGH:        ("gpt-5.2", "high"),
-            StudyCondition.REFLECT_MINI:       ("gpt-5-mini", "none"),
-            StudyCondition.REFLECT_MED:        ("gpt-5.2", "medium"),
-            StudyCondition.REFLECT_HIGH:       ("gpt-5.2", "high"),
-        }
+        self.prompts = registry.prompts()
+        self._config_matrix = registry.CONDITION_MODELS
 
-    def _load_all_prompts(self) -> dict[str, str]:
-        files = {
-            "baseline": "baseline_analyst_system_prompt.xml",
-            "planner": "planner_system_prompt.xml",
-            "agentic_analyst": "agentic_analyst_system_prompt.xml",
-            "reviewer": "reviewer_system_prompt.xml"
-        }
-        loaded = {}
-        for key, filename in files.items():
-            path = PROMPT_DIR / filename
-            if not path.exists():
-                raise FileNotFoundError(f"Missing prompt: {path}")
-            loaded[key] = path.read_text(encoding="utf-8")
-        return loaded
+    @property
+    def client(self) -> ReasoningClient | AsyncReasoningClient:
+        # Resolved on first use, so building a manager never pays for the OpenAI SDK import
+        if self._client is None:
+            self._client = registry.default_client()
+        return self._client
 
     def process_record(self, record: dict[str, Any]) -> ConversationState:
-        context = self.builder.build(record)
-        state = ConversationState(context=context, condition=self.condition)
+        self._require_sync_client()
+        return asyncio.run(self.aprocess_record(record))
+
+    def process_turn(self, state: ConversationState, question: str,
+                     on_event: EventHandler | None = None) -> TurnResult:
+        """
+        Answers a single question and appends the result to the conversation state.
+        `on_event` is called on the calling thread with each TurnEvent of the turn.
+        """
+        self._require_sync_client()
+        return asyncio.run(self.aprocess_turn(state, question, on_event))
+
+    async def aprocess_record(self, record: dict[str, Any]) -> ConversationState:
+        state = self.new_state(record)
         questions = record.get("dialogue", {}).get("conv_questions", [])
         
-        for i, question in enumerate(questions):
-            logger.info(f"Turn {i} | Record {context.record_id} | Cond {self.condition.value}")
-            turn_data = self._execute_pipeline(state, question)
-            turn_result = self._create_turn_result(state, question, i, turn_data)
-            state.history.append(turn_result)
+        # Turns stay sequential: later questions reference earlier ans_N values
+        for question in questions:
+            await self.aprocess_turn(state, question)
             
         return state
 
+    def new_state(self, record: dict[str, Any]) -> ConversationState:
+        """Builds an empty conversation over a record, honouring the manager's history window."""
+        context = self.builder.load(record)
+        return ConversationState(context=context, condition=self.condition,
+                                 history_window=self.history_window)
+
+    async def aprocess_turn(self, state: ConversationState, question: str,
+                            on_event: EventHandler | None = None) -> TurnResult:
+        index = len(state.history)
+        logger.info(f"Turn {index} | Record {state.context.record_id} | Cond {self.condition.value}")
+        trace = TurnTrace()
+        start = time.perf_counter()
+        turn_data = await self._execute_pipeline(state, question, trace, on_event)
+        turn_result = self._create_turn_result(state, question, index, turn_data, trace)
+        trace.duration_ms = (time.perf_counter() - start) * 1000
+        turn_result.trace = trace
+        state.append_turn(turn_result)
+        _notify(on_event, TurnEventKind.RESULT, None, turn_result)
+        return turn_result
+
+    async def astream_turn(self, state: ConversationState, question: str) -> AsyncIterator[TurnEvent]:
+        """
+        Runs a turn and yields its events as they happen, ending with RESULT.
+        A failed turn raises from the iterator; closing the iterator early cancels the turn.
+        """
+        events: asyncio.Queue[TurnEvent | None] = asyncio.Queue()
+        task = asyncio.create_task(self.aprocess_turn(state, question, events.put_nowait))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            task.result()
+        finally:
+            task.cancel()
+
+    def _require_sync_client(self) -> None:
+        # An async transport is bound to the event loop it was first used on
+        if isinstance(self.client, AsyncReasoningClient):
+            raise TypeError("Managers built on AsyncReasoningClient must use the async API (aprocess_*)")
+
+    async def _request(self, prompt_key: str, payload: str, response_model: Type[T],
+                       model: str, effort: str, cache_key: str | None = None,
+                       trace: TurnTrace | None = None, stage: str | None = None,
+                       emit: EventHandler | None = None) -> T:
+        """
+        Dispatches a structured call to whichever client the manager was built with,
+        recording a span on `trace` when one is given. Failed calls raise (the
+        clients retry transient errors first) instead of yielding a placeholder
+        answer, so a failed record is reported and can be resumed, not mis-scored.
+        With `emit`, announces the stage and forwards streamed output text as DELTA events.
+        """
+        stage = stage or prompt_key
+        instructions = self.prompts[prompt_key]
+        on_delta = None
+        if emit is not None:
+            _notify(emit, TurnEventKind.STAGE, stage)
+            on_delta = lambda text: _notify(emit, TurnEventKind.DELTA, stage, text)
+
+        started_at, start = time.time(), time.perf_counter()
+        call = partial(self._call, instructions, payload, response_model, model, effort, cache_key, on_delta)
+        shared = False
+        if self.stages is not None:
+            key = ResponseCache.make_key(model, effort, instructions, payload, response_model)
+            (parsed, usage), owner = await self.stages.run(key, call)
+            # The tokens are accounted to the condition that made the call
+            shared, usage = not owner, usage if owner else None
+        else:
+            parsed, usage = await call()
+
+        if trace is not None:
+            self._record_span(trace, stage, model, effort, started_at,
+                              (time.perf_counter() - start) * 1000, usage, failed=not parsed, shared=shared)
+        if not parsed:
+            raise EmptyResponseError(f"{stage} stage returned no output")
+        return parsed
+
+    async def _call(self, instructions: str, payload: str, response_model: Type[T], model: str, effort: str,
+                    cache_key: str | None, on_delta: DeltaHandler | None) -> tuple[T, TokenUsage | None]:
+        if isinstance(self.client, AsyncReasoningClient):
+            return await self.client.aget_structured_response_with_usage(
+                instructions, payload, response_model, model=model, effort=effort,
+                prompt_cache_key=cache_key, on_delta=on_delta
+            )
+        if on_delta is not None:
+            # Deltas arrive on the worker thread; handlers always run on the event loop
+            on_delta = partial(asyncio.get_running_loop().call_soon_threadsafe, on_delta)
+        return await asyncio.to_thread(
+            self.client.get_structured_response_with_usage,
+            instructions, payload, response_model, model=model, effort=effort,
+            prompt_cache_key=cache_key, on_delta=on_delta
+        )
+
+    @staticmethod
+    def _record_span(trace: TurnTrace, stage: str, model: str, effort: str, started_at: float,
+                     duration_ms: float, usage: TokenUsage | None, failed: bool = False,
+                     shared: bool = False) -> None:
+        trace.spans.append(StageSpan(
+            stage=stage,
+            model=model,
+            effort=effort,
+            started_at=started_at,
+            duration_ms=duration_ms,
+            input_tokens=usage.input_tokens if usage else 0,
+            cached_tokens=usage.cached_tokens if usage else 0,
+            output_tokens=usage.output_tokens if usage else 0,
+            reasoning_tokens=usage.reasoning_tokens if usage else 0,
+            cache_hit=usage is None and not shared,
+            shared=shared,
+            failed=failed,
+        ))
+
+    def baseline_request(self, state: ConversationState, question: str) -> dict[str, Any]:
+        """
+        Arguments of the single structured call behind a baseline turn, for callers that
+        submit it outside the manager (batch mode); the result goes to `complete_baseline_turn`.
+        """
+        if self.condition not in BASELINE_CONDITIONS:
+            raise ValueError(f"Condition {self.condition.name} makes more than one call per turn")
+        model, effort = self._config_matrix[self.condition]
+        return {
+            "instructions": self.prompts["baseline"],
+            "input_text": self._build_payload(state, question),
+            "response_model": AnalyticStep,
+            "model": model,
+            "effort": effort,
+            "prompt_cache_key": self._cache_key(state),
+        }
+
+    def complete_baseline_turn(self, state: ConversationState, question: str, output: AnalyticStep,
+                               usage: TokenUsage | None, started_at: float, duration_ms: float) -> TurnResult:
+        """Turns an externally obtained baseline output into a TurnResult and appends it."""
+        index = len(state.history)
+        model, effort = self._config_matrix[self.condition]
+        trace = TurnTrace()
+        self._record_span(trace, "baseline", model, effort, started_at, duration_ms, usage)
+        turn_result = self._create_turn_result(state, question, index, self._baseline_turn_data(output), trace)
+        trace.duration_ms = duration_ms + trace.math_ms
+        turn_result.trace = trace
+        state.append_turn(turn_result)
+        return turn_result
+
     def _create_turn_result(self, state: ConversationState, question: str, 
-                            index: int, turn_data: dict[str, Any]) -> TurnResult:
+                            index: int, turn_data: dict[str, Any],
+                            trace: TurnTrace | None = None) -> TurnResult:
+        start = time.perf_counter()
         try:
             raw_result = self.math_tool.calculate(
                 turn_data["final_expression"], 
@@ -77,6 +318,8 @@ class ConvFinQAManager:
         except Exception as e:
             logger.error(f"Math error on turn {index}: {e}")
             raw_result, response = 0.0, f"Execution Error: {str(e)}"
+        if trace is not None:
+            trace.math_ms = (time.perf_counter() - start) * 1000
 
         return TurnResult(
             turn_index=index,
@@ -89,71 +332,85 @@ class ConvFinQAManager:
             conversational_response=response
         )
 
-    def _execute_pipeline(self, state: ConversationState, question: str) -> dict[str, Any]:
+    async def _execute_pipeline(self, state: ConversationState, question: str,
+                                trace: TurnTrace | None = None,
+                                emit: EventHandler | None = None) -> dict[str, Any]:
         model, effort = self._config_matrix[self.condition]
-        payload = self._build_payload(state, question)
+        cache_key = self._cache_key(state)
 
-        baselines = [
-            StudyCondition.JSON_BASELINE_MINI, StudyCondition.MD_BASELINE_MINI,
-            StudyCondition.JSON_BASELINE_MED, StudyCondition.MD_BASELINE_MED,
-            StudyCondition.MD_BASELINE_HIGH
-        ]
+        if self.condition in BASELINE_CONDITIONS:
+            payload = self._build_payload(state, question, trace=trace)
+            return await self._run_baseline_flow(payload, model, effort, cache_key, trace, emit)
+        return await self._run_agentic_flow(state, question, model, effort, cache_key, trace, emit)
 
-        if self.condition in baselines:
-            return self._run_baseline_flow(payload, model, effort)
-        return self._run_agentic_flow(payload, model, effort)
+    def _cache_key(self, state: ConversationState) -> str | None:
+        # One routing key per conversation keeps all of its stages on the same provider cache
+        return f"convfinqa:{state.context.record_id}" if self.layout == PayloadLayout.PREFIX else None
 
-    def _run_baseline_flow(self, payload: str, model: str, effort: str) -> dict[str, Any]:
-        output = self.client.get_structured_response(
-            self.prompts["baseline"], payload, AnalyticStep, model=model, effort=effort
-        )
-        
-        # Fallback for API/Parsing failures
-        if not output:
-            output = AnalyticStep(python_expression="0", is_percentage=False, thought="API Failure")
+    async def _run_baseline_flow(self, payload: str, model: str, effort: str,
+                                 cache_key: str | None = None,
+                                 trace: TurnTrace | None = None,
+                                 emit: EventHandler | None = None) -> dict[str, Any]:
+        output = await self._request("baseline", payload, AnalyticStep, model, effort, cache_key, trace, emit=emit)
+        _notify(emit, TurnEventKind.EXPRESSION, "baseline", output)
+        return self._baseline_turn_data(output)
 
+    @staticmethod
+    def _baseline_turn_data(output: AnalyticStep) -> dict[str, Any]:
         return {
             "analyst_output": output,
             "final_expression": output.python_expression,
             "is_percentage": output.is_percentage
         }
 
-    def _run_agentic_flow(self, payload: str, model: str, effort: str) -> dict[str, Any]:
+    async def _run_agentic_flow(self, state: ConversationState, question: str, model: str, effort: str,
+                                cache_key: str | None = None,
+                                trace: TurnTrace | None = None,
+                                emit: EventHandler | None = None) -> dict[str, Any]:
         # 1. Planning State
-        plan = self.client.get_structured_response(
-            self.prompts["planner"], payload, AnalysisPlan, model=model, effort=effort
-        )
-        if not plan:
-            plan = AnalysisPlan(intent="Error", data_points=[], execution_steps=[], is_percentage_required=False)
+        payload = self._build_payload(state, question, trace=trace)
+        plan = await self._request("planner", payload, AnalysisPlan, model, effort, cache_key, trace, emit=emit)
+        _notify(emit, TurnEventKind.PLAN, "planner", plan)
+
+        # With pruning, later stages get the text that best matches the plan's data points
+        if self.context_budget is not None:
+            focus = [point.label for point in plan.data_points]
+            payload = self._build_payload(state, question, focus, trace=trace)
 
         # 2. Analyst State (Reasoning & Code Generation)
         analyst_payload = f"{payload}\n<plan>{plan.model_dump_json()}</plan>"
-        output = self.client.get_structured_response(
-            self.prompts["agentic_analyst"], analyst_payload, AnalyticStep, model=model, effort=effort
+        output = await self._request(
+            "agentic_analyst", analyst_payload, AnalyticStep, model, effort, cache_key, trace,
+            stage="analyst", emit=emit
         )
-        if not output:
-            output = AnalyticStep(python_expression="0", is_percentage=False, thought="API Failure")
+        _notify(emit, TurnEventKind.EXPRESSION, "analyst", output)
         
         final_expr = output.python_expression
         review = None
 
         # 3. Auditor State (Reflection/Review)
-        if self.condition >= StudyCondition.REFLECT_MINI:
-            review_payload = f"{payload}\n<proposed_code>{output.python_expression}</proposed_code>"
-            review = self.client.get_structured_response(
-                self.prompts["reviewer"], review_payload, ReviewResult, model=model, effort=effort
+        if self.condition >= StudyCondition.REFLECT_MINI and self.reflection == ReflectionMode.SPECULATIVE:
+            output, final_expr, review = await self._run_speculative_review(
+                payload, analyst_payload, plan, output, model, effort, cache_key, trace, state.get_ans_map(), emit
             )
+        elif self.condition >= StudyCondition.REFLECT_MINI:
+            review_payload = f"{payload}\n<proposed_code>{output.python_expression}</proposed_code>"
+            review = await self._request("reviewer", review_payload, ReviewResult, model, effort, cache_key, trace,
+                                         emit=emit)
+            _notify(emit, TurnEventKind.REVIEW, "reviewer", review)
             
             # 4. Self-Correction Loop (if Auditor flags an error)
-            if review and not review.is_valid:
+            if not review.is_valid:
                 logger.info(f"Self-correction triggered via {model}")
+                if trace is not None:
+                    trace.retries += 1
                 retry_payload = f"{analyst_payload}\n<feedback>{review.audit_commentary}</feedback>"
-                retry_output = self.client.get_structured_response(
-                    self.prompts["agentic_analyst"], retry_payload, AnalyticStep, model=model, effort=effort
+                output = await self._request(
+                    "agentic_analyst", retry_payload, AnalyticStep, model, effort, cache_key,
+                    trace, stage="self_correction", emit=emit
                 )
-                if retry_output:
-                    output = retry_output
-                    final_expr = output.python_expression
+                final_expr = output.python_expression
+                _notify(emit, TurnEventKind.CORRECTION, "self_correction", final_expr)
 
         return {
             "plan": plan,
@@ -163,17 +420,91 @@ class ConvFinQAManager:
             "is_percentage": output.is_percentage
         }
 
-    def _build_payload(self, state: ConversationState, question: str) -> str:
-        json_modes = [StudyCondition.JSON_BASELINE_MINI, StudyCondition.JSON_BASELINE_MED]
-        table = state.context.raw_table if self.condition in json_modes else state.context.markdown_table
-        
+    async def _run_speculative_review(self, payload: str, analyst_payload: str, plan: AnalysisPlan,
+                                      output: AnalyticStep, model: str, effort: str,
+                                      cache_key: str | None, trace: TurnTrace | None,
+                                      ans_map: dict[str, float],
+                                      emit: EventHandler | None = None) -> tuple[AnalyticStep, str, ReviewResult | None]:
+        """Early-exit reflection: returns (analyst output, final expression, review or None if skipped)."""
+        # The local checks take microseconds, so running them before the reviewer costs no latency
+        if not precheck_expression(output.python_expression, plan, output.is_percentage, ans_map):
+            if trace is not None:
+                trace.review_skipped = True
+            _notify(emit, TurnEventKind.REVIEW, "reviewer", None)
+            return output, output.python_expression, None
+
+        # Same reviewer payload as the sequential loop, so cached reviews stay shared
+        review_payload = f"{payload}\n<proposed_code>{output.python_expression}</proposed_code>"
+        review = await self._request("reviewer", review_payload, ReviewResult, model, effort, cache_key, trace,
+                                     emit=emit)
+        _notify(emit, TurnEventKind.REVIEW, "reviewer", review)
+        if review.is_valid:
+            return output, output.python_expression, review
+
+        fixed = (review.fixed_expression or "").strip()
+        if fixed and not precheck_expression(fixed, plan, output.is_percentage, ans_map):
+            logger.info(f"Applying reviewer fix via {model}")
+            if trace is not None:
+                trace.fixed_expression_applied = True
+            _notify(emit, TurnEventKind.CORRECTION, "reviewer", fixed)
+            return output, fixed, review
+
+        logger.info(f"Self-correction triggered via {model}")
+        if trace is not None:
+            trace.retries += 1
+        retry_payload = f"{analyst_payload}\n<feedback>{review.audit_commentary}</feedback>"
+        output = await self._request(
+            "agentic_analyst", retry_payload, AnalyticStep, model, effort, cache_key,
+            trace, stage="self_correction", emit=emit
+        )
+        _notify(emit, TurnEventKind.CORRECTION, "self_correction", output.python_expression)
+        return output, output.python_expression, review
+
+    def _table_for(self, state: ConversationState) -> str:
+        # Markdown and repr are precomputed with the context; other formats render from its layout
+        if self.table_format == TableFormat.MARKDOWN:
+            return state.context.markdown_table
+        if self.table_format == TableFormat.REPR:
+            return state.context.json_table
+        return render_table(state.context.table, self.table_format)
+
+    def _build_document(self, state: ConversationState, table: str, pre_text: str, post_text: str) -> str:
+        """The per-record invariant block; identical bytes on every turn and stage unless pruned."""
+        return (
+            f"<document>\n"
+            f"<metadata>ID: {state.context.record_id}</metadata>\n"
+            f"<pre_text>{pre_text}</pre_text>\n"
+            f"<table_data>\n{table}\n</table_data>\n"
+            f"<post_text>{post_text}</post_text>\n"
+            f"</document>\n"
+        )
+
+    def _build_payload(self, state: ConversationState, question: str, focus: list[str] | None = None,
+                       trace: TurnTrace | None = None) -> str:
+        table = self._table_for(state)
+        pre_text, post_text = state.context.pre_text, state.context.post_text
+        if self.context_budget is not None:
+            # The table is always sent whole; the text gets what is left of the budget
+            query = " ".join([question, *(focus or [])])
+            budget = max(0, self.context_budget - estimate_tokens(table))
+            pre_text, post_text, removed = self.builder.prune(state.context, query, budget)
+            if trace is not None:
+                trace.pruned_tokens += removed
+
+        if self.layout == PayloadLayout.PREFIX:
+            return (
+                f"{self._build_document(state, table, pre_text, post_text)}"
+                f"<history>{state.get_prompt_history()}</history>\n"
+                f"<current_question>{question}</current_question>"
+            )
+
         return (
             f"<context>\n"
             f"<metadata>ID: {state.context.record_id}</metadata>\n"
-            f"<pre_text>{state.context.pre_text}</pre_text>\n"
+            f"<pre_text>{pre_text}</pre_text>\n"
             f"<table_data>\n{table}\n</table_data>\n"
-            f"<post_text>{state.context.post_text}</post_text>\n"
+            f"<post_text>{post_text}</post_text>\n"
             f"<history>{state.get_prompt_history()}</history>\n"
             f"</context>\n"
             f"<current_question>{question}</current_question>"
-        )
\ No newline at end of file
+        )
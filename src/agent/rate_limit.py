@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Async token buckets that keep a model under its requests-per-minute and,
+    optionally, tokens-per-minute budgets. Waiters are served in arrival order;
+    bursts default to one second of budget.
+    Token costs are estimated up front and corrected with `settle` once the
+    real usage is known; `pause` holds every caller back after a 429 so the
+    whole model backs off together instead of retrying in a storm.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: float | None = None,
+                 tokens_per_minute: float | None = None, token_burst: float | None = None):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError("tokens_per_minute must be positive")
+
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1.0, self.rate)
+        self.token_rate = tokens_per_minute / 60.0 if tokens_per_minute else None
+        self.token_capacity = (token_burst or max(1.0, self.token_rate)) if self.token_rate else 0.0
+        self._requests = self.capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._requests = min(self.capacity, self._requests + elapsed * self.rate)
+        if self.token_rate:
+            self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Waits until a request slot (and `tokens` of token budget) is available and consumes it."""
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0:
+                    # A single call larger than the bucket only needs a full bucket
+                    needed = min(tokens, self.token_capacity) if self.token_rate else 0
+                    if self._requests >= 1 and self._tokens >= needed:
+                        self._requests -= 1
+                        self._tokens -= tokens if self.token_rate else 0
+                        return
+                    wait = (1 - self._requests) / self.rate if self._requests < 1 else 0.0
+                    if self._tokens < needed:
+                        wait = max(wait, (needed - self._tokens) / self.token_rate)
+                await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Corrects the token bucket once a call's real usage is known (may leave it in debt)."""
+        if self.token_rate:
+            self._tokens = min(self.token_capacity, self._tokens + estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        """Blocks new acquisitions for `seconds`, e.g. after the provider returned 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def resolve_limiter(limiters: dict[str, RateLimiter], model: str) -> RateLimiter | None:
+    """Matches a model id to its limiter, falling back to the longest configured prefix."""
+    if model in limiters:
+        return limiters[model]
+    prefixes = [name for name in limiters if model.startswith(name)]
+    return limiters[max(prefixes, key=len)] if prefixes else None
@@ -0,0 +1,75 @@
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping
+
+from src.models.schemas import StudyCondition
+
+if TYPE_CHECKING:
+    from src.agent.client import ReasoningClient
+
+PROMPT_DIR = Path(__file__).parent / "prompts"
+PROMPT_FILES = {
+    "baseline": "baseline_analyst_system_prompt.xml",
+    "planner": "planner_system_prompt.xml",
+    "agentic_analyst": "agentic_analyst_system_prompt.xml",
+    "reviewer": "reviewer_system_prompt.xml"
+}
+
+# (model, reasoning effort) per condition
+CONDITION_MODELS: Mapping[StudyCondition, tuple[str, str]] = MappingProxyType({
+    StudyCondition.JSON_BASELINE_MINI: ("gpt-5-mini", "none"),
+    StudyCondition.MD_BASELINE_MINI:   ("gpt-5-mini", "none"),
+    StudyCondition.JSON_BASELINE_MED:  ("gpt-5.2", "medium"),
+    StudyCondition.MD_BASELINE_MED:    ("gpt-5.2", "medium"),
+    StudyCondition.MD_BASELINE_HIGH:   ("gpt-5.2", "high"),
+    StudyCondition.MODULAR_MINI:       ("gpt-5-mini", "none"),
+    StudyCondition.MODULAR_MED:        ("gpt-5.2", "medium"),
+    StudyCondition.MODULAR_HIGH:        ("gpt-5.2", "high"),
+    StudyCondition.REFLECT_MINI:       ("gpt-5-mini", "none"),
+    StudyCondition.REFLECT_MED:        ("gpt-5.2", "medium"),
+    StudyCondition.REFLECT_HIGH:       ("gpt-5.2", "high"),
+})
+
+_lock = threading.Lock()
+_prompts: Mapping[str, str] | None = None
+_client: "ReasoningClient | None" = None
+
+
+def prompts() -> Mapping[str, str]:
+    """The system prompts, read from disk once per process and shared read-only by every manager."""
+    global _prompts
+    with _lock:
+        if _prompts is None:
+            loaded = {}
+            for key, filename in PROMPT_FILES.items():
+                path = PROMPT_DIR / filename
+                if not path.exists():
+                    raise FileNotFoundError(f"Missing prompt: {path}")
+                loaded[key] = path.read_text(encoding="utf-8")
+            _prompts = MappingProxyType(loaded)
+        return _prompts
+
+
+def default_client() -> "ReasoningClient":
+    """The blocking client used by managers built without one, created on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            from src.agent.client import ReasoningClient
+            _client = ReasoningClient()
+        return _client
+
+
+def preload() -> threading.Thread:
+    """
+    Imports the OpenAI SDK (the bulk of a cold start) on a daemon thread, e.g. while
+    the user reads the table and types the first question. Importing it again from
+    another thread just waits for this import to finish.
+    """
+    def load() -> None:
+        import openai  # noqa: F401
+
+    thread = threading.Thread(target=load, name="preload-openai", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from enum import Enum
+
+# Transient statuses: timeout, conflict, rate limit and server-side failures
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class ClientError(RuntimeError):
+    """Base class for calls the client gave up on."""
+
+
+class EmptyResponseError(ClientError):
+    """The model answered without a parsable structured output (refusal or truncation)."""
+
+
+class CircuitOpenError(ClientError):
+    """Calls to a model are suspended after repeated consecutive failures."""
+
+
+class RetryExhaustedError(ClientError):
+    """A call kept failing until its attempts or deadline ran out."""
+
+    def __init__(self, model: str, attempts: int, last_error: Exception):
+        super().__init__(f"{model}: gave up after {attempts} attempt(s): {last_error}")
+        self.model = model
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+# httpx and openai are imported where an exception is classified: any exception
+# they raised means they are loaded already, and importing them stays off the start-up path
+
+def is_rate_limited(exc: Exception) -> bool:
+    import openai
+    return isinstance(exc, openai.APIStatusError) and exc.status_code == 429
+
+
+def is_timeout(exc: Exception) -> bool:
+    import httpx
+    import openai
+    return isinstance(exc, (openai.APITimeoutError, httpx.TimeoutException))
+
+
+def retry_after_seconds(exc: Exception) -> float | None:
+    """Reads the server's Retry-After hint (retry-after-ms, delta-seconds or HTTP date)."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter. Retry-After hints act as a lower bound
+    on the wait; `deadline` caps the seconds a single logical call may take
+    across all attempts, including backoff.
+    """
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    deadline: float | None = 180.0
+
+    def is_retryable(self, exc: Exception) -> bool:
+        import httpx
+        import openai
+        if isinstance(exc, openai.APIStatusError):
+            return exc.status_code in RETRYABLE_STATUS
+        return isinstance(exc, (openai.APIConnectionError, httpx.TransportError, EmptyResponseError))
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before attempt `attempt + 1` (attempts count from 0)."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        backoff = random.uniform(0, ceiling)
+        return max(backoff, retry_after) if retry_after is not None else backoff
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker: opens after `failure_threshold` consecutive failed requests,
+    rejects calls for `reset_timeout` seconds, then lets a single probe through.
+    Rate limiting (429) is left to the limiter and never trips the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self, model: str) -> None:
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return
+            if self.state == CircuitState.OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(f"{model}: circuit open for another {remaining:.1f}s")
+                self.state = CircuitState.HALF_OPEN
+            if self._probing:
+                raise CircuitOpenError(f"{model}: circuit half-open, probe in flight")
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CircuitState.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+
+
+@dataclass
+class CallMetrics:
+    """Reliability counters for one model."""
+    calls: int = 0                # Logical calls (cache hits excluded)
+    attempts: int = 0             # Requests sent, including retries
+    retries: int = 0
+    rate_limited: int = 0         # 429 responses
+    timeouts: int = 0
+    failures: int = 0             # Calls that raised after retries
+    circuit_rejections: int = 0
+    backoff_seconds: float = 0.0
@@ -0,0 +1,93 @@
+import math
+import re
+from collections import Counter
+
+# Words and numbers; years and amounts are often the strongest match for a question
+_TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "how",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were",
+    "what", "which", "with",
+})
+BM25_K1 = 1.5
+BM25_B = 0.75
+ELISION = "[...]"
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token, like the client's rate-limit estimate
+    return len(text) // 4
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word and number terms; variable labels such as rev_2004 split on underscores."""
+    return [term for term in _TOKEN.findall(text.lower()) if term not in STOPWORDS]
+
+
+class SentenceIndex:
+    """
+    BM25 over the sentences of one document's text sections (pre_text, post_text).
+    Built once per record; `select` keeps the sentences that best match a query
+    within a token budget and returns each section with the rest elided.
+    """
+
+    def __init__(self, sections: list[str]):
+        self.sections = sections
+        self.sentences = [
+            (section, sentence)
+            for section, text in enumerate(sections)
+            for sentence in _SENTENCE_END.split(text) if sentence
+        ]
+        self._terms = [Counter(tokenize(sentence)) for _, sentence in self.sentences]
+        self._tokens = [max(1, estimate_tokens(sentence)) for _, sentence in self.sentences]
+        self._lengths = [sum(terms.values()) for terms in self._terms]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency = Counter(term for terms in self._terms for term in terms)
+        count = len(self.sentences)
+        self._idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        query_terms = set(tokenize(query)) & self._idf.keys()
+        scores = []
+        for terms, length in zip(self._terms, self._lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length) if self._avg_length else BM25_K1
+            scores.append(sum(
+                self._idf[term] * terms[term] * (BM25_K1 + 1) / (terms[term] + norm)
+                for term in query_terms if term in terms
+            ))
+        return scores
+
+    def select(self, query: str, budget: int) -> tuple[list[str], int]:
+        """
+        Returns the sections cut down to the highest-scoring sentences that fit
+        `budget` tokens (in document order, gaps marked), and the tokens removed.
+        Sections that already fit are returned unchanged.
+        """
+        total = sum(estimate_tokens(text) for text in self.sections)
+        if total <= budget:
+            return list(self.sections), 0
+
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.sentences)), key=lambda i: (-scores[i], i))
+        kept, used = set(), 0
+        for i in ranked:
+            if used + self._tokens[i] <= budget:
+                kept.add(i)
+                used += self._tokens[i]
+
+        pruned = []
+        for section in range(len(self.sections)):
+            parts: list[str] = []
+            for i, (owner, sentence) in enumerate(self.sentences):
+                if owner != section:
+                    continue
+                if i in kept:
+                    parts.append(sentence)
+                elif not parts or parts[-1] != ELISION:
+                    # Marks each run of dropped sentences so the model knows text is missing
+                    parts.append(ELISION)
+            pruned.append(" ".join(parts))
+        return pruned, total - sum(estimate_tokens(text) for text in pruned)
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator
+
+from src.agent.client import AsyncReasoningClient
+from src.agent.context_builder import ContextBuilder, ContextStore
+from src.agent.orchestrator import ConvFinQAManager, ReflectionMode
+from src.models.schemas import ConversationState, FinancialContext, StudyCondition, TurnResult
+from src.utils.dataset import DatasetStore
+
+logger = logging.getLogger(__name__)
+
+IDLE_SECONDS = 300.0        # Sessions untouched this long are written to disk
+MAX_RESIDENT = 1_000        # Sessions kept in memory; the least recently used beyond this are evicted
+SWEEP_SECONDS = 30.0
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class SessionNotFoundError(LookupError):
+    """No live or evicted session with this id."""
+
+
+class RecordNotFoundError(LookupError):
+    """The dataset has no record with this id."""
+
+
+class SessionBusyError(RuntimeError):
+    """The session has a turn in flight or queued, so it cannot be ended yet."""
+
+
+@dataclass
+class Session:
+    session_id: str
+    record_id: str
+    condition: StudyCondition
+    state: ConversationState
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+    active: int = 0     # Requests holding or waiting for the lock; never evicted while > 0
+
+
+@dataclass
+class SessionStats:
+    created: int = 0
+    turns: int = 0
+    failed_turns: int = 0
+    evicted: int = 0
+    rehydrated: int = 0
+
+
+class SessionManager:
+    """
+    Conversations of many concurrent users over shared resources: one pooled
+    AsyncReasoningClient, one ConvFinQAManager (prompts, context builder) per
+    condition and one ContextStore. A session's turns run one at a time under its
+    own lock, so ans_N references stay ordered; different sessions run concurrently.
+    Sessions idle for `idle_seconds`, and the least recently used ones beyond
+    `max_resident`, are written to `directory` and rehydrated on their next request.
+    All methods must be called from the event loop that owns the client.
+    """
+
+    def __init__(self, client: AsyncReasoningClient, dataset: DatasetStore, directory: Path,
+                 contexts: ContextStore | None = None,
+                 reflection: ReflectionMode = ReflectionMode.SEQUENTIAL,
+                 idle_seconds: float = IDLE_SECONDS, max_resident: int = MAX_RESIDENT):
+        self.client = client
+        self.dataset = dataset
+        self.contexts = contexts
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.reflection = reflection
+        self.idle_seconds = idle_seconds
+        self.max_resident = max_resident
+        self.stats = SessionStats()
+        self._sessions: OrderedDict[str, Session] = OrderedDict()   # Least recently used first
+        self._managers: dict[StudyCondition, ConvFinQAManager] = {}
+
+    def manager(self, condition: StudyCondition) -> ConvFinQAManager:
+        """The shared manager of a condition, created on first use."""
+        manager = self._managers.get(condition)
+        if manager is None:
+            manager = self._managers[condition] = ConvFinQAManager(
+                condition=condition, client=self.client, reflection=self.reflection, contexts=self.contexts
+            )
+        return manager
+
+    @property
+    def resident(self) -> int:
+        return len(self._sessions)
+
+    def _path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.json"
+
+    def _context(self, record_id: str) -> FinancialContext:
+        context = self.contexts.get(record_id) if self.contexts is not None else None
+        if context is None:
+            record = self.dataset.get(record_id)
+            if record is None:
+                raise RecordNotFoundError(record_id)
+            context = ContextBuilder.build(record)
+        return context
+
+    def create(self, record_id: str, condition: StudyCondition, history_window: int | None = None) -> Session:
+        """Starts an empty conversation over a dataset record."""
+        state = ConversationState(context=self._context(record_id), condition=condition,
+                                  history_window=history_window)
+        session = Session(uuid.uuid4().hex, record_id, condition, state)
+        self._sessions[session.session_id] = session
+        self.stats.created += 1
+        self._enforce_limit()
+        return session
+
+    def get(self, session_id: str) -> Session:
+        """A live session, rehydrated from disk if it was evicted."""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+        if not _SESSION_ID.fullmatch(session_id) or not self._path(session_id).exists():
+            raise SessionNotFoundError(session_id)
+
+        # Synchronous on purpose: no other request can observe a half-loaded session
+        data = json.loads(self._path(session_id).read_text(encoding="utf-8"))
+        condition = StudyCondition(data["condition"])
+        state = ConversationState(
+            context=self._context(data["record_id"]), condition=condition,
+            history_window=data["history_window"],
+            history=[TurnResult.model_validate(turn) for turn in data["history"]],
+        )
+        session = Session(session_id, data["record_id"], condition, state)
+        self._sessions[session_id] = session
+        self.stats.rehydrated += 1
+        return session
+
+    @asynccontextmanager
+    async def use(self, session_id: str) -> AsyncIterator[Session]:
+        """Holds a session exclusively; concurrent requests for it queue in arrival order."""
+        session = self.get(session_id)
+        session.active += 1
+        self._enforce_limit()
+        try:
+            async with session.lock:
+                yield session
+        finally:
+            session.active -= 1
+            session.last_used = time.monotonic()
+
+    async def ask(self, session_id: str, question: str) -> TurnResult:
+        """Answers the next question of a session."""
+        async with self.use(session_id) as session:
+            try:
+                turn = await self.manager(session.condition).aprocess_turn(session.state, question)
+            except Exception:
+                self.stats.failed_turns += 1
+                raise
+        self.stats.turns += 1
+        return turn
+
+    def delete(self, session_id: str) -> None:
+        """Ends a session and removes its evicted copy; refused while a turn holds or awaits its lock."""
+        session = self._sessions.get(session_id)
+        if session is not None and session.active:
+            raise SessionBusyError(session_id)
+        self._sessions.pop(session_id, None)
+        path = self._path(session_id) if _SESSION_ID.fullmatch(session_id) else None
+        if session is None and (path is None or not path.exists()):
+            raise SessionNotFoundError(session_id)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    def _evict(self, session: Session) -> None:
+        state = session.state
+        data = {
+            "record_id": session.record_id,
+            "condition": int(session.condition),
+            "history_window": state.history_window,
+            # The context is rebuilt from the ContextStore on rehydration
+            "history": [turn.model_dump(mode="json") for turn in state.history],
+        }
+        partial = self._path(session.session_id).with_suffix(".tmp")
+        partial.write_text(json.dumps(data), encoding="utf-8")
+        partial.replace(self._path(session.session_id))
+        del self._sessions[session.session_id]
+        self.stats.evicted += 1
+
+    def _enforce_limit(self) -> None:
+        excess = len(self._sessions) - self.max_resident
+        if excess <= 0:
+            return
+        for session in [s for s in self._sessions.values() if not s.active][:excess]:
+            self._evict(session)
+
+    def evict_idle(self) -> int:
+        """Writes every session idle longer than `idle_seconds` to disk; returns how many."""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [s for s in self._sessions.values() if not s.active and s.last_used < cutoff]
+        for session in idle:
+            self._evict(session)
+        return len(idle)
+
+    async def sweep(self, interval: float = SWEEP_SECONDS) -> None:
+        """Evicts idle sessions every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.evict_idle()
+            if evicted:
+                logger.info(f"Evicted {evicted} idle sessions ({self.resident} resident)")
+
+    def flush(self) -> None:
+        """Writes every idle resident session to disk, e.g. on shutdown."""
+        for session in [s for s in self._sessions.values() if not s.active]:
+            self._evict(session)
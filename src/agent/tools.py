@@ -1,27 +1,107 @@
+import ast
+import functools
 import logging
+from types import CodeType
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
 
+EXPRESSION_CACHE_SIZE = 4096
+MAX_EXPONENT = 100
+
+_SAFE_FUNCTIONS = {
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "sum": sum,
+}
+
+# Shared, read-only globals: the whitelist below admits no assignment or attribute access
+_SAFE_GLOBALS: Dict[str, Any] = {"__builtins__": {}, **_SAFE_FUNCTIONS}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+    ast.Call, ast.keyword, ast.Tuple, ast.List,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd,
+)
+
+
+def _check_exponent(exponent: ast.expr) -> None:
+    """Blocks big-integer exponent bombs (e.g. 9 ** 9 ** 9) before evaluation."""
+    nodes = list(ast.walk(exponent))
+    if any(isinstance(n, ast.BinOp) and isinstance(n.op, ast.Pow) for n in nodes):
+        raise ValueError("Nested exponents are not allowed")
+    # ans_N values are floats, so variable exponents overflow quickly instead of hanging
+    if any(isinstance(n, ast.Name) and n.id not in _SAFE_FUNCTIONS for n in nodes):
+        return
+
+    try:
+        value = eval(compile(ast.Expression(exponent), "<exponent>", "eval"), _SAFE_GLOBALS)
+    except ArithmeticError:
+        return  # Surfaces again, with the usual handling, when the full expression runs
+    if isinstance(value, int) and abs(value) > MAX_EXPONENT:
+        raise ValueError(f"Integer exponent {value} exceeds {MAX_EXPONENT}")
+
+
+def _validate(tree: ast.Expression) -> None:
+    """Rejects anything beyond arithmetic over literals, names and whitelisted calls."""
+    call_args = {id(arg) for node in ast.walk(tree) if isinstance(node, ast.Call) for arg in node.args}
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Disallowed syntax: {type(node).__name__}")
+
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise ValueError(f"Disallowed literal: {node.value!r}")
+
+        if isinstance(node, ast.Call) and not (
+            isinstance(node.func, ast.Name) and node.func.id in _SAFE_FUNCTIONS
+        ):
+            raise ValueError(f"Disallowed call: {ast.unparse(node.func)}")
+
+        # Sequences only make sense as sum/min/max arguments; elsewhere they enable [0] * 10**9
+        if isinstance(node, (ast.Tuple, ast.List)) and id(node) not in call_args:
+            raise ValueError("Sequences are only allowed as function arguments")
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            # A power of a power grows like 9 ** (100 * 100), whichever side nests
+            if any(isinstance(n, ast.BinOp) and isinstance(n.op, ast.Pow) for n in ast.walk(node.left)):
+                raise ValueError("Nested exponents are not allowed")
+            _check_exponent(node.right)
+
+
+@functools.lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(expression: str) -> CodeType:
+    """Parses, validates and compiles an expression once; repeats hit the LRU cache."""
+    tree = ast.parse(expression.strip(), mode="eval")
+    _validate(tree)
+    return compile(tree, "<expression>", "eval")
+
+
 class MathTool:
     """Deterministic math engine for evaluating and formatting financial expressions."""
 
     @staticmethod
     def calculate(expression: str, reference_values: Dict[str, float]) -> float:
-        """Evaluates a Python math expression within a restricted namespace."""
-        safe_namespace = {
-            "abs": abs,
-            "round": round,
-            "min": min,
-            "max": max,
-            "sum": sum,
-            **reference_values
-        }
+        """Evaluates a validated, pre-compiled math expression against the ans_N map."""
+        try:
+            code = compile_expression(expression)
+        except SyntaxError as e:
+            logger.error(f"Agent generated invalid Python: {expression} | Error: {e}")
+            raise ValueError(f"Invalid expression syntax: {e}")
+        except ValueError as e:
+            logger.error(f"Agent generated disallowed Python: {expression} | Error: {e}")
+            raise ValueError(f"Invalid expression syntax: {e}")
 
         try:
-            result = eval(expression, {"__builtins__": None}, safe_namespace)
+            # reference_values shadow the helper functions, as in the original namespace
+            result = eval(code, _SAFE_GLOBALS, reference_values)
             return float(result)
-        except (SyntaxError, NameError) as e:
+        except NameError as e:
             logger.error(f"Agent generated invalid Python: {expression} | Error: {e}")
             raise ValueError(f"Invalid expression syntax: {e}")
         except ZeroDivisionError:
@@ -36,8 +116,8 @@ class MathTool:
         """Formats raw floats into accounting-standard string representations."""
         if is_percentage:
             return f"{value * 100:.1f}%"
-        
+
         if value.is_integer():
             return f"{int(value):,}"
-        
-        return f"{value:,.2f}".rstrip('0').rstrip('.')
\ No newline at end of file
+
+        return f"{value:,.2f}".rstrip('0').rstrip('.')
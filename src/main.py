@@ -1,68 +1,232 @@
-import json
+import re
 import typer
 from pathlib import Path
+from typing import TYPE_CHECKING
 from rich.console import Console
+from rich.markup import escape
 from rich.panel import Panel
-from src.agent.orchestrator import ConvFinQAManager
-from src.agent.context_builder import ContextBuilder
-from src.models.schemas import ConversationState, StudyCondition
+
+if TYPE_CHECKING:
+    from src.agent.context_builder import ContextStore
+    from src.agent.orchestrator import TurnEvent
+
+# The agent, server and model modules are imported inside the commands that use them,
+# so `--help` and the first prompt do not wait for pydantic models or the OpenAI SDK
 
 app = typer.Typer(name="main", help="ConvFinQA Agentic Interface")
 console = Console()
 ROOT_DIR = Path(__file__).parent.parent
 DATA_PATH = ROOT_DIR / "data" / "convfinqa_dataset.json"
+SESSION_DIR = ROOT_DIR / "data" / "sessions"
+SERVER_CONTEXT_CACHE = 1024     # Decoded record contexts shared by all sessions
+SERVER_HOST = "127.0.0.1"       # Defaults of src.server and src.agent.sessions, kept literal
+SERVER_PORT = 8765              # here so the CLI can show them without importing the server
+SESSION_IDLE_SECONDS = 300.0
+MAX_RESIDENT_SESSIONS = 1_000
+
+STAGE_LABELS = {
+    "baseline": "Answering",
+    "planner": "Planning",
+    "analyst": "Writing the expression",
+    "reviewer": "Reviewing",
+    "self_correction": "Correcting",
+}
+# The leading free-text field of a streamed structured output, shown while it arrives
+_STREAMED_TEXT = re.compile(r'"(?:intent|thought|audit_commentary)"\s*:\s*"((?:[^"\\]|\\.)*)')
 
 def get_record_by_id(record_id: str):
-    with open(DATA_PATH, "r") as f:
-        dataset = json.load(f)["train"]
-        for record in dataset:
-            if record["id"] == record_id:
-                return record
-    return None
+    from src.utils.dataset import DatasetStore
+
+    # Indexed lookup: only the requested record is read from disk
+    store = DatasetStore(DATA_PATH)
+    try:
+        return store.get(record_id)
+    finally:
+        store.close()
 
 @app.command()
 def chat(
     record_id: str = typer.Argument(..., help="ID of the record to chat about"),
-    condition: int = typer.Option(7, help="Condition ID to use (1-7)")
+    condition: int = typer.Option(7, help="Condition ID to use (1-11)"),
+    history_window: int = typer.Option(0, help="Turns kept verbatim in the prompt (0 = all)"),
+    stream: bool = typer.Option(True, help="Stream model output as it is generated")
 ) -> None:
     """Chat with the Synthetic Analyst using a specific Study Condition."""
-    
-    record = get_record_by_id(record_id)
-    if not record:
-        console.print(f"[red]Record ID '{record_id}' not found.[/red]")
-        return
+    from src.agent.context_builder import ContextStore
+    from src.utils.dataset import DatasetStore
+
+    # Indexed lookup: only the requested record is read from disk
+    dataset = DatasetStore(DATA_PATH)
+    try:
+        record = dataset.get(record_id)
+        if not record:
+            console.print(f"[red]Record ID '{escape(record_id)}' not found.[/red]")
+            return
+        # Both stay open for the whole session, the contexts read through the dataset
+        contexts = ContextStore(dataset)
+        try:
+            _chat(record, condition, history_window, stream, contexts)
+        finally:
+            contexts.close()
+    finally:
+        dataset.close()
+
+def _chat(record: dict, condition: int, history_window: int, stream: bool, contexts: "ContextStore") -> None:
+    from src.agent import registry
+    from src.agent.client import ReasoningClient
+    from src.agent.orchestrator import ConvFinQAManager
+    from src.agent.resilience import ClientError
+    from src.models.schemas import StudyCondition
 
     # Use the selected Study Condition
     study_cond = StudyCondition(condition)
-    manager = ConvFinQAManager(condition=study_cond)
-    builder = ContextBuilder()
-    
-    context = builder.build(record)
-    state = ConversationState(context=context, condition=study_cond)
+    manager = ConvFinQAManager(condition=study_cond, client=ReasoningClient(streaming=stream),
+                               history_window=history_window or None, contexts=contexts)
+    state = manager.new_state(record)
+    context = state.context
 
-    console.print(Panel(f"{context.markdown_table}", title=f"Analyzing {record_id} [Cond: {study_cond.name}]"))
+    console.print(Panel(escape(context.markdown_table), title=f"Analyzing {escape(context.record_id)} [Cond: {study_cond.name}]"))
+    # The SDK loads while the user reads the table and types the first question
+    registry.preload()
 
     while True:
         message = input(">>> ")
         if message.strip().lower() in {"exit", "quit"}:
             break
             
-        with console.status("[bold blue]Agent is reasoning..."):
-            turn = manager.process_turn(state, message)
-
-        # Output UI
-        console.print(f"\n[bold blue]Question:[/bold blue] {message}")
-        
-        # Display Plan if available
-        if turn.plan:
-            console.print(f"[dim cyan]Plan:[/dim cyan] {turn.plan.analysis}")
+        # Output UI: each stage is printed as soon as it finishes
+        console.print(f"\n[bold blue]Question:[/bold blue] {escape(message)}")
+        try:
+            with console.status("[bold blue]Agent is reasoning...") as status:
+                turn = manager.process_turn(state, message, on_event=TurnRenderer(status).render)
+        except ClientError as e:
+            console.print(f"[red]The model could not answer: {escape(str(e))}[/red]")
+            continue
+        except Exception as e:
+            # e.g. a rejected request or a replay cache miss: report it and keep the session
+            console.print(f"[red]The turn failed: {escape(f'{type(e).__name__}: {e}')}[/red]")
+            continue
         
         # Show Math and result
         console.print(Panel(
-            f"[bold magenta]Expression:[/bold magenta] `{turn.final_expression}`\n"
-            f"[bold green]Result:[/bold green] [bold white]{turn.conversational_response}[/bold white]",
+            f"[bold magenta]Expression:[/bold magenta] `{escape(turn.final_expression)}`\n"
+            f"[bold green]Result:[/bold green] [bold white]{escape(turn.conversational_response)}[/bold white]",
             border_style="blue"
         ))
 
+class TurnRenderer:
+    """Prints a turn's stage outputs as they arrive and shows the running stage in the status line."""
+
+    def __init__(self, status):
+        self.status = status
+        self.stage = ""
+        self.streamed = ""
+
+    def render(self, event: "TurnEvent") -> None:
+        from src.agent.orchestrator import TurnEventKind
+
+        if event.kind == TurnEventKind.STAGE:
+            self.stage, self.streamed = event.stage, ""
+            self.status.update(f"[bold blue]{STAGE_LABELS.get(event.stage, event.stage)}...")
+        elif event.kind == TurnEventKind.DELTA:
+            self.streamed += event.data
+            match = _STREAMED_TEXT.search(self.streamed)
+            if match:
+                label = STAGE_LABELS.get(self.stage, self.stage)
+                self.status.update(f"[bold blue]{label}:[/bold blue] [dim]{escape(match.group(1)[-80:])}")
+        elif event.kind == TurnEventKind.PLAN:
+            console.print(f"[dim cyan]Plan:[/dim cyan] {escape(event.data.intent)}")
+        elif event.kind == TurnEventKind.EXPRESSION:
+            console.print(f"[dim magenta]Proposed:[/dim magenta] `{escape(event.data.python_expression)}`")
+        elif event.kind == TurnEventKind.REVIEW:
+            if event.data is None:
+                console.print("[dim yellow]Review:[/dim yellow] skipped, local checks passed")
+            else:
+                verdict = "valid" if event.data.is_valid else "flagged"
+                console.print(f"[dim yellow]Review:[/dim yellow] {verdict} - {escape(event.data.audit_commentary)}")
+        elif event.kind == TurnEventKind.CORRECTION:
+            console.print(f"[dim yellow]Corrected:[/dim yellow] `{escape(event.data)}`")
+
+async def _serve(host: str, port: int, condition: int, max_concurrency: int,
+                 idle_seconds: float, max_resident: int) -> None:
+    from src.agent.client import AsyncReasoningClient
+    from src.agent.context_builder import ContextStore
+    from src.agent.sessions import SessionManager
+    from src.models.schemas import StudyCondition
+    from src.server import ChatServer
+    from src.utils.dataset import DatasetStore
+
+    dataset = DatasetStore(DATA_PATH)
+    contexts = ContextStore(dataset, cache_size=SERVER_CONTEXT_CACHE)
+    try:
+        async with AsyncReasoningClient(max_concurrency=max_concurrency) as client:
+            sessions = SessionManager(client, dataset, SESSION_DIR, contexts=contexts,
+                                      idle_seconds=idle_seconds, max_resident=max_resident)
+            server = ChatServer(sessions, host, port, default_condition=StudyCondition(condition))
+            await server.start()
+            console.print(f"[bold green]Serving on http://{host}:{server.port}[/bold green]")
+            await server.serve_forever()
+    finally:
+        contexts.close()
+        dataset.close()
+
+@app.command()
+def serve(
+    host: str = typer.Option(SERVER_HOST, help="Interface to bind"),
+    port: int = typer.Option(SERVER_PORT, help="Port to listen on"),
+    condition: int = typer.Option(7, help="Default condition for new sessions (1-11)"),
+    max_concurrency: int = typer.Option(64, help="In-flight API requests across all sessions"),
+    idle_seconds: float = typer.Option(SESSION_IDLE_SECONDS, help="Idle time before a session is written to disk"),
+    max_resident: int = typer.Option(MAX_RESIDENT_SESSIONS, help="Sessions kept in memory")
+) -> None:
+    """Serve the Synthetic Analyst to many concurrent chat sessions over HTTP."""
+    import asyncio
+
+    try:
+        asyncio.run(_serve(host, port, condition, max_concurrency, idle_seconds, max_resident))
+    except KeyboardInterrupt:
+        console.print("Server stopped; sessions saved to disk.")
+
+@app.command()
+def connect(
+    record_id: str = typer.Argument(..., help="ID of the record to chat about"),
+    url: str = typer.Option(f"http://{SERVER_HOST}:{SERVER_PORT}", help="Chat server address"),
+    condition: int = typer.Option(7, help="Condition ID to use (1-11)"),
+    history_window: int = typer.Option(0, help="Turns kept verbatim in the prompt (0 = all)")
+) -> None:
+    """Chat through a running `serve` instance instead of a local pipeline."""
+    from src.server import ChatClient, ChatServerError
+
+    client = ChatClient(url)
+    try:
+        session = client.create_session(record_id, condition, history_window or None)
+    except (ChatServerError, OSError) as e:
+        console.print(f"[red]Could not start a session: {escape(str(e))}[/red]")
+        return
+
+    console.print(Panel(escape(session["table"]), title=f"Analyzing {escape(record_id)} [Session: {session['session_id']}]"))
+    try:
+        while True:
+            message = input(">>> ")
+            if message.strip().lower() in {"exit", "quit"}:
+                break
+            try:
+                with console.status("[bold blue]Agent is reasoning..."):
+                    turn = client.ask(session["session_id"], message)
+            except ChatServerError as e:
+                console.print(f"[red]{escape(str(e))}[/red]")
+                continue
+
+            console.print(f"\n[bold blue]Question:[/bold blue] {escape(message)}")
+            if turn["intent"]:
+                console.print(f"[dim cyan]Plan:[/dim cyan] {escape(turn['intent'])}")
+            console.print(Panel(
+                f"[bold magenta]Expression:[/bold magenta] `{escape(turn['final_expression'])}`\n"
+                f"[bold green]Result:[/bold green] [bold white]{escape(turn['response'])}[/bold white]",
+                border_style="blue"
+            ))
+    finally:
+        client.close()
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
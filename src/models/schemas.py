@@ -1,6 +1,6 @@
 from enum import IntEnum
 from typing import Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 class StudyCondition(IntEnum):
     """
@@ -32,12 +32,20 @@ class TableEquivalence(BaseModel):
     data_loss_found: bool = Field(description="Detection of missing numeric facts or headers")
     reasoning: str = Field(description="Detailed explanation of discrepancies")
 
+class TableLayout(BaseModel):
+    """Row-major normal form of a dataset table; every table render format starts from it."""
+    columns: list[str]
+    rows: list[str]
+    values: list[list[Any]]     # values[row][column], "n/a" where a column lacks the row
+
 class FinancialContext(BaseModel):
     record_id: str
     pre_text: str
     post_text: str
     markdown_table: str
     raw_table: dict[str, Any]
+    json_table: str         # raw_table as embedded in the JSON conditions' payloads
+    table: TableLayout
 
 class DataPoint(BaseModel):
     label: str = Field(description="Variable name, e.g., rev_2004")
@@ -68,6 +76,33 @@ class ReviewResult(BaseModel):
     audit_commentary: str
     fixed_expression: str | None = None
 
+class StageSpan(BaseModel):
+    """One model call inside a turn: wall time plus Responses API token usage."""
+    stage: str                      # baseline, planner, analyst, reviewer or self_correction
+    model: str
+    effort: str
+    started_at: float               # Unix timestamp
+    duration_ms: float
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    reasoning_tokens: int = 0
+    cache_hit: bool = False         # Served by the local response cache, no API call
+    shared: bool = False            # Reused another condition's identical call (StageMemo), no API call
+    failed: bool = False            # No parsed output; the turn raised
+
+class TurnTrace(BaseModel):
+    spans: list[StageSpan] = []
+    duration_ms: float = 0.0        # Whole turn, including math evaluation
+    math_ms: float = 0.0
+    retries: int = 0                # Self-correction passes triggered by the reviewer
+    review_skipped: bool = False    # Speculative reflection: local checks passed, no reviewer call
+    fixed_expression_applied: bool = False  # Reviewer's fixed_expression used without an analyst re-call
+    pruned_tokens: int = 0          # Estimated document tokens cut by context pruning, per distinct payload
+
+    def total(self, field: str) -> int:
+        return sum(getattr(span, field) for span in self.spans)
+
 class TurnResult(BaseModel):
     turn_index: int
     question: str
@@ -83,24 +118,69 @@ class TurnResult(BaseModel):
     ground_truth: float | None = None
     is_correct: bool | None = None
 
+    trace: TurnTrace | None = None
+
 class ConversationState(BaseModel):
+    """
+    Conversation history plus incrementally maintained views of it.
+    The ans_N map and the serialized prompt history are extended as turns are
+    appended instead of being rebuilt each turn. With `history_window` set, only
+    the last N turns are serialized verbatim and older turns collapse into a
+    one-line summary of their ans_N values (all values stay in the ans map).
+    """
     context: FinancialContext
     condition: StudyCondition
     history: list[TurnResult] = []
+    history_window: int | None = Field(None, ge=1)
+
+    _ans_map: dict[str, float] = PrivateAttr(default_factory=dict)
+    _entries: list[str] = PrivateAttr(default_factory=list)
+    _full_history: str = PrivateAttr(default="")
+    _summary: str = PrivateAttr(default="")
+    _synced: int = PrivateAttr(default=0)
+    _synced_history: list[TurnResult] | None = PrivateAttr(default=None)    # The list the views were built from
+
+    def append_turn(self, turn: TurnResult) -> None:
+        self.history.append(turn)
+        self._sync()
+
+    def _sync(self) -> None:
+        """Folds turns not yet seen into the cached views (also covers direct history.append)."""
+        if self.history is not self._synced_history or self._synced > len(self.history):
+            # History was truncated or replaced (e.g. model_copy(update=...)); start over
+            self._ans_map, self._entries = {}, []
+            self._full_history, self._summary, self._synced = "", "", 0
+            self._synced_history = self.history
+
+        for turn in self.history[self._synced:]:
+            index = self._synced
+            self._ans_map[f"ans_{index}"] = turn.raw_math_output
+            entry = (
+                f"Question: {turn.question}\n"
+                f"Answer: {turn.conversational_response} (Numeric: {turn.raw_math_output})"
+            )
+            self._entries.append(entry)
+            self._full_history = f"{self._full_history}\n---\n{entry}" if index else entry
+
+            if self.history_window and index >= self.history_window:
+                evicted = index - self.history_window
+                summary_item = f"ans_{evicted}={self.history[evicted].raw_math_output}"
+                self._summary = f"{self._summary}, {summary_item}" if self._summary else summary_item
+            self._synced += 1
 
     def get_ans_map(self) -> dict[str, float]:
-        """Maps turn history to ans_N variables for tool execution."""
-        return {f"ans_{i}": turn.raw_math_output for i, turn in enumerate(self.history)}
+        """Maps turn history to ans_N variables for tool execution (shared; do not mutate)."""
+        self._sync()
+        return self._ans_map
 
     def get_prompt_history(self) -> str:
         """Serializes history for inclusion in system prompts."""
+        self._sync()
         if not self.history:
             return "No previous interaction history."
-        
-        output = []
-        for turn in self.history:
-            output.append(
-                f"Question: {turn.question}\n"
-                f"Answer: {turn.conversational_response} (Numeric: {turn.raw_math_output})"
-            )
-        return "\n---\n".join(output)
\ No newline at end of file
+
+        if not self.history_window or len(self._entries) <= self.history_window:
+            return self._full_history
+
+        recent = "\n---\n".join(self._entries[-self.history_window:])
+        return f"Earlier turns (reference as ans_N): {self._summary}\n---\n{recent}"
@@ -0,0 +1,280 @@
+import asyncio
+import http.client
+import json
+import logging
+import re
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import urlsplit
+
+from pydantic import ValidationError
+
+from src.agent.resilience import ClientError
+from src.agent.sessions import RecordNotFoundError, SessionBusyError, SessionManager, SessionNotFoundError
+from src.models.schemas import StudyCondition, TurnResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+HEADER_LIMIT = 64 * 1024
+_SESSION_PATH = re.compile(r"/sessions/([^/]+)(/turns)?")
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def turn_payload(turn: TurnResult) -> dict[str, Any]:
+    """The client-facing view of a turn."""
+    return {
+        "turn_index": turn.turn_index,
+        "question": turn.question,
+        "intent": turn.plan.intent if turn.plan else None,
+        "final_expression": turn.final_expression,
+        "result": turn.raw_math_output,
+        "response": turn.conversational_response,
+        "latency_ms": round(turn.trace.duration_ms, 1) if turn.trace else None,
+    }
+
+
+class ChatServer:
+    """
+    JSON-over-HTTP/1.1 front end for a SessionManager, built on asyncio streams
+    (keep-alive, Content-Length bodies, no extra dependencies). Routes:
+
+        POST   /sessions              {"record_id", "condition"?, "history_window"?}
+        GET    /sessions/{id}
+        POST   /sessions/{id}/turns   {"question"}
+        DELETE /sessions/{id}         (409 while a turn is in progress)
+        GET    /health
+    """
+
+    def __init__(self, sessions: SessionManager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 default_condition: StudyCondition = StudyCondition.MODULAR_MED):
+        self.sessions = sessions
+        self.host = host
+        self.port = port
+        self.default_condition = default_condition
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port, limit=HEADER_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Serves until cancelled, evicting idle sessions in the background; flushes sessions on exit."""
+        if self._server is None:
+            await self.start()
+        sweeper = asyncio.create_task(self.sessions.sweep())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            sweeper.cancel()
+            self.sessions.flush()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                method, path, headers, body = request
+                status, payload = await self._dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes] | None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Truncated request")
+            return None     # Client closed an idle keep-alive connection
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers too large")
+
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        headers = {}
+        for line in header_lines:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path.rstrip("/") or "/", headers, body
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict[str, Any] | None,
+                       keep_alive: bool) -> None:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple[HTTPStatus, dict[str, Any] | None]:
+        try:
+            if path == "/health" and method == "GET":
+                return HTTPStatus.OK, self._health()
+            if path == "/sessions" and method == "POST":
+                return HTTPStatus.CREATED, self._create(self._json(body))
+
+            match = _SESSION_PATH.fullmatch(path)
+            if match is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+            session_id, turns = match.groups()
+            if turns and method == "POST":
+                question = self._json(body).get("question")
+                if not isinstance(question, str) or not question.strip():
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a non-empty 'question'")
+                return HTTPStatus.OK, turn_payload(await self.sessions.ask(session_id, question))
+            if not turns and method == "GET":
+                return HTTPStatus.OK, self._describe(session_id)
+            if not turns and method == "DELETE":
+                self.sessions.delete(session_id)
+                return HTTPStatus.NO_CONTENT, None
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported on {path}")
+
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except SessionNotFoundError as e:
+            return HTTPStatus.NOT_FOUND, {"error": f"Unknown session '{e.args[0]}'"}
+        except SessionBusyError as e:
+            return HTTPStatus.CONFLICT, {"error": f"Session '{e.args[0]}' has a turn in progress"}
+        except RecordNotFoundError as e:
+            return HTTPStatus.NOT_FOUND, {"error": f"Unknown record '{e.args[0]}'"}
+        except ClientError as e:
+            # The model call failed after the client's own retries; the session is unchanged
+            return HTTPStatus.BAD_GATEWAY, {"error": f"The model could not answer: {e}"}
+        except Exception:
+            logger.exception(f"Unhandled error for {method} {path}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+
+    @staticmethod
+    def _json(body: bytes) -> dict[str, Any]:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+        return data
+
+    def _create(self, data: dict[str, Any]) -> dict[str, Any]:
+        record_id = data.get("record_id")
+        if not isinstance(record_id, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a 'record_id'")
+        try:
+            condition = StudyCondition(data.get("condition", self.default_condition))
+            session = self.sessions.create(record_id, condition, data.get("history_window"))
+        except (ValueError, ValidationError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        return {
+            "session_id": session.session_id,
+            "record_id": record_id,
+            "condition": int(condition),
+            "table": session.state.context.markdown_table,
+        }
+
+    def _describe(self, session_id: str) -> dict[str, Any]:
+        session = self.sessions.get(session_id)
+        return {
+            "session_id": session.session_id,
+            "record_id": session.record_id,
+            "condition": int(session.condition),
+            "turns": [turn_payload(turn) for turn in session.state.history],
+        }
+
+    def _health(self) -> dict[str, Any]:
+        stats = self.sessions.stats
+        return {
+            "resident_sessions": self.sessions.resident,
+            "sessions_created": stats.created,
+            "turns": stats.turns,
+            "failed_turns": stats.failed_turns,
+            "evicted": stats.evicted,
+            "rehydrated": stats.rehydrated,
+        }
+
+
+class ChatServerError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+class ChatClient:
+    """Small blocking client for ChatServer over one keep-alive connection (not thread-safe)."""
+
+    def __init__(self, base_url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: float = 600.0):
+        url = urlsplit(base_url)
+        self._connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+
+    def _call(self, method: str, path: str, payload: dict[str, Any] | None = None) -> dict[str, Any] | None:
+        body = json.dumps(payload) if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self._connection.request(method, path, body=body, headers=headers)
+        response = self._connection.getresponse()
+        data = response.read()
+        if response.status >= 400:
+            raise ChatServerError(response.status, json.loads(data or b"{}").get("error", response.reason))
+        return json.loads(data) if data else None
+
+    def create_session(self, record_id: str, condition: int | None = None,
+                       history_window: int | None = None) -> dict[str, Any]:
+        payload: dict[str, Any] = {"record_id": record_id}
+        if condition is not None:
+            payload["condition"] = condition
+        if history_window:
+            payload["history_window"] = history_window
+        return self._call("POST", "/sessions", payload)
+
+    def ask(self, session_id: str, question: str) -> dict[str, Any]:
+        return self._call("POST", f"/sessions/{session_id}/turns", {"question": question})
+
+    def session(self, session_id: str) -> dict[str, Any]:
+        return self._call("GET", f"/sessions/{session_id}")
+
+    def delete_session(self, session_id: str) -> None:
+        self._call("DELETE", f"/sessions/{session_id}")
+
+    def health(self) -> dict[str, Any]:
+        return self._call("GET", "/health")
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,185 @@
+import json
+import operator
+import shutil
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+
+from src.utils.results import (
+    CORRECT, HALLUCINATED, REVIEW_FLAGGED, SCALE_ERROR, STAGES, ResultStore, StringTable
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:     # Optional; falls back to a directory of .npy columns
+    pa = pq = None
+
+PARQUET_SUFFIX = ".parquet"
+COLUMNS_SUFFIX = ".columns"
+META_FILE = "meta.json"
+
+# Dictionary-encoded: int32 codes plus the distinct values
+STRING_COLUMNS = ("condition_name", "record_id", "final_expression")
+COLUMNS = (
+    "condition", "condition_name", "record_id", "turn_index", "is_correct", "ground_truth",
+    "agent_output", "final_expression", "hallucinated", "scale_error", "review_flagged",
+    "was_recovered", "turn_ms", *(f"{stage}_ms" for stage in STAGES),
+)
+
+# Predicates use the pyarrow.parquet `filters` form: (column, op, value), ANDed together
+Filter = tuple[str, str, Any]
+_OPERATORS = {
+    "==": operator.eq, "=": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "in": lambda column, values: np.isin(column, list(values)),
+    "not in": lambda column, values: ~np.isin(column, list(values)),
+}
+
+
+def columnar_path(base: Path) -> Path:
+    """Where the columnar results for `base` live: Parquet with pyarrow, else a .columns directory."""
+    return base.with_name(base.name + (PARQUET_SUFFIX if pq is not None else COLUMNS_SUFFIX))
+
+
+def _recode(codes: np.ndarray, values: list[str], table: StringTable) -> np.ndarray:
+    # Store-local string ids -> ids in the shared table, interning each distinct value once
+    unique, inverse = np.unique(codes, return_inverse=True)
+    shared = np.fromiter((table.intern(values[c]) for c in unique), dtype=np.int32, count=len(unique))
+    return shared[inverse].reshape(-1)
+
+
+def _condition_columns(cond_id: int, name: str, store: ResultStore,
+                       strings: dict[str, StringTable]) -> dict[str, np.ndarray]:
+    """One condition's rows in stream order; string columns as codes into `strings`."""
+    order = np.asarray(store.order(), dtype=np.int64)
+    flags = np.asarray(store.flags, dtype=np.uint8)[order]
+    correct, flagged = (flags & CORRECT) != 0, (flags & REVIEW_FLAGGED) != 0
+    columns = {
+        "condition": np.full(len(order), cond_id, dtype=np.int16),
+        "condition_name": np.full(len(order), strings["condition_name"].intern(name), dtype=np.int32),
+        "record_id": _recode(np.asarray(store.record)[order], store.strings.values, strings["record_id"]),
+        "turn_index": np.asarray(store.turn_index, dtype=np.int32)[order],
+        "is_correct": correct,
+        "ground_truth": np.asarray(store.ground_truth, dtype=np.float64)[order],
+        "agent_output": np.asarray(store.agent_output, dtype=np.float64)[order],
+        "final_expression": _recode(np.asarray(store.expression)[order], store.strings.values,
+                                    strings["final_expression"]),
+        "hallucinated": (flags & HALLUCINATED) != 0,
+        "scale_error": (flags & SCALE_ERROR) != 0,
+        "review_flagged": flagged,
+        "was_recovered": correct & flagged,
+        "turn_ms": np.asarray(store.turn_ms, dtype=np.float64)[order],
+    }
+    for stage in STAGES:
+        columns[f"{stage}_ms"] = np.asarray(store.stage_ms[stage], dtype=np.float64)[order]
+    return columns
+
+
+def write_columnar(path: Path, runs: Iterable[tuple[int, str, ResultStore]]) -> Path:
+    """
+    Writes one row per condition x record x turn for every (condition id, name, store)
+    run: a Parquet file with one row group per condition when pyarrow is installed,
+    otherwise a directory with one .npy file per column.
+    """
+    path = Path(path)
+    strings = {name: StringTable() for name in STRING_COLUMNS}
+    groups = [_condition_columns(cond_id, name, store, strings) for cond_id, name, store in runs]
+
+    if path.suffix == PARQUET_SUFFIX:
+        if pq is None:
+            raise ImportError("Writing Parquet results requires pyarrow")
+        dictionaries = {name: pa.array(table.values, type=pa.string()) for name, table in strings.items()}
+        schema = _schema()
+        # A row group per condition, so condition filters skip whole groups
+        with pq.ParquetWriter(path, schema) as writer:
+            for group in groups:
+                writer.write_table(pa.table({
+                    name: pa.DictionaryArray.from_arrays(group[name], dictionaries[name])
+                    if name in STRING_COLUMNS else pa.array(group[name])
+                    for name in COLUMNS
+                }, schema=schema))
+        return path
+
+    partial = path.with_name(path.name + ".tmp")
+    shutil.rmtree(partial, ignore_errors=True)
+    partial.mkdir(parents=True)
+    rows = 0
+    for name in COLUMNS:
+        column = np.concatenate([group[name] for group in groups]) if groups else np.zeros(0)
+        np.save(partial / f"{name}.npy", column)
+        rows = len(column)
+    meta = {"rows": rows, "columns": list(COLUMNS),
+            "strings": {name: table.values for name, table in strings.items()}}
+    (partial / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+    shutil.rmtree(path, ignore_errors=True)
+    partial.replace(path)
+    return path
+
+
+def _schema() -> "pa.Schema":
+    types = {"condition": pa.int16(), "turn_index": pa.int32()}
+    fields = []
+    for name in COLUMNS:
+        if name in STRING_COLUMNS:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        elif name in types:
+            fields.append(pa.field(name, types[name]))
+        elif name.endswith("_ms") or name in ("ground_truth", "agent_output"):
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.bool_()))
+    return pa.schema(fields)
+
+
+def load_columnar(path: Path, columns: Sequence[str] | None = None,
+                  filters: Sequence[Filter] | None = None) -> dict[str, np.ndarray]:
+    """
+    Loads the requested columns (all by default) of the rows matching every filter,
+    e.g. filters=[("condition", "in", [9, 10, 11]), ("is_correct", "==", False)].
+    Only the columns named in `columns` and `filters` are read; string columns come
+    back as object arrays.
+    """
+    path = Path(path)
+    columns = list(columns or COLUMNS)
+    if path.suffix == PARQUET_SUFFIX:
+        if pq is None:
+            raise ImportError("Reading Parquet results requires pyarrow")
+        table = pq.read_table(path, columns=columns, filters=list(filters) if filters else None)
+        return {name: _to_numpy(table.column(name)) for name in columns}
+
+    meta = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+    loaded: dict[str, np.ndarray] = {}
+
+    def column(name: str) -> np.ndarray:
+        # Memory-mapped, so a filter pass only pages in the columns it touches
+        if name not in loaded:
+            loaded[name] = np.load(path / f"{name}.npy", mmap_mode="r")
+        return loaded[name]
+
+    mask = np.ones(meta["rows"], dtype=bool)
+    for name, op, value in filters or []:
+        if name in STRING_COLUMNS:
+            # Evaluated once per distinct value, then mapped onto the rows by code
+            matches = np.asarray(_OPERATORS[op](np.asarray(meta["strings"][name], dtype=object), value), dtype=bool)
+            mask &= matches[column(name)] if len(matches) else False
+        else:
+            mask &= _OPERATORS[op](column(name), value)
+
+    rows = np.flatnonzero(mask)
+    result = {}
+    for name in columns:
+        values = column(name)[rows]
+        if name in STRING_COLUMNS:
+            values = np.asarray(meta["strings"][name], dtype=object)[values]
+        result[name] = values
+    return result
+
+
+def _to_numpy(column: "pa.ChunkedArray") -> np.ndarray:
+    array = column.combine_chunks()
+    if pa.types.is_dictionary(array.type):
+        dictionary = np.asarray(array.dictionary.to_pylist(), dtype=object)
+        return dictionary[array.indices.to_numpy(zero_copy_only=False)]
+    return array.to_numpy(zero_copy_only=False)
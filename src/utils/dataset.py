@@ -0,0 +1,211 @@
+import json
+import logging
+import mmap
+import random
+import re
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# Structural characters outside strings; string bodies are skipped in one regex step
+_TOKEN = re.compile(rb'["{}\[\]]')
+_STRING_TAIL = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+
+def _scan_records(buffer: mmap.mmap) -> Iterator[tuple[str, int, int]]:
+    """
+    Yields (split, start, end) byte spans of every record in a
+    {"split": [record, ...], ...} document without decoding the whole file.
+    """
+    depth = 0
+    pos = 0
+    last_key = b""
+    split = ""
+    record_start = 0
+
+    while True:
+        match = _TOKEN.search(buffer, pos)
+        if match is None:
+            return
+        char, pos = match.group(), match.end()
+
+        if char == b'"':
+            tail = _STRING_TAIL.match(buffer, pos)
+            if tail is None:
+                raise ValueError(f"Unterminated string at byte {match.start()}")
+            if depth == 1:
+                last_key = buffer[pos:tail.end() - 1]
+            pos = tail.end()
+        elif char in (b"{", b"["):
+            depth += 1
+            if depth == 2:
+                split = last_key.decode("utf-8")
+            elif depth == 3:
+                record_start = match.start()
+        else:
+            if depth == 3:
+                yield split, record_start, match.end()
+            depth -= 1
+
+
+class DatasetStore:
+    """
+    Random access to the ConvFinQA dataset through a one-time on-disk index.
+    The index maps record id -> (split, byte offset, length, conversation length),
+    so single records and samples are read without parsing the full JSON file.
+    It is rebuilt automatically when the dataset file changes.
+    """
+
+    def __init__(self, data_path: Path, index_path: Path | None = None):
+        self.data_path = Path(data_path)
+        self.index_path = Path(index_path) if index_path else self.data_path.with_suffix(".index.sqlite")
+        if not self.data_path.exists():
+            raise FileNotFoundError(f"Dataset not found at {self.data_path}")
+
+        self._conn = sqlite3.connect(self.index_path)
+        if not self._is_current():
+            self.build_index()
+
+    def _fingerprint(self) -> str:
+        stat = self.data_path.stat()
+        return f"{INDEX_VERSION}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _is_current(self) -> bool:
+        try:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        except sqlite3.OperationalError:
+            return False
+        return row is not None and row[0] == self._fingerprint()
+
+    def build_index(self) -> None:
+        """Scans the dataset once and records the byte span of every record."""
+        logger.info(f"Building dataset index for {self.data_path.name}")
+        conn = self._conn
+        conn.executescript(
+            "DROP TABLE IF EXISTS records;"
+            "DROP TABLE IF EXISTS meta;"
+            "CREATE TABLE records ("
+            " ordinal INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL,"
+            " split TEXT NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " num_turns INTEGER NOT NULL);"
+            "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+
+        with open(self.data_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            rows = []
+            for split, start, end in _scan_records(buffer):
+                record = json.loads(buffer[start:end])
+                num_turns = len(record.get("dialogue", {}).get("conv_questions", []))
+                rows.append((record.get("id", "unknown"), split, start, end - start, num_turns))
+
+        conn.executemany(
+            "INSERT INTO records (id, split, offset, length, num_turns) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.execute("CREATE INDEX idx_records_id ON records(id)")
+        conn.execute("CREATE INDEX idx_records_split ON records(split, ordinal)")
+        conn.execute("INSERT INTO meta VALUES ('fingerprint', ?)", (self._fingerprint(),))
+        conn.commit()
+
+    def _read(self, offset: int, length: int) -> dict[str, Any]:
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def get(self, record_id: str, split: str | None = None) -> dict[str, Any] | None:
+        """Fetches a single record by id, optionally restricted to one split."""
+        query = "SELECT offset, length FROM records WHERE id = ?"
+        params: tuple[str, ...] = (record_id,)
+        if split:
+            query += " AND split = ?"
+            params += (split,)
+        row = self._conn.execute(query + " ORDER BY ordinal LIMIT 1", params).fetchone()
+        return self._read(*row) if row else None
+
+    def ids(self, split: str = "train") -> list[str]:
+        """Record ids of a split in file order."""
+        rows = self._conn.execute(
+            "SELECT id FROM records WHERE split = ? ORDER BY ordinal", (split,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def num_turns(self, record_id: str) -> int | None:
+        row = self._conn.execute("SELECT num_turns FROM records WHERE id = ?", (record_id,)).fetchone()
+        return row[0] if row else None
+
+    def splits(self) -> dict[str, int]:
+        rows = self._conn.execute("SELECT split, COUNT(*) FROM records GROUP BY split").fetchall()
+        return dict(rows)
+
+    def sample(self, k: int, split: str = "train", seed: int | None = None) -> list[dict[str, Any]]:
+        """
+        Draws k records of a split. Sampling over the ordered id list selects the
+        same records as random.sample over the fully loaded split with the same seed.
+        """
+        spans = self._conn.execute(
+            "SELECT offset, length FROM records WHERE split = ? ORDER BY ordinal", (split,)
+        ).fetchall()
+        if seed is not None:
+            random.seed(seed)
+        return [self._read(*span) for span in random.sample(spans, min(k, len(spans)))]
+
+    def spans(self, split: str = "train") -> list[tuple[int, int]]:
+        """(offset, length) byte spans of a split's records in file order, e.g. for worker processes."""
+        return self._conn.execute(
+            "SELECT offset, length FROM records WHERE split = ? ORDER BY ordinal", (split,)
+        ).fetchall()
+
+    def iter_records(self, split: str = "train") -> Iterator[dict[str, Any]]:
+        """Streams the records of a split in file order, one parsed record at a time."""
+        yield from read_spans(self.data_path, self.spans(split))
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def read_spans(data_path: Path, spans: Iterable[tuple[int, int]]) -> Iterator[dict[str, Any]]:
+    """Parses the records at the given byte spans of a dataset file."""
+    with open(data_path, "rb") as f:
+        for offset, length in spans:
+            f.seek(offset)
+            yield json.loads(f.read(length))
+
+
+def shard_records(records: Iterable[dict[str, Any]], index: int, count: int) -> Iterator[dict[str, Any]]:
+    """
+    Deterministically keeps the records owned by shard `index` of `count`.
+    Ownership is a stable hash of the record id, so shards agree across machines.
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index {index} is outside 0..{count - 1}")
+    for record in records:
+        if zlib.crc32(record.get("id", "").encode("utf-8")) % count == index:
+            yield record
+
+
+def reservoir_sample(records: Iterable[dict[str, Any]], k: int, seed: int | None = None) -> list[dict[str, Any]]:
+    """
+    Uniform sample of k records from a stream of unknown length in a single pass,
+    holding at most k records in memory. Results keep stream order.
+    """
+    rng = random.Random(seed)
+    # Algorithm R with stream positions so the sample can be re-sorted into file order
+    reservoir: list[tuple[int, dict[str, Any]]] = []
+    for position, record in enumerate(records):
+        if position < k:
+            reservoir.append((position, record))
+        else:
+            slot = rng.randint(0, position)
+            if slot < k:
+                reservoir[slot] = (position, record)
+    return [record for _, record in sorted(reservoir, key=lambda item: item[0])]
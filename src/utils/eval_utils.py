@@ -2,6 +2,8 @@
 
 import math
 import re
+from dataclasses import dataclass, field
+from typing import Dict
 
 def is_nearly_equal(val1: float, val2: float, tolerance: float = 0.02) -> bool:
     """
@@ -37,4 +39,49 @@ def calculate_scale_error(actual: float, expected: float) -> bool:
     """Identifies errors off by more than 50% (unit/scale failure)."""
     if expected == 0: return False
     ratio = abs(actual / expected)
-    return ratio > 1.5 or ratio < 0.5
\ No newline at end of file
+    return ratio > 1.5 or ratio < 0.5
+
+@dataclass
+class TurnStats:
+    correct: int = 0
+    total: int = 0
+
+    @property
+    def accuracy(self) -> float:
+        return (self.correct / self.total * 100) if self.total > 0 else 0
+
+@dataclass
+class ConditionMetrics:
+    total_turns: int = 0
+    correct: int = 0
+    hallucinations: int = 0
+    scale_errors: int = 0
+    recovery_attempts: int = 0
+    successful_recoveries: int = 0
+    per_turn_breakdown: Dict[int, TurnStats] = field(default_factory=dict)
+
+    def update(self, turn_idx: int, is_correct: bool, is_hallucinated: bool, 
+               is_scale: bool, internal_review_failed: bool):
+        self.total_turns += 1
+        if is_correct: self.correct += 1
+        if is_hallucinated: self.hallucinations += 1
+        if is_scale: self.scale_errors += 1
+        
+        # FIXED LOGIC: Attempt is counted if the agent flagged itself.
+        if internal_review_failed:
+            self.recovery_attempts += 1
+            if is_correct:
+                self.successful_recoveries += 1
+        
+        if turn_idx not in self.per_turn_breakdown:
+            self.per_turn_breakdown[turn_idx] = TurnStats()
+        self.per_turn_breakdown[turn_idx].total += 1
+        if is_correct: self.per_turn_breakdown[turn_idx].correct += 1
+
+    @property
+    def final_accuracy(self) -> float:
+        return (self.correct / self.total_turns * 100) if self.total_turns > 0 else 0
+    
+    @property
+    def recovery_rate(self) -> float:
+        return (self.successful_recoveries / self.recovery_attempts * 100) if self.recovery_attempts > 0 else 0
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
+
+from src.models.schemas import TurnResult
+
+logger = logging.getLogger(__name__)
+
+TAIL_CHUNK = 64 * 1024
+
+
+class JournalEntry(NamedTuple):
+    record_id: str
+    position: int           # Index of the record in the evaluation stream
+    ground_truth: list[Any]
+    turns: list[TurnResult]
+
+
+class ResultJournal:
+    """
+    Append-only JSONL log of finished records for one study condition.
+    Each line is flushed and fsynced on write, so a crash loses at most the
+    record in flight; a torn final line is cut off when the journal is opened,
+    so entries appended after a resume start on a line of their own.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._truncate_torn_tail()
+
+    def _truncate_torn_tail(self) -> None:
+        """Drops a partial last line left by a crash mid-write."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - TAIL_CHUNK)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                logger.warning(f"Discarding a torn final line ({end - position} bytes) in {self.path.name}")
+                f.truncate(position)
+
+    def reset(self) -> None:
+        """Starts a fresh journal, discarding previous entries."""
+        self.path.write_text("", encoding="utf-8")
+
+    def append(self, entry: JournalEntry) -> None:
+        record_id, position, ground_truth, turns = entry
+        line = json.dumps({
+            "record_id": record_id,
+            "position": position,
+            "ground_truth": ground_truth,
+            "turns": [turn.model_dump(mode="json") for turn in turns],
+        })
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __iter__(self) -> Iterator[JournalEntry]:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                    turns = [TurnResult.model_validate(t) for t in data["turns"]]
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping unreadable journal line {line_no} in {self.path.name}: {e}")
+                    continue
+                yield JournalEntry(data["record_id"], data.get("position", line_no),
+                                   data["ground_truth"], turns)
+
+    def load(self) -> dict[str, JournalEntry]:
+        """Returns the latest entry per record id."""
+        return {entry.record_id: entry for entry in self}
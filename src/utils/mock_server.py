@@ -0,0 +1,292 @@
+import itertools
+import json
+import logging
+import multiprocessing
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from src.agent.cache import CacheMode, ResponseCache
+from src.models import schemas
+
+logger = logging.getLogger(__name__)
+
+# Efforts tried for replay lookups when the request carries no reasoning block (mini models)
+REPLAY_FALLBACK_EFFORTS = ("none", "medium")
+
+
+@dataclass
+class LatencyModel:
+    """
+    Per-request service time. Parsed from "fixed:MS", "uniform:LO,HI" or
+    "lognormal:MEDIAN_MS,SIGMA" (heavy-tailed, closest to real API latency).
+    """
+    kind: str = "fixed"
+    params: tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, _, raw = spec.partition(":")
+        try:
+            params = tuple(float(p) for p in raw.split(",")) if raw else ()
+        except ValueError:
+            raise ValueError(f"Invalid latency parameters in '{spec}'")
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"Expected fixed:MS, uniform:LO,HI or lognormal:MEDIAN_MS,SIGMA, got '{spec}'")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        """Seconds to wait before answering."""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        else:
+            median, sigma = self.params
+            ms = median * rng.lognormvariate(0, sigma)
+        return max(ms, 0.0) / 1000
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    errors: int = 0
+    replayed: int = 0
+    canned: int = 0
+    by_format: dict[str, int] = field(default_factory=dict)
+
+
+def _example_from_schema(schema: dict[str, Any], defs: dict[str, Any]) -> Any:
+    """Smallest instance satisfying a JSON schema; covers what structured outputs emit."""
+    if "$ref" in schema:
+        return _example_from_schema(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    if "anyOf" in schema:
+        return _example_from_schema(schema["anyOf"][0], defs)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _example_from_schema(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    return {"string": "", "number": 0.0, "integer": 0, "boolean": False, "null": None}.get(kind)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Accepts connection bursts from a wide client pool
+
+
+class MockResponsesServer:
+    """
+    Local stand-in for the Responses API endpoint used by `responses.parse`.
+    Answers POST /v1/responses after a sampled latency, fails a configurable
+    fraction of requests, and returns either outputs replayed from a recorded
+    ResponseCache or canned outputs shaped by the requested JSON schema.
+    Each request is served on its own thread, so client-side concurrency is real.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: LatencyModel | None = None, error_rate: float = 0.0,
+                 error_status: int = 500, replay: ResponseCache | None = None,
+                 invalid_review_rate: float = 0.0, seed: int | None = None,
+                 retry_after: float | None = None):
+        if not 0 <= error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.replay = replay
+        self.invalid_review_rate = invalid_review_rate
+        self.stats = MockStats()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._httpd = _Server((host, port), self._handler_class())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockResponsesServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockResponsesServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+            disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/responses"):
+                    status, payload = 404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}}
+                else:
+                    status, payload = server.handle(body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                if status == 429 and server.retry_after is not None:
+                    self.send_header("Retry-After", f"{server.retry_after:g}")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format % args)
+
+        return Handler
+
+    def handle(self, body: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        """Produces (status, JSON body) for one request, after the simulated service time."""
+        with self._lock:
+            delay = self.latency.sample(self._rng)
+            fail = self._rng.random() < self.error_rate
+            flag_review = self._rng.random() < self.invalid_review_rate
+            self.stats.requests += 1
+            if fail:
+                self.stats.errors += 1
+        time.sleep(delay)
+
+        if fail:
+            return self.error_status, {"error": {"message": "Injected failure", "type": "server_error"}}
+
+        text_format = body.get("text", {}).get("format", {})
+        name = text_format.get("name", "")
+        text = self._replayed(body, name)
+        with self._lock:
+            self.stats.by_format[name] = self.stats.by_format.get(name, 0) + 1
+            if text is not None:
+                self.stats.replayed += 1
+            else:
+                self.stats.canned += 1
+        if text is None:
+            text = json.dumps(self._canned(name, text_format.get("schema", {}), body, flag_review))
+
+        return 200, self._response(body, text)
+
+    def _replayed(self, body: dict[str, Any], name: str) -> str | None:
+        response_model = getattr(schemas, name, None)
+        if self.replay is None or not (isinstance(response_model, type) and issubclass(response_model, BaseModel)):
+            return None
+        effort = (body.get("reasoning") or {}).get("effort")
+        for candidate in ((effort,) if effort else REPLAY_FALLBACK_EFFORTS):
+            key = ResponseCache.make_key(body.get("model", ""), candidate, body.get("instructions", ""),
+                                         body.get("input", ""), response_model)
+            parsed = self.replay.get(key, response_model)
+            if parsed is not None:
+                return parsed.model_dump_json()
+        return None
+
+    @staticmethod
+    def _canned(name: str, schema: dict[str, Any], body: dict[str, Any], flag_review: bool) -> dict[str, Any]:
+        output = _example_from_schema(schema, schema.get("$defs", {})) or {}
+        if name == "AnalyticStep":
+            # Chains on the previous answer when there is history, so ans_N lookups are exercised
+            has_history = "Question:" in str(body.get("input", ""))
+            output.update(thought="Canned response", python_expression="ans_0 * 1.1" if has_history else "(120 - 100) / 100")
+        elif name == "AnalysisPlan":
+            output.update(intent="Canned plan", execution_steps=["compute change"])
+        elif name == "ReviewResult":
+            output.update(is_valid=not flag_review,
+                          audit_commentary="Canned review flagged the expression" if flag_review else "Looks correct")
+        elif name == "TableEquivalence":
+            output.update(is_equivalent=True, reasoning="Canned audit")
+        return output
+
+    def _response(self, body: dict[str, Any], text: str) -> dict[str, Any]:
+        n = next(self._ids)
+        prompt = f"{body.get('instructions') or ''}{body.get('input') or ''}"
+        input_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        return {
+            "id": f"resp_mock_{n}",
+            "object": "response",
+            "created_at": time.time(),
+            "model": body.get("model", ""),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": f"msg_mock_{n}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+
+def _serve(conn: Any, replay_path: Path | None, options: dict[str, Any]) -> None:
+    replay = ResponseCache(replay_path, CacheMode.READ_ONLY) if replay_path else None
+    server = MockResponsesServer(replay=replay, **options).start()
+    conn.send(server.base_url)
+    conn.recv()  # Blocks until the parent asks us to stop
+    server.stop()
+    conn.send(server.stats)
+    conn.close()
+
+
+class MockServerProcess:
+    """
+    Runs a MockResponsesServer in a child process, keeping its request threads
+    and allocations out of client-side throughput and memory measurements.
+    Takes the MockResponsesServer options; replay reads the cache at `replay_path`.
+    """
+
+    def __init__(self, replay_path: Path | None = None, **options: Any):
+        self.replay_path = replay_path
+        self.options = options
+        self.base_url = ""
+        self.stats: MockStats | None = None
+        self._conn = None
+        self._process = None
+
+    def __enter__(self) -> "MockServerProcess":
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child = ctx.Pipe()
+        self._process = ctx.Process(target=_serve, args=(child, self.replay_path, self.options), daemon=True)
+        self._process.start()
+        child.close()  # So recv() sees EOF if the child dies
+        try:
+            self.base_url = self._conn.recv()
+        except EOFError:
+            self._process.join()
+            raise RuntimeError(f"Mock server process exited with code {self._process.exitcode}")
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._conn.send("stop")
+        self.stats = self._conn.recv()
+        self._process.join()
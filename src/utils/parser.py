@@ -1,4 +1,28 @@
-from typing import Dict, Any, List
+import csv
+import io
+import json
+from enum import Enum
+from typing import Dict, Any
+
+from src.models.schemas import TableLayout
+
+# Bump whenever table_to_markdown or ContextBuilder output changes; invalidates ContextStore files
+PARSER_VERSION = 2
+
+MISSING = "n/a"
+
+class TableFormat(str, Enum):
+    """
+    MARKDOWN: pipe table with bold row labels and thousands separators.
+    CSV/TSV:  a header line, then one line per row label with the raw values.
+    JSON:     minified {"columns": [...], "rows": {label: [values]}}.
+    REPR:     the source dict's Python repr, as the JSON conditions have always embedded it.
+    """
+    MARKDOWN = "markdown"
+    CSV = "csv"
+    TSV = "tsv"
+    JSON = "json"
+    REPR = "repr"
 
 def _format_financial_value(val: Any) -> str:
     """Handles comma separators and decimal precision for financial metrics."""
@@ -12,41 +36,70 @@ def _format_financial_value(val: Any) -> str:
     
     return f"{val:,}"
 
-def table_to_markdown(table_dict: Dict[str, Dict[str, Any]]) -> str:
+def normalize_table(table_dict: Dict[str, Dict[str, Any]]) -> TableLayout:
     """
-    Transforms ConvFinQA-style nested dictionaries into a Markdown table.
-    Preserves row and column order based on dictionary insertion order.
+    Lays a ConvFinQA-style {column: {row: value}} dict out row-major in a single pass.
+    Rows keep the order in which labels first appear, columns keep insertion order.
     """
     if not table_dict or not isinstance(table_dict, dict):
+        return TableLayout.model_construct(columns=[], rows=[], values=[])
+
+    width = len(table_dict)
+    by_label: Dict[str, list[Any]] = {}
+    for index, col_data in enumerate(table_dict.values()):
+        for label, value in col_data.items():
+            row = by_label.get(label)
+            if row is None:
+                row = by_label[label] = [MISSING] * width
+            row[index] = value
+
+    # Built from trusted dataset values; skipping validation avoids copying every cell
+    return TableLayout.model_construct(
+        columns=list(table_dict), rows=list(by_label), values=list(by_label.values())
+    )
+
+def render_markdown(layout: TableLayout) -> str:
+    if not layout.rows:
         return ""
 
-    columns = list(table_dict.keys())
-    
-    # Collect unique row labels across all columns while preserving insertion order
-    row_labels: List[str] = []
-    seen = set()
-    for col_data in table_dict.values():
-        for label in col_data:
-            if label not in seen:
-                seen.add(label)
-                row_labels.append(label)
-
-    if not row_labels:
+    lines = [
+        f"| Item | {' | '.join(layout.columns)} |",
+        f"| :--- | {' | '.join([':---:'] * len(layout.columns))} |",
+    ]
+    # Bold the metric name for visual hierarchy
+    lines.extend(
+        f"| **{label}** | {' | '.join(map(_format_financial_value, values))} |"
+        for label, values in zip(layout.rows, layout.values)
+    )
+    return "\n".join(lines)
+
+def _render_delimited(layout: TableLayout, delimiter: str) -> str:
+    if not layout.rows:
         return ""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(["Item", *layout.columns])
+    writer.writerows([label, *values] for label, values in zip(layout.rows, layout.values))
+    return buffer.getvalue().rstrip("\n")
+
+def render_table(layout: TableLayout, fmt: TableFormat) -> str:
+    """Renders a normalized table; REPR needs the source dict and is not available here."""
+    if fmt == TableFormat.MARKDOWN:
+        return render_markdown(layout)
+    if fmt == TableFormat.CSV:
+        return _render_delimited(layout, ",")
+    if fmt == TableFormat.TSV:
+        return _render_delimited(layout, "\t")
+    if fmt == TableFormat.JSON:
+        if not layout.rows:
+            return ""
+        return json.dumps({"columns": layout.columns, "rows": dict(zip(layout.rows, layout.values))},
+                          separators=(",", ":"), ensure_ascii=False)
+    raise ValueError(f"{fmt.value} tables are rendered from the source dict")
 
-    # Build components
-    header = f"| Item | {' | '.join(columns)} |"
-    separator = f"| :--- | {' | '.join([':---:'] * len(columns))} |"
-
-    rows = []
-    for label in row_labels:
-        # Bold the metric name for visual hierarchy
-        row_cells = [f"**{label}**"]
-        
-        for col in columns:
-            value = table_dict[col].get(label, "n/a")
-            row_cells.append(_format_financial_value(value))
-        
-        rows.append(f"| {' | '.join(row_cells)} |")
-
-    return "\n".join([header, separator] + rows)
\ No newline at end of file
+def table_to_markdown(table_dict: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Transforms ConvFinQA-style nested dictionaries into a Markdown table.
+    Preserves row and column order based on dictionary insertion order.
+    """
+    return render_markdown(normalize_table(table_dict))
@@ -0,0 +1,152 @@
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from src.utils.eval_utils import ConditionMetrics, TurnStats
+from src.utils.results import HALLUCINATED, REVIEW_FLAGGED, ResultStore
+
+logger = logging.getLogger(__name__)
+
+ABSOLUTE_TOLERANCE = 0.05
+DEFAULT_TOLERANCE = 0.02
+
+
+@dataclass
+class ResultArrays:
+    """Column-wise view of every scored turn across the loaded result files."""
+    condition: np.ndarray       # int, StudyCondition value
+    turn_index: np.ndarray      # int
+    ground_truth: np.ndarray    # float, NaN when the answer is not numeric
+    agent_output: np.ndarray    # float
+    hallucinated: np.ndarray    # bool, False when no expression was stored
+    review_flagged: np.ndarray  # bool
+    names: dict[int, str]       # condition id -> display name
+
+    def __len__(self) -> int:
+        return len(self.condition)
+
+
+def load_results(paths: Iterable[Path]) -> ResultArrays:
+    """
+    Flattens eval_results_cond_*.json files into arrays. Files written before
+    rows carried `final_expression`/`review_flagged` load with those flags False.
+    """
+    columns: dict[str, list[np.ndarray]] = {name: [] for name in (
+        "condition", "turn_index", "ground_truth", "agent_output", "hallucinated", "review_flagged"
+    )}
+    names: dict[int, str] = {}
+    legacy_rows = 0
+
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        cond_id = int(data["metadata"]["id"])
+        names[cond_id] = data["metadata"]["name"]
+        rows = data["detailed_results"]
+        legacy_rows += sum("review_flagged" not in row.get("metrics", {}) for row in rows)
+
+        store = ResultStore.from_rows(rows)
+        columns["condition"].append(np.full(len(store), cond_id, dtype=np.int16))
+        columns["turn_index"].append(np.asarray(store.turn_index, dtype=np.int32))
+        columns["ground_truth"].append(np.asarray(store.ground_truth, dtype=np.float64))
+        columns["agent_output"].append(np.asarray(store.agent_output, dtype=np.float64))
+        columns["hallucinated"].append(store.flag(HALLUCINATED))
+        columns["review_flagged"].append(store.flag(REVIEW_FLAGGED))
+
+    if legacy_rows:
+        logger.warning(f"{legacy_rows} rows predate stored expressions/review flags; treated as False")
+
+    dtypes = {"condition": np.int16, "turn_index": np.int32, "ground_truth": np.float64,
+              "agent_output": np.float64, "hallucinated": bool, "review_flagged": bool}
+    return ResultArrays(
+        **{name: np.concatenate(parts) if parts else np.zeros(0, dtype=dtypes[name])
+           for name, parts in columns.items()},
+        names=names,
+    )
+
+
+def _isclose(a: np.ndarray, b: np.ndarray, rel_tol: np.ndarray | float) -> np.ndarray:
+    # math.isclose with abs_tol=0: |a - b| <= rel_tol * max(|a|, |b|); equality covers infinities
+    with np.errstate(invalid="ignore"):
+        return (a == b) | (np.abs(a - b) <= rel_tol * np.maximum(np.abs(a), np.abs(b)))
+
+
+def nearly_equal(actual: np.ndarray, expected: np.ndarray,
+                 tolerance: np.ndarray | float = DEFAULT_TOLERANCE) -> np.ndarray:
+    """
+    Vectorized is_nearly_equal. `tolerance` may be an array shaped to broadcast
+    against the values, e.g. (T, 1) to score T tolerances at once.
+    """
+    with np.errstate(invalid="ignore", over="ignore"):
+        return (
+            (np.abs(actual - expected) < ABSOLUTE_TOLERANCE)
+            | _isclose(actual, expected, tolerance)
+            | _isclose(actual * 100, expected, tolerance)
+            | _isclose(actual, expected * 100, tolerance)
+        )
+
+
+def scale_errors(actual: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_scale_error: off by more than 50% in either direction."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.abs(actual / expected)
+        return (expected != 0) & ((ratio > 1.5) | (ratio < 0.5))
+
+
+def rescore(results: ResultArrays, tolerance: float = DEFAULT_TOLERANCE) -> dict[int, ConditionMetrics]:
+    """Recomputes ConditionMetrics for every condition at the given tolerance."""
+    correct = nearly_equal(results.agent_output, results.ground_truth, tolerance)
+    scale = scale_errors(results.agent_output, results.ground_truth) & ~correct
+    recovered = results.review_flagged & correct
+
+    cond_ids, codes = np.unique(results.condition, return_inverse=True)
+    n = len(cond_ids)
+
+    def per_condition(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(codes, weights=mask, minlength=n).astype(int)
+
+    totals = np.bincount(codes, minlength=n)
+    sums = {
+        "correct": per_condition(correct),
+        "hallucinations": per_condition(results.hallucinated),
+        "scale_errors": per_condition(scale),
+        "recovery_attempts": per_condition(results.review_flagged),
+        "successful_recoveries": per_condition(recovered),
+    }
+
+    # Per-turn breakdown via one bincount over (condition, turn) pairs
+    max_turn = int(results.turn_index.max()) + 1 if len(results) else 0
+    pair = codes * max_turn + results.turn_index
+    pair_totals = np.bincount(pair, minlength=n * max_turn).reshape(n, max_turn)
+    pair_correct = np.bincount(pair, weights=correct, minlength=n * max_turn).reshape(n, max_turn).astype(int)
+
+    metrics = {}
+    for i, cond_id in enumerate(cond_ids):
+        metrics[int(cond_id)] = ConditionMetrics(
+            total_turns=int(totals[i]),
+            **{name: int(values[i]) for name, values in sums.items()},
+            per_turn_breakdown={
+                t: TurnStats(correct=int(pair_correct[i, t]), total=int(pair_totals[i, t]))
+                for t in np.flatnonzero(pair_totals[i]).tolist()
+            },
+        )
+    return metrics
+
+
+def tolerance_sweep(results: ResultArrays, tolerances: Sequence[float]) -> dict[int, np.ndarray]:
+    """Accuracy (%) per condition for each tolerance, computed in one broadcast pass."""
+    tol = np.asarray(tolerances, dtype=np.float64)[:, None]
+    correct = nearly_equal(results.agent_output[None, :], results.ground_truth[None, :], tol)
+
+    cond_ids, codes = np.unique(results.condition, return_inverse=True)
+    totals = np.bincount(codes, minlength=len(cond_ids))
+    # Row-wise bincount: offset each tolerance's codes into its own block
+    offsets = (np.arange(len(tol))[:, None] * len(cond_ids) + codes[None, :]).ravel()
+    hits = np.bincount(offsets, weights=correct.ravel(), minlength=len(tol) * len(cond_ids))
+    accuracy = hits.reshape(len(tol), len(cond_ids)) / np.maximum(totals, 1) * 100
+
+    return {int(cond_id): accuracy[:, i] for i, cond_id in enumerate(cond_ids)}
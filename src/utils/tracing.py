@@ -0,0 +1,135 @@
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from src.models.schemas import TurnResult, TurnTrace
+
+TOKEN_FIELDS = ("input_tokens", "cached_tokens", "output_tokens", "reasoning_tokens")
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _latency(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "mean": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "p50": round(_percentile(ordered, 50), 2),
+        "p95": round(_percentile(ordered, 95), 2),
+    }
+
+
+@dataclass
+class _StageTotals:
+    durations: list[float] = field(default_factory=list)
+    tokens: dict[str, int] = field(default_factory=lambda: dict.fromkeys(TOKEN_FIELDS, 0))
+    cache_hits: int = 0
+    shared: int = 0
+    failures: int = 0
+
+
+class TraceAggregator:
+    """Accumulates turn traces of one condition into the summary stored in eval_results_cond_N.json."""
+
+    def __init__(self):
+        self.turns = 0
+        self.untraced_turns = 0
+        self.retries = 0
+        self.reviews_skipped = 0
+        self.fixes_applied = 0
+        self.pruned_tokens = 0
+        self.turn_durations: list[float] = []
+        self.math_durations: list[float] = []
+        self.stages: dict[str, _StageTotals] = {}
+
+    def add(self, trace: TurnTrace | None) -> None:
+        if trace is None:
+            # Journals written before tracing existed
+            self.untraced_turns += 1
+            return
+        self.turns += 1
+        self.retries += trace.retries
+        self.reviews_skipped += trace.review_skipped
+        self.fixes_applied += trace.fixed_expression_applied
+        self.pruned_tokens += trace.pruned_tokens
+        self.turn_durations.append(trace.duration_ms)
+        self.math_durations.append(trace.math_ms)
+        for span in trace.spans:
+            totals = self.stages.setdefault(span.stage, _StageTotals())
+            totals.durations.append(span.duration_ms)
+            for name in TOKEN_FIELDS:
+                totals.tokens[name] += getattr(span, name)
+            totals.cache_hits += span.cache_hit
+            totals.shared += span.shared
+            totals.failures += span.failed
+
+    def tokens(self) -> dict[str, int]:
+        return {name: sum(s.tokens[name] for s in self.stages.values()) for name in TOKEN_FIELDS}
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "traced_turns": self.turns,
+            "untraced_turns": self.untraced_turns,
+            "self_corrections": self.retries,
+            "reviews_skipped": self.reviews_skipped,
+            "fixed_expressions_applied": self.fixes_applied,
+            "pruned_tokens": self.pruned_tokens,
+            "turn_latency_ms": _latency(self.turn_durations),
+            "math_latency_ms": _latency(self.math_durations),
+            "tokens": self.tokens(),
+            "stages": {
+                stage: {
+                    "calls": len(totals.durations),
+                    "cache_hits": totals.cache_hits,
+                    "shared": totals.shared,
+                    "failures": totals.failures,
+                    "latency_ms": _latency(totals.durations),
+                    "tokens": totals.tokens,
+                }
+                for stage, totals in self.stages.items()
+            },
+        }
+
+
+class SpanExporter:
+    """
+    Writes one JSON line per model call plus one per turn (stage "turn"), tagged
+    with condition, record and correctness, for charting cost/latency vs. accuracy.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def reset(self) -> None:
+        self.path.write_text("", encoding="utf-8")
+
+    def export(self, condition: int, record_id: str, turns: list[TurnResult],
+               correct: list[bool | None]) -> None:
+        lines = []
+        for turn, is_correct in zip(turns, correct):
+            if turn.trace is None:
+                continue
+            tags = {"condition": condition, "record_id": record_id,
+                    "turn_index": turn.turn_index, "is_correct": is_correct}
+            for span in turn.trace.spans:
+                lines.append({**tags, **span.model_dump()})
+            lines.append({
+                **tags,
+                "stage": "turn",
+                "duration_ms": turn.trace.duration_ms,
+                "math_ms": turn.trace.math_ms,
+                "retries": turn.trace.retries,
+                **{name: turn.trace.total(name) for name in TOKEN_FIELDS},
+            })
+        if not lines:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(line) + "\n" for line in lines)
@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.agent import batch
+from src.agent.batch import BatchError, BatchExecutor, LocalBatchBackend, parse_output
+from src.agent.orchestrator import ConvFinQAManager
+from src.models.schemas import AnalyticStep, StudyCondition
+from src.utils.mock_server import MockResponsesServer
+
+
+def _record(i: int, turns: int = 2) -> dict:
+    return {
+        "id": f"Test/{i}",
+        "doc": {"pre_text": "Revenue grew.", "post_text": "Amounts are in millions.",
+                "table": {"2010": {"revenue": 100.0 + i}, "2011": {"revenue": 120.0 + i}}},
+        "dialogue": {"conv_questions": [f"what was the change in step {t}?" for t in range(turns)],
+                     "executed_answers": [0.2] * turns},
+    }
+
+
+class MockClient:
+    """The `post` of an OpenAI client, answered in-process by the mock server's canned outputs."""
+
+    def __init__(self):
+        self.server = MockResponsesServer()
+
+    def post(self, path: str, body: dict, cast_to: type) -> httpx.Response:
+        status, payload = self.server.handle(body)
+        return httpx.Response(status, json=payload)
+
+    def close(self) -> None:
+        self.server._httpd.server_close()
+
+
+class ScriptedBackend(LocalBatchBackend):
+    """Drops chosen output lines and fails chosen requests, recording every submitted custom_id."""
+
+    def __init__(self, directory, client, missing=(), always_missing=(), rejected=()):
+        super().__init__(directory, client)
+        self.missing = set(missing)
+        self.always_missing = set(always_missing)
+        self.rejected = set(rejected)
+        self.submitted: list[list[str]] = []
+
+    def submit(self, lines):
+        self.submitted.append([line["custom_id"] for line in lines])
+        return super().submit(lines)
+
+    def results(self, batch_id):
+        for line in super().results(batch_id):
+            if line["custom_id"] in self.always_missing:
+                continue
+            if line["custom_id"] in self.missing:
+                self.missing.discard(line["custom_id"])
+                continue
+            yield line
+
+    def _call(self, request_id, line):
+        if line["custom_id"] in self.rejected:
+            body = {"error": {"message": "Invalid schema", "type": "invalid_request_error"}}
+            return {"id": request_id, "custom_id": line["custom_id"], "error": None,
+                    "response": {"status_code": 400, "body": body}}
+        return super()._call(request_id, line)
+
+
+@pytest.fixture
+def client():
+    client = MockClient()
+    yield client
+    client.close()
+
+
+def _run(executor: BatchExecutor, records: list[dict], condition=StudyCondition.JSON_BASELINE_MINI):
+    manager = ConvFinQAManager(condition)
+    finished, failed = {}, {}
+    asyncio.run(executor.run(
+        [(manager, i, record) for i, record in enumerate(records)],
+        lambda m, position, record, state: finished.__setitem__(record["id"], state),
+        lambda m, record, error: failed.__setitem__(record["id"], error),
+    ))
+    return finished, failed
+
+
+def test_waves_resubmit_missing_lines_and_fail_rejected_conversations(tmp_path, client):
+    backend = ScriptedBackend(tmp_path, client, missing={"turn0-1"}, rejected={"turn1-2"})
+    finished, failed = _run(BatchExecutor(backend, poll_interval=0), [_record(i) for i in range(3)])
+
+    # Turn 1 is only submitted once every turn 0 answer is in, since its payload embeds ans_0
+    assert backend.submitted == [["turn0-0", "turn0-1", "turn0-2"], ["turn0-1"], ["turn1-0", "turn1-1", "turn1-2"]]
+    assert sorted(finished) == ["Test/0", "Test/1"]
+    for state in finished.values():
+        assert len(state.history) == 2
+        assert state.history[1].final_expression == "ans_0 * 1.1"
+        assert state.history[1].raw_math_output == pytest.approx(state.history[0].raw_math_output * 1.1)
+
+    assert list(failed) == ["Test/2"]
+    assert isinstance(failed["Test/2"], BatchError) and not failed["Test/2"].retryable
+
+
+def test_line_missing_from_every_round_fails_its_conversation(tmp_path, client):
+    backend = ScriptedBackend(tmp_path, client, always_missing={"turn0-0"})
+    finished, failed = _run(BatchExecutor(backend, poll_interval=0, max_rounds=2), [_record(0), _record(1)])
+
+    assert backend.submitted == [["turn0-0", "turn0-1"], ["turn0-0"], ["turn1-0"]]
+    assert list(finished) == ["Test/1"]
+    assert "missing from batch output" in str(failed["Test/0"])
+
+
+def test_waves_are_split_at_the_batch_size_limit(tmp_path, client, monkeypatch):
+    monkeypatch.setattr(batch, "MAX_BATCH_REQUESTS", 2)
+    backend = ScriptedBackend(tmp_path, client)
+    executor = BatchExecutor(backend, poll_interval=0)
+    finished, failed = _run(executor, [_record(i, turns=1) for i in range(5)])
+
+    assert [len(ids) for ids in backend.submitted] == [2, 2, 1]
+    assert executor.batches_submitted == 3
+    assert len(finished) == 5 and not failed
+
+
+@pytest.mark.parametrize("body", [None, {}, {"output": "truncated"}])
+def test_malformed_success_body_is_a_retryable_batch_error(body):
+    line = {"custom_id": "turn0-0", "response": {"status_code": 200, "body": body}, "error": None}
+    with pytest.raises(BatchError) as info:
+        parse_output(line, AnalyticStep)
+    assert info.value.retryable
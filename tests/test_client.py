@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+from pydantic import BaseModel
+
+from src.agent.client import AsyncReasoningClient
+from src.agent.rate_limit import RateLimiter
+from src.agent.resilience import RetryPolicy
+
+
+class Answer(BaseModel):
+    value: int
+
+
+class FlakyResponses:
+    """Answers with a 429 a few times before returning a parsed response."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    async def parse(self, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            request = httpx.Request("POST", "https://api.test/v1/responses")
+            raise openai.RateLimitError("slow down", response=httpx.Response(429, request=request), body=None)
+        usage = SimpleNamespace(input_tokens=10, output_tokens=5)
+        return SimpleNamespace(output_parsed=Answer(value=1), usage=usage)
+
+
+def test_rate_limited_attempts_do_not_spend_the_token_budget(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+    async def run() -> float:
+        limiter = RateLimiter(6000, burst=100, tokens_per_minute=60_000, token_burst=100_000)
+        client = AsyncReasoningClient(model="m", rate_limits={"m": limiter},
+                                      retry=RetryPolicy(base_delay=0.001, deadline=None))
+        client.client = SimpleNamespace(responses=FlakyResponses(failures=3))
+        parsed, usage = await client.aget_structured_response_with_usage("x" * 40_000, "q", Answer)
+        assert parsed.value == 1 and usage.input_tokens == 10
+        return limiter.token_capacity - limiter._tokens
+
+    # Only the successful attempt's 15 tokens are charged, not four estimates
+    assert asyncio.run(run()) <= 15
@@ -0,0 +1,31 @@
+from scripts.evaluate import STUDY_MATRIX, EvaluationRunner
+from src.models.schemas import AnalyticStep, TurnResult
+from src.utils.journal import JournalEntry, ResultJournal
+
+
+def _entry(record_id: str, answer: float = 1.0) -> JournalEntry:
+    turn = TurnResult(turn_index=0, question="q", final_expression=str(answer), raw_math_output=answer,
+                      conversational_response=str(answer),
+                      analyst_output=AnalyticStep(python_expression=str(answer), is_percentage=False))
+    return JournalEntry(record_id, 0, [1.0], [turn])
+
+
+def test_append_after_torn_line_is_kept(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    ResultJournal(path).append(_entry("a"))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"record_id": "b", "posi')
+
+    journal = ResultJournal(path)   # As reopened by --resume
+    journal.append(_entry("c"))
+    assert list(journal.load()) == ["a", "c"]
+
+
+def test_resume_scores_the_latest_entry_of_a_record(tmp_path):
+    journal = ResultJournal(tmp_path / "journal.jsonl")
+    journal.append(_entry("a", answer=2.0))
+    journal.append(_entry("a", answer=1.0))     # Re-run after the stale entry was written
+
+    runner = EvaluationRunner(STUDY_MATRIX[0], journal=journal, resume=True)
+    assert [row["agent_output"] for row in runner.detailed_results] == [1.0]
+    assert runner.metrics.correct == runner.metrics.total_turns == 1
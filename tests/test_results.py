@@ -0,0 +1,18 @@
+import json
+import math
+
+from src.utils.results import ResultStore
+
+
+def _row(record_id: str, ground_truth, agent_output) -> dict:
+    return {"record_id": record_id, "turn_index": 0, "ground_truth": ground_truth,
+            "agent_output": agent_output, "is_correct": False, "final_expression": ""}
+
+
+def test_null_answers_round_trip_as_json_null():
+    store = ResultStore.from_rows([_row("a", 1.5, None), _row("b", None, "n/a")])
+    assert math.isnan(store.agent_output[0])
+
+    rows = json.loads(json.dumps(list(store.rows()), allow_nan=False))
+    assert [(r["ground_truth"], r["agent_output"]) for r in rows] == [(1.5, None), (None, None)]
+    assert ResultStore.from_rows(rows).metrics() == store.metrics()
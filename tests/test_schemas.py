@@ -0,0 +1,35 @@
+from scripts.benchmark import synthetic_records
+from src.agent.context_builder import ContextBuilder
+from src.models.schemas import AnalyticStep, ConversationState, StudyCondition, TurnResult
+
+
+def _turn(index: int, answer: float) -> TurnResult:
+    return TurnResult(turn_index=index, question=f"q{index}", final_expression=str(answer),
+                      raw_math_output=answer, conversational_response=str(answer),
+                      analyst_output=AnalyticStep(python_expression=str(answer), is_percentage=False))
+
+
+def _state(answers: list[float]) -> ConversationState:
+    state = ConversationState(context=ContextBuilder.build(synthetic_records(1)[0]),
+                              condition=StudyCondition.MODULAR_MINI)
+    for i, answer in enumerate(answers):
+        state.append_turn(_turn(i, answer))
+    return state
+
+
+def test_replaced_history_of_equal_length_rebuilds_the_views():
+    state = _state([1.0, 2.0])
+    assert state.get_ans_map() == {"ans_0": 1.0, "ans_1": 2.0}
+
+    state.history = [_turn(0, 3.0), _turn(1, 4.0)]
+    assert state.get_ans_map() == {"ans_0": 3.0, "ans_1": 4.0}
+    assert "q1\nAnswer: 4.0" in state.get_prompt_history()
+
+
+def test_model_copy_with_new_history_does_not_share_stale_views():
+    state = _state([1.0])
+    state.get_prompt_history()
+
+    copy = state.model_copy(update={"history": [_turn(0, 5.0), _turn(1, 6.0)]})
+    assert copy.get_ans_map() == {"ans_0": 5.0, "ans_1": 6.0}
+    assert state.get_ans_map() == {"ans_0": 1.0}
@@ -0,0 +1,39 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from scripts.benchmark import synthetic_records
+from src.agent.sessions import SessionBusyError, SessionManager, SessionNotFoundError
+from src.models.schemas import StudyCondition
+from src.server import ChatServer
+
+
+class Records:
+    """The `get` of a DatasetStore over in-memory records."""
+
+    def __init__(self, records: list[dict]):
+        self.records = {record["id"]: record for record in records}
+
+    def get(self, record_id: str) -> dict | None:
+        return self.records.get(record_id)
+
+
+def test_session_is_not_deleted_while_a_turn_holds_it(tmp_path):
+    sessions = SessionManager(None, Records(synthetic_records(1)), tmp_path)
+    server = ChatServer(sessions)
+
+    async def run() -> None:
+        session = sessions.create("Synthetic/0", StudyCondition.MODULAR_MINI)
+        async with sessions.use(session.session_id):
+            with pytest.raises(SessionBusyError):
+                sessions.delete(session.session_id)
+            status, _ = await server._dispatch("DELETE", f"/sessions/{session.session_id}", b"")
+            assert status == HTTPStatus.CONFLICT
+        assert sessions.get(session.session_id) is session
+
+        sessions.delete(session.session_id)
+        with pytest.raises(SessionNotFoundError):
+            sessions.get(session.session_id)
+
+    asyncio.run(run())
@@ -0,0 +1,20 @@
+import pytest
+
+from src.agent.tools import MathTool, compile_expression
+
+
+@pytest.mark.parametrize("expression", [
+    "9 ** 9 ** 9",
+    "((9 ** 100) ** 100) ** 100",
+    "(((9 ** 100) ** 100) ** 100) ** 100",
+    "(2 * 9 ** 100) ** 100",
+    "9 ** 1000",
+])
+def test_exponent_bombs_are_rejected(expression):
+    compile_expression.cache_clear()
+    with pytest.raises(ValueError):
+        MathTool.calculate(expression, {})
+
+
+def test_plain_powers_still_evaluate():
+    assert MathTool.calculate("(1 + 0.05) ** 2 * ans_0", {"ans_0": 100.0}) == pytest.approx(110.25)